@@ -0,0 +1,14 @@
+import pytest
+from graphene.test import Client
+
+from logistics.schema import schema
+
+
+@pytest.fixture
+def graphql_client():
+    return Client(schema)
+
+
+@pytest.fixture
+def graphql_context(rf):
+    return rf.post("/graphql/")
@@ -0,0 +1,248 @@
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, DateField, F, Sum, Value
+from django.db.models.functions import Coalesce, Left, Trunc, TruncDate
+from django.utils import timezone
+
+from jobs.models import (
+    AddressWithArchive,
+    DeliveryJob,
+    DeliveryJobWithArchive,
+    JobRollup,
+    JobRollupRefresh,
+)
+
+# Jobs saved this long before a refresh started, but committed after, are still
+# picked up by the next one
+REFRESH_OVERLAP = datetime.timedelta(minutes=5)
+
+# The longest range of days analytics are computed for, about ten years
+MAX_DAYS = 3660
+
+# The key of each dimension, as an expression over the jobs
+DIMENSION_KEYS = {
+    "": Value(""),
+    "vehicle": Coalesce("vehicle_id", Value("")),
+    "state": F("destination__state"),
+    "zip_prefix": Left("destination__zip_code", 3),
+}
+
+
+def start_of_day(day):
+    """Returns the aware datetime at which `day` starts (in UTC)."""
+    return datetime.datetime.combine(day, datetime.time(), datetime.timezone.utc)
+
+
+def refresh_job_rollups(full=False):
+    """
+    Recomputes the job rollups of the days whose jobs changed since the last
+    refresh, and of the days completed since, returning the new `JobRollupRefresh`.
+
+    The day of a job is only looked up as it is now, so the days jobs were deleted
+    from or moved out of (e.g. by rescheduling a slot) are only recomputed by a
+    `full` refresh, which recomputes every day.
+    """
+    refreshed_at = timezone.now()
+    complete_until = refreshed_at.astimezone(datetime.timezone.utc).date()
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Serializes refreshes, while readers keep seeing the previous rollups
+        cursor.execute(
+            f"LOCK TABLE {JobRollup._meta.db_table} IN SHARE ROW EXCLUSIVE MODE"
+        )
+        previous = JobRollupRefresh.objects.order_by("-refreshed_at").first()
+        full = full or previous is None
+        num_days = 0
+        for basis in JobRollup.BASES:
+            if full:
+                JobRollup.objects.filter(basis=basis).delete()
+                days = None
+            else:
+                days = changed_days(basis, previous, complete_until)
+                if not days:
+                    continue
+                JobRollup.objects.filter(basis=basis, day__in=days).delete()
+            num_days += insert_rollups(cursor, basis, complete_until, days)
+        return JobRollupRefresh.objects.create(
+            refreshed_at=refreshed_at,
+            complete_until=complete_until,
+            full=full,
+            days=num_days,
+        )
+
+
+def changed_days(basis, previous, complete_until):
+    """
+    Returns the days before `complete_until` with jobs (by `basis`) changed since
+    the `previous` refresh, and the days completed since.
+    """
+    days = set(
+        DeliveryJob.objects.filter(
+            updated_at__gte=previous.refreshed_at - REFRESH_OVERLAP,
+            **{f"{basis}__lt": start_of_day(complete_until)},
+        )
+        .annotate(day=TruncDate(basis, tzinfo=datetime.timezone.utc))
+        .values_list("day", flat=True)
+        .distinct()
+    )
+    day = previous.complete_until
+    while day < complete_until:
+        days.add(day)
+        day += datetime.timedelta(days=1)
+    return sorted(days)
+
+
+def insert_rollups(cursor, basis, complete_until, days=None):
+    """
+    Aggregates the jobs of `days` (every day before `complete_until` if None),
+    archived ones included, into rollups by `basis`, for every dimension in one
+    pass, returning the number of days aggregated.
+    """
+    quote_name = connection.ops.quote_name
+    column = quote_name(basis)
+    params = {"basis": basis, "until": start_of_day(complete_until)}
+    days_join = ""
+    if days is not None:
+        # One index range scan per day
+        days_join = f"""
+            JOIN unnest(%(days)s::date[]) AS changed(day)
+                ON job.{column} >= changed.day::timestamp AT TIME ZONE 'UTC'
+                AND job.{column} < (changed.day + 1)::timestamp AT TIME ZONE 'UTC'
+        """
+        params["days"] = days
+    cursor.execute(
+        f"""
+        INSERT INTO {quote_name(JobRollup._meta.db_table)}
+            (basis, day, dimension, key, job_count, completed_count, income, cost)
+        SELECT
+            %(basis)s,
+            day,
+            CASE
+                WHEN GROUPING(vehicle_id) = 0 THEN 'vehicle'
+                WHEN GROUPING(state) = 0 THEN 'state'
+                WHEN GROUPING(zip_prefix) = 0 THEN 'zip_prefix'
+                ELSE ''
+            END,
+            coalesce(vehicle_id, state, zip_prefix, ''),
+            count(*),
+            count(completed_at),
+            sum(income),
+            sum(cost)
+        FROM (
+            SELECT
+                (job.{column} AT TIME ZONE 'UTC')::date AS day,
+                job.vehicle_id,
+                address.state,
+                left(address.zip_code, 3) AS zip_prefix,
+                job.completed_at,
+                job.income,
+                job.cost
+            FROM {quote_name(DeliveryJobWithArchive._meta.db_table)} job
+            JOIN {quote_name(AddressWithArchive._meta.db_table)} address
+                ON address.id = job.destination_id
+            {days_join}
+            WHERE job.{column} < %(until)s
+        ) jobs
+        GROUP BY day, GROUPING SETS ((), (vehicle_id), (state), (zip_prefix))
+        RETURNING day
+        """,
+        params,
+    )
+    return len({day for day, in cursor.fetchall()})
+
+
+def job_analytics(interval, basis="created_at", dimension="", start=None, end=None):
+    """
+    Returns the totals of the jobs per `interval` ("day", "week" or "month") of
+    their `basis` timestamp and per key of `dimension`, for the days from `start`
+    up to (not including) `end`, as dicts ordered by bucket and key.
+
+    Days the rollups cover are read from them, later days are aggregated from the
+    jobs. Buckets start at the start of their interval, but only total the jobs in
+    the range.
+    """
+    refresh = JobRollupRefresh.objects.order_by("-refreshed_at").first()
+    split = start if refresh is None else min(max(refresh.complete_until, start), end)
+
+    totals = defaultdict(lambda: [0, 0, Decimal(0), Decimal(0)])
+    for rows in (
+        rollup_totals(interval, basis, dimension, start, split),
+        live_totals(interval, basis, dimension, split, end),
+    ):
+        for bucket, key, job_count, completed_count, income, cost in rows:
+            bucket_totals = totals[bucket, key]
+            bucket_totals[0] += job_count
+            bucket_totals[1] += completed_count
+            bucket_totals[2] += income
+            bucket_totals[3] += cost
+
+    return [
+        {
+            "start": bucket,
+            "key": key or None,
+            "job_count": job_count,
+            "completed_count": completed_count,
+            "income": income,
+            "cost": cost,
+        }
+        for (bucket, key), (job_count, completed_count, income, cost) in sorted(
+            totals.items()
+        )
+    ]
+
+
+def rollup_totals(interval, basis, dimension, start, end):
+    """Sums the rollups of the days from `start` up to `end` per bucket and key."""
+    if start >= end:
+        return []
+    return (
+        JobRollup.objects.filter(
+            basis=basis, dimension=dimension, day__gte=start, day__lt=end
+        )
+        .values("key", bucket=Trunc("day", interval, output_field=DateField()))
+        .annotate(Sum("job_count"), Sum("completed_count"), Sum("income"), Sum("cost"))
+        .values_list(
+            "bucket",
+            "key",
+            "job_count__sum",
+            "completed_count__sum",
+            "income__sum",
+            "cost__sum",
+        )
+        .order_by()
+    )
+
+
+def live_totals(interval, basis, dimension, start, end):
+    """Aggregates the jobs of the days from `start` up to `end` per bucket and key."""
+    if start >= end:
+        return []
+    return (
+        DeliveryJob.objects.filter(
+            **{
+                f"{basis}__gte": start_of_day(start),
+                f"{basis}__lt": start_of_day(end),
+            }
+        )
+        .values(
+            bucket=Trunc(
+                basis,
+                interval,
+                output_field=DateField(),
+                tzinfo=datetime.timezone.utc,
+            ),
+            bucket_key=DIMENSION_KEYS[dimension],
+        )
+        .annotate(Count("id"), Count("completed_at"), Sum("income"), Sum("cost"))
+        .values_list(
+            "bucket",
+            "bucket_key",
+            "id__count",
+            "completed_at__count",
+            "income__sum",
+            "cost__sum",
+        )
+        .order_by()
+    )
@@ -0,0 +1,156 @@
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from jobs.cache import invalidate_job_results
+from jobs.models import (
+    Address,
+    ArchivedAddress,
+    ArchivedDeliveryJob,
+    DeliveryJob,
+    JobArchiveRun,
+)
+
+# The columns moved to the archive, the same in the hot and archive tables
+JOB_COLUMNS = (
+    "id",
+    "vehicle_id",
+    "created_at",
+    "completed_at",
+    "destination_id",
+    "income",
+    "cost",
+    "delivery_slot_starts_at",
+    "delivery_slot_ends_at",
+    "updated_at",
+)
+ADDRESS_COLUMNS = (
+    "id",
+    "recipient",
+    "street_address",
+    "street_address_2",
+    "city",
+    "state",
+    "zip_code",
+    "content_hash",
+)
+
+
+def get_archived_before():
+    """Returns the time every archived job was completed before, None if none is."""
+    return JobArchiveRun.objects.aggregate(Max("archived_before"))[
+        "archived_before__max"
+    ]
+
+
+def reaches_archive(filters):
+    """
+    Indicates if the jobs matching `filters` (DeliveryJobFilter arguments) may
+    include archived ones: only if they bound `completed_at` to a range starting
+    before the archive cutoff. Other filters don't look up the cutoff.
+    """
+    exact = filters.get("completed_at")
+    lower_bounds = [
+        filters[name]
+        for name in ("completed_at__gt", "completed_at__gte")
+        if filters.get(name) is not None
+    ]
+    upper_bounds = [
+        filters[name]
+        for name in ("completed_at__lt", "completed_at__lte")
+        if filters.get(name) is not None
+    ]
+    if exact is None and not lower_bounds and not upper_bounds:
+        return False
+    archived_before = get_archived_before()
+    if archived_before is None:
+        return False
+    if exact is not None:
+        return exact < archived_before
+    return not lower_bounds or max(lower_bounds) < archived_before
+
+
+def archive_jobs(completed_before, batch_size=10_000):
+    """
+    Moves the jobs completed before `completed_before`, and the addresses no
+    longer referred to by a job in the jobs table, to the archive tables, in
+    batches each committed on its own. Returns the `JobArchiveRun`.
+
+    The cutoff is recorded before moving anything, so queries reaching before it
+    read both tables until the jobs are moved. It never goes back: jobs archived
+    by a previous run with a later cutoff stay archived. Jobs locked by another
+    transaction are left for the next run.
+
+    Moving jobs doesn't change the vehicle and job rollups, which also count the
+    archived jobs.
+    """
+    previous = get_archived_before()
+    run = JobArchiveRun.objects.create(
+        archived_before=max(completed_before, previous or completed_before)
+    )
+    while archive_batch(run, completed_before, batch_size):
+        pass
+    run.finished_at = timezone.now()
+    run.save(update_fields=["finished_at"])
+    return run
+
+
+def archive_batch(run, completed_before, batch_size):
+    """Moves one batch of jobs and their addresses, returning the number of jobs."""
+    quote_name = connection.ops.quote_name
+    job_table = quote_name(DeliveryJob._meta.db_table)
+    address_table = quote_name(Address._meta.db_table)
+    job_columns = ", ".join(JOB_COLUMNS)
+    address_columns = ", ".join(ADDRESS_COLUMNS)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {job_table} job
+                USING (
+                    SELECT id, delivery_slot_starts_at FROM {job_table}
+                    WHERE completed_at < %s
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                ) batch
+                WHERE job.id = batch.id
+                    AND job.delivery_slot_starts_at = batch.delivery_slot_starts_at
+                RETURNING job.*
+            )
+            INSERT INTO {quote_name(ArchivedDeliveryJob._meta.db_table)}
+                ({job_columns})
+            SELECT {job_columns} FROM moved
+            RETURNING id, vehicle_id, destination_id
+            """,
+            [completed_before, batch_size],
+        )
+        jobs = cursor.fetchall()
+        if not jobs:
+            return 0
+        # Addresses a hot job still refers to stay. If a job is created for one
+        # concurrently, the foreign key fails the batch, left for the next run.
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {address_table} address
+                WHERE address.id = ANY(%s) AND NOT EXISTS (
+                    SELECT FROM {job_table} job
+                    WHERE job.destination_id = address.id
+                )
+                RETURNING address.*
+            )
+            INSERT INTO {quote_name(ArchivedAddress._meta.db_table)}
+                ({address_columns})
+            SELECT {address_columns} FROM moved
+            """,
+            [sorted({destination_id for _, _, destination_id in jobs})],
+        )
+        run.jobs += len(jobs)
+        run.addresses += cursor.rowcount
+        run.save(update_fields=["jobs", "addresses"])
+        # Lists of hot jobs no longer show them
+        invalidate_job_results(
+            job_ids=[job_id for job_id, _, _ in jobs],
+            registrations=[vehicle_id for _, vehicle_id, _ in jobs],
+        )
+    return len(jobs)
@@ -0,0 +1,290 @@
+import datetime
+import statistics
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from graphql_relay import to_global_id
+
+from jobs.factories import DeliveryJobFactory
+from jobs.models import DeliveryJob
+from logistics.result_cache import get_result_cache
+from vehicles.factories import VehicleFactory
+
+PAGE_SIZE = 50
+JOBS_PER_ASSIGNMENT = 50
+
+JOB_FIELDS = """
+    totalCount
+    edges {
+        node {
+            id
+            income
+            deliverySlotStartsAt
+            vehicle { registration }
+            destination { city zipCode }
+        }
+    }
+"""
+DELIVERY_JOBS_QUERY = f"""
+    query DeliveryJobs(
+        $first: Int
+        $uncompleted: Boolean
+        $registration: String
+        $startsAfter: DateTime
+        $zipPrefix: String
+    ) {{
+        deliveryJobs(
+            first: $first
+            completedAt_Isnull: $uncompleted
+            vehicle_Registration: $registration
+            deliverySlotStartsAt_Gte: $startsAfter
+            destination_ZipCode_Startswith: $zipPrefix
+        ) {{ {JOB_FIELDS} }}
+    }}
+"""
+VEHICLES_QUERY = """
+    query Vehicles($first: Int) {
+        vehicles(first: $first, orderBy: "-total_income") {
+            edges {
+                node {
+                    registration
+                    totalIncome
+                    deliveryJobs(first: 5) {
+                        edges { node { income destination { city } } }
+                    }
+                }
+            }
+        }
+    }
+"""
+CREATE_JOB_MUTATION = """
+    mutation CreateJob($input: CreateJobInput!) {
+        createJob(input: $input) { job { id vehicle { registration } } }
+    }
+"""
+MARK_JOB_COMPLETED_MUTATION = """
+    mutation MarkJobCompleted($input: MarkJobCompletedInput!) {
+        markJobCompleted(input: $input) { job { id completedAt } }
+    }
+"""
+ASSIGN_VEHICLE_MUTATION = """
+    mutation AssignVehicleToJobs($input: AssignVehicleToJobsInput!) {
+        assignVehicleToJobs(input: $input) {
+            success
+            jobs { id vehicle { registration } destination { city } }
+        }
+    }
+"""
+
+
+class Benchmark:
+    """
+    A GraphQL operation to time, with the most SQL queries it may run whatever the
+    size of the data, and a function returning its variables for an iteration.
+    Variables are prepared before the operation is timed.
+    """
+
+    def __init__(self, name, query, max_queries, get_variables):
+        self.name = name
+        self.query = query
+        self.max_queries = max_queries
+        self.get_variables = get_variables
+
+
+def get_sample():
+    """Returns a job with a vehicle, filter values are taken from."""
+    return (
+        DeliveryJob.objects.select_related("destination")
+        .exclude(vehicle=None)
+        .order_by("id")
+        .first()
+    )
+
+
+def far_slot(iteration):
+    """Returns a slot after any generated one, for jobs created by benchmarks."""
+    starts_at = datetime.datetime(
+        2100, 1, 1, tzinfo=datetime.timezone.utc
+    ) + datetime.timedelta(hours=2 * iteration)
+    return starts_at, starts_at + datetime.timedelta(hours=1)
+
+
+def delivery_jobs_variables(**filters):
+    """Returns a function building the variables of the given filters."""
+
+    def get_variables(iteration):
+        sample = get_sample()
+        variables = {"first": PAGE_SIZE}
+        if "registration" in filters:
+            variables["registration"] = sample.vehicle_id
+            variables["startsAfter"] = (
+                sample.delivery_slot_starts_at - datetime.timedelta(days=30)
+            ).isoformat()
+        if "zip_prefix" in filters:
+            variables["zipPrefix"] = sample.destination.zip_code[:2]
+        if "uncompleted" in filters:
+            variables["uncompleted"] = True
+        return variables
+
+    return get_variables
+
+
+def create_job_variables(iteration):
+    vehicle = VehicleFactory()
+    starts_at, ends_at = far_slot(iteration)
+    return {
+        "input": {
+            "destination": {
+                "recipient": "Jane Doe",
+                "streetAddress": f"{iteration + 1} Main Street",
+                "city": "Springfield",
+                "state": "IL",
+                "zipCode": "62701",
+            },
+            "income": "120.00",
+            "cost": "30.00",
+            "deliverySlotStartsAt": starts_at.isoformat(),
+            "deliverySlotEndsAt": ends_at.isoformat(),
+            "vehicleRegistration": vehicle.registration,
+        }
+    }
+
+
+def mark_job_completed_variables(iteration):
+    starts_at, ends_at = far_slot(iteration)
+    job = DeliveryJobFactory(
+        delivery_slot_starts_at=starts_at, delivery_slot_ends_at=ends_at
+    )
+    return {
+        "input": {
+            "id": to_global_id("DeliveryJobType", job.id),
+            "completedAt": ends_at.isoformat(),
+        }
+    }
+
+
+def assign_vehicle_variables(iteration):
+    vehicle = VehicleFactory()
+    jobs = [
+        DeliveryJobFactory(
+            vehicle=None,
+            delivery_slot_starts_at=starts_at,
+            delivery_slot_ends_at=ends_at,
+        )
+        for starts_at, ends_at in map(
+            far_slot,
+            range(
+                iteration * JOBS_PER_ASSIGNMENT,
+                (iteration + 1) * JOBS_PER_ASSIGNMENT,
+            ),
+        )
+    ]
+    return {
+        "input": {
+            "vehicleRegistration": vehicle.registration,
+            "jobIds": [to_global_id("DeliveryJobType", job.id) for job in jobs],
+        }
+    }
+
+
+# Query counts include the savepoints of mutations, which run within the
+# transaction of the benchmarks
+BENCHMARKS = [
+    # Count and page, joined with vehicles and destinations
+    Benchmark(
+        "deliveryJobs uncompleted",
+        DELIVERY_JOBS_QUERY,
+        2,
+        delivery_jobs_variables(uncompleted=True),
+    ),
+    Benchmark(
+        "deliveryJobs vehicle schedule",
+        DELIVERY_JOBS_QUERY,
+        2,
+        delivery_jobs_variables(registration=True),
+    ),
+    Benchmark(
+        "deliveryJobs zip prefix",
+        DELIVERY_JOBS_QUERY,
+        2,
+        delivery_jobs_variables(zip_prefix=True),
+    ),
+    # Count, page, and the jobs of the page with their destinations
+    Benchmark(
+        "vehicles by total income",
+        VEHICLES_QUERY,
+        3,
+        lambda iteration: {"first": PAGE_SIZE},
+    ),
+    Benchmark("createJob", CREATE_JOB_MUTATION, 10, create_job_variables),
+    Benchmark(
+        "markJobCompleted", MARK_JOB_COMPLETED_MUTATION, 6, mark_job_completed_variables
+    ),
+    Benchmark(
+        "assignVehicleToJobs", ASSIGN_VEHICLE_MUTATION, 8, assign_vehicle_variables
+    ),
+]
+
+
+def run_benchmarks(benchmarks=BENCHMARKS, iterations=10):
+    """
+    Runs each benchmark through the GraphQL view, without the result cache.
+    Returns the SQL queries and timings of each, by name.
+    """
+    client = Client()
+    results = {}
+    # The test client sends requests to "testserver"
+    with override_settings(
+        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+        GRAPHQL_RESULT_CACHE=None,
+    ):
+        get_result_cache.cache_clear()
+        try:
+            for benchmark in benchmarks:
+                durations, queries = [], []
+                for iteration in range(iterations):
+                    data = {
+                        "query": benchmark.query,
+                        "variables": benchmark.get_variables(iteration),
+                    }
+                    with CaptureQueriesContext(connection) as captured:
+                        started = perf_counter()
+                        response = client.post(
+                            "/graphql/", data, content_type="application/json"
+                        )
+                        durations.append(perf_counter() - started)
+                    result = response.json()
+                    if "errors" in result:
+                        raise RuntimeError(
+                            f"{benchmark.name} failed: {result['errors']}"
+                        )
+                    queries.append(len(captured))
+                results[benchmark.name] = summarize(benchmark, durations, queries)
+        finally:
+            get_result_cache.cache_clear()
+    return results
+
+
+def summarize(benchmark, durations, queries):
+    durations = sorted(duration * 1000 for duration in durations)
+    return {
+        "iterations": len(durations),
+        "queries": max(queries),
+        "max_queries": benchmark.max_queries,
+        "min_ms": round(durations[0], 3),
+        "median_ms": round(statistics.median(durations), 3),
+        "p95_ms": round(durations[max(0, int(len(durations) * 0.95 + 0.5) - 1)], 3),
+        "max_ms": round(durations[-1], 3),
+    }
+
+
+def get_regressions(results):
+    """Returns the names of the benchmarks that ran more queries than allowed."""
+    return [
+        name
+        for name, result in results.items()
+        if result["queries"] > result["max_queries"]
+    ]
@@ -0,0 +1,17 @@
+from jobs.models import DeliveryJob
+from logistics.result_cache import invalidate_results, result_tag
+from vehicles.models import Vehicle
+
+
+def invalidate_job_results(job_ids=(), registrations=()):
+    """
+    Invalidates cached results showing the given jobs, the lists of jobs, and the
+    vehicles (with their job totals) the jobs were or are assigned to.
+    """
+    tags = [result_tag(DeliveryJob)]
+    tags += [result_tag(DeliveryJob, job_id) for job_id in job_ids]
+    registrations = set(registrations) - {None}
+    if registrations:
+        tags.append(result_tag(Vehicle))
+        tags += [result_tag(Vehicle, registration) for registration in registrations]
+    invalidate_results(*tags)
@@ -0,0 +1,299 @@
+import csv
+import heapq
+import math
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from jobs.cache import invalidate_job_results
+from jobs.models import DeliveryJob, rollup_deltas
+from vehicles.models import Vehicle, VehicleRollup
+
+# Each job is offered to this many of the free vehicles with the fewest jobs, and
+# goes to the nearest of them
+CANDIDATES = 8
+
+EARTH_RADIUS_KM = 6371
+
+# Rough distances (km) between ZIP codes without known centroids, by the length of
+# their common prefix. The first digit is a group of states, the first three a
+# sectional center.
+PREFIX_DISTANCES = {5: 0, 4: 5, 3: 25, 2: 150, 1: 500, 0: 1500}
+
+# Centroids of the main 3-digit ZIP prefixes, each placed at the city of its
+# sectional center, used unless DISPATCH_ZIP_CENTROIDS names finer ones
+DEFAULT_ZIP_CENTROIDS = Path(__file__).parent / "data" / "zip3_centroids.csv"
+
+
+@lru_cache
+def get_zip_centroids():
+    """
+    Loads the ZIP centroids of the `DISPATCH_ZIP_CENTROIDS` setting, or the
+    bundled ones, a CSV file with zip_code (5 digits, or a 3-digit prefix),
+    latitude and longitude columns, as radians by ZIP code.
+    """
+    path = getattr(settings, "DISPATCH_ZIP_CENTROIDS", None) or DEFAULT_ZIP_CENTROIDS
+    with open(path, newline="", encoding="utf-8") as file:
+        return {
+            row["zip_code"][:5]: (
+                math.radians(float(row["latitude"])),
+                math.radians(float(row["longitude"])),
+            )
+            for row in csv.DictReader(file)
+        }
+
+
+def zip_distance(zip_code, other, centroids):
+    """
+    Returns the distance (km) between two ZIP codes: between their centroids, or
+    those of their 3-digit prefix, if both are known and differ, else estimated
+    from their common prefix.
+    """
+    zip_code, other = zip_code[:5], other[:5]
+    if zip_code == other:
+        return 0
+    prefix = 0
+    while prefix < min(len(zip_code), len(other)) and (
+        zip_code[prefix] == other[prefix]
+    ):
+        prefix += 1
+    centroid = centroids.get(zip_code) or centroids.get(zip_code[:3])
+    other_centroid = centroids.get(other) or centroids.get(other[:3])
+    if centroid is not None and other_centroid is not None:
+        if centroid == other_centroid:
+            # Within one area, as in one sectional center
+            return PREFIX_DISTANCES[max(prefix, 3)]
+        (latitude, longitude), (other_latitude, other_longitude) = (
+            centroid,
+            other_centroid,
+        )
+        # Haversine formula
+        h = (
+            math.sin((other_latitude - latitude) / 2) ** 2
+            + math.cos(latitude)
+            * math.cos(other_latitude)
+            * math.sin((other_longitude - longitude) / 2) ** 2
+        )
+        return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+    return PREFIX_DISTANCES[prefix]
+
+
+class Schedule:
+    """The slots of the jobs of a vehicle, in order, with their destination ZIP."""
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.zip_codes = []
+
+    def add(self, starts_at, ends_at, zip_code):
+        position = bisect_right(self.starts, starts_at)
+        self.starts.insert(position, starts_at)
+        self.ends.insert(position, ends_at)
+        self.zip_codes.insert(position, zip_code)
+
+    def is_free(self, starts_at, ends_at):
+        """
+        Indicates if a slot doesn't overlap any of the schedule. As the slots of a
+        schedule don't overlap each other, only the last one starting before the
+        end of the slot can.
+        """
+        position = bisect_left(self.starts, ends_at)
+        return position == 0 or self.ends[position - 1] <= starts_at
+
+    def previous_zip_code(self, starts_at):
+        """Returns the destination of the last job before a slot, if any."""
+        position = bisect_right(self.starts, starts_at)
+        return self.zip_codes[position - 1] if position else None
+
+
+def solve(jobs, schedules, candidates=CANDIDATES, centroids=None):
+    """
+    Assigns `jobs`, `(id, starts_at, ends_at, zip_code)` tuples, to the vehicles of
+    `schedules` (by registration) whose slots they don't overlap, returning the
+    registration assigned to each job id. Jobs no vehicle is free for are left out.
+
+    Jobs are taken in order of slot start. Each is offered to the `candidates` free
+    vehicles with the fewest jobs, found through a heap, and goes to the one whose
+    previous job is nearest its destination. Vehicles without a previous job are
+    taken to be anywhere.
+
+    As jobs come in order of slot start, a vehicle given a job can't take another
+    until its slot ends: it waits in a second heap, by that time, rather than being
+    scanned for each job meanwhile.
+    """
+    if centroids is None:
+        centroids = get_zip_centroids()
+    distances = {}
+    loads = [
+        (len(schedule.starts), registration)
+        for registration, schedule in schedules.items()
+    ]
+    heapq.heapify(loads)
+    busy = []
+    assignments = {}
+    for job_id, starts_at, ends_at, zip_code in sorted(
+        jobs, key=lambda job: (job[1], job[0])
+    ):
+        while busy and busy[0][0] <= starts_at:
+            _, load = heapq.heappop(busy)
+            heapq.heappush(loads, load)
+        popped, free = [], []
+        while loads and len(free) < candidates:
+            load = heapq.heappop(loads)
+            popped.append(load)
+            if schedules[load[1]].is_free(starts_at, ends_at):
+                free.append(load)
+        best = None
+        for load in free:
+            previous = schedules[load[1]].previous_zip_code(starts_at)
+            if previous is None:
+                distance = 0
+            else:
+                key = (previous, zip_code)
+                if key not in distances:
+                    distances[key] = zip_distance(previous, zip_code, centroids)
+                distance = distances[key]
+            if best is None or distance < best[0]:
+                best = (distance, load)
+        chosen = best[1] if best is not None else None
+        for load in popped:
+            if load is not chosen:
+                heapq.heappush(loads, load)
+                continue
+            job_count, registration = load
+            schedules[registration].add(starts_at, ends_at, zip_code)
+            assignments[job_id] = registration
+            load = (job_count + 1, registration)
+            if ends_at > starts_at:
+                heapq.heappush(busy, (ends_at, load))
+            else:
+                heapq.heappush(loads, load)
+    return assignments
+
+
+def dispatch_jobs(starts_after, starts_before, batch_size=1000, dry_run=False):
+    """
+    Assigns the unassigned, uncompleted jobs with a slot starting in the given
+    range to vehicles, balancing their number of jobs in the range, see `solve`.
+    Returns the number of jobs found and of jobs assigned.
+
+    Jobs and the fleet are loaded with one query each, and the assignments are
+    written in batches, each checked against the slots stored meanwhile.
+    """
+    jobs = list(
+        DeliveryJob.objects.filter(
+            vehicle__isnull=True,
+            completed_at__isnull=True,
+            delivery_slot_starts_at__gte=starts_after,
+            delivery_slot_starts_at__lt=starts_before,
+        ).values_list(
+            "id",
+            "delivery_slot_starts_at",
+            "delivery_slot_ends_at",
+            "destination__zip_code",
+        )
+    )
+    if not jobs:
+        return 0, 0
+
+    schedules = {
+        registration: Schedule()
+        for registration in Vehicle.objects.values_list("registration", flat=True)
+    }
+    # The assigned jobs overlapping the range of the slots
+    for registration, starts_at, ends_at, zip_code in DeliveryJob.objects.filter(
+        vehicle__isnull=False,
+        delivery_slot_starts_at__lt=max(ends_at for _, _, ends_at, _ in jobs),
+        delivery_slot_ends_at__gt=starts_after,
+    ).values_list(
+        "vehicle_id",
+        "delivery_slot_starts_at",
+        "delivery_slot_ends_at",
+        "destination__zip_code",
+    ):
+        schedules[registration].add(starts_at, ends_at, zip_code)
+
+    assignments = solve(jobs, schedules)
+    if dry_run:
+        return len(jobs), len(assignments)
+
+    slots = {job_id: (starts_at, ends_at) for job_id, starts_at, ends_at, _ in jobs}
+    assigned = 0
+    job_ids = sorted(assignments)
+    for start in range(0, len(job_ids), batch_size):
+        batch = {
+            job_id: (assignments[job_id], *slots[job_id])
+            for job_id in job_ids[start : start + batch_size]
+        }
+        assigned += write_assignments(batch)
+    return len(jobs), assigned
+
+
+def write_assignments(batch):
+    """
+    Assigns a batch of jobs, by id, to the `(registration, starts_at, ends_at)`
+    given for them, in one transaction, returning the number of jobs assigned.
+
+    Jobs assigned, rescheduled or given an overlapping slot on their vehicle since
+    they were loaded are skipped.
+    """
+    with transaction.atomic():
+        # Locked so that concurrent assignments to the vehicles are checked for
+        # conflicts in turn
+        list(
+            Vehicle.objects.select_for_update()
+            .filter(registration__in={slot[0] for slot in batch.values()})
+            .order_by("registration")
+            .values_list("registration", flat=True)
+        )
+        job_ids = list(batch)
+        conflicts = DeliveryJob.objects.find_slot_conflicts(
+            [batch[job_id] for job_id in job_ids], exclude_ids=job_ids
+        )
+        job_ids = [
+            job_id
+            for position, job_id in enumerate(job_ids)
+            if position not in conflicts
+        ]
+        if not job_ids:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE {DeliveryJob._meta.db_table} job
+                SET vehicle_id = assignment.vehicle_id, updated_at = %s
+                FROM unnest(%s::bigint[], %s::varchar[], %s::timestamptz[])
+                    AS assignment(id, vehicle_id, starts_at)
+                WHERE job.id = assignment.id
+                    AND job.delivery_slot_starts_at = assignment.starts_at
+                    AND job.vehicle_id IS NULL
+                RETURNING job.id, job.vehicle_id, job.completed_at, job.income,
+                    job.cost
+                """,
+                [
+                    timezone.now(),
+                    job_ids,
+                    [batch[job_id][0] for job_id in job_ids],
+                    [batch[job_id][1] for job_id in job_ids],
+                ],
+            )
+            rows = cursor.fetchall()
+        VehicleRollup.objects.apply(
+            rollup_deltas(
+                added=[
+                    (vehicle_id, completed_at is not None, income, cost)
+                    for _, vehicle_id, completed_at, income, cost in rows
+                ]
+            )
+        )
+        if rows:
+            invalidate_job_results(
+                job_ids=[job_id for job_id, *_ in rows],
+                registrations=[vehicle_id for _, vehicle_id, *_ in rows],
+            )
+        return len(rows)
@@ -17,14 +17,12 @@ class DeliveryJobFactory(DjangoModelFactory):
     cost = factory.Faker("pydecimal", left_digits=3, right_digits=2, positive=True)
     delivery_slot_starts_at = factory.Faker("date_time_this_year")
     delivery_slot_ends_at = factory.LazyAttribute(
-        lambda obj: obj.delivery_slot_starts_at
-        + timedelta(
-            hours=factory.Faker("pyint", min_value=1, max_value=6).evaluate(
-                None, None, extra={"locale": "en_US"}
-            )
-        )
+        lambda obj: obj.delivery_slot_starts_at + timedelta(hours=obj.slot_hours)
     )
 
+    class Params:
+        slot_hours = factory.Faker("pyint", min_value=1, max_value=6)
+
 
 class AddressFactory(DjangoModelFactory):
     class Meta:
@@ -0,0 +1,224 @@
+import json
+import math
+import random
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+import requests
+from graphql_relay import to_global_id
+
+from jobs.benchmarks import (
+    CREATE_JOB_MUTATION,
+    DELIVERY_JOBS_QUERY,
+    MARK_JOB_COMPLETED_MUTATION,
+    PAGE_SIZE,
+    VEHICLES_QUERY,
+    far_slot,
+)
+from jobs.models import Address, DeliveryJob
+from logistics.metrics import ANONYMOUS_OPERATION
+from vehicles.models import Vehicle
+
+# Rows variables of the synthetic mix are drawn from
+SAMPLE_SIZE = 1000
+
+# Relative weights of the operations of the synthetic mix, dashboard-like lists
+# first. Mutations are only mixed in on request, as they write to the database.
+READ_WEIGHTS = {
+    "deliveryJobs uncompleted": 3,
+    "deliveryJobs vehicle schedule": 3,
+    "deliveryJobs zip prefix": 2,
+    "vehicles by total income": 1,
+}
+MUTATION_WEIGHTS = {"createJob": 1, "markJobCompleted": 1}
+
+PERCENTILES = (50, 95, 99)
+
+
+def load_recorded(lines):
+    """
+    Reads recorded operations, one GraphQL request body per line as JSON (a
+    query, or a persisted query hash in extensions, with variables and
+    operationName), and returns `(name, body)` pairs. Operations are named as in
+    the metrics of the server, by their operationName.
+    """
+    operations = []
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            body = json.loads(line)
+        except ValueError:
+            raise ValueError(f"Line {number} is invalid JSON.")
+        if not isinstance(body, dict):
+            raise ValueError(f"Line {number} isn't a request body.")
+        operations.append((body.get("operationName") or ANONYMOUS_OPERATION, body))
+    return operations
+
+
+def build_mix(num_operations, mutations=False, seed=None):
+    """
+    Returns `(name, body)` pairs of a synthetic mix of the operations of
+    `jobs.benchmarks`, picked by weight, with variables drawn from the stored
+    vehicles, addresses and jobs. With `mutations`, jobs are also created, far
+    in the future and without a vehicle, and uncompleted jobs marked as
+    completed, each once.
+    """
+    rng = random.Random(seed)
+    vehicles = Vehicle.objects.order_by("registration")
+    registrations = list(vehicles.values_list("registration", flat=True)[:SAMPLE_SIZE])
+    addresses = list(
+        Address.objects.order_by("id").values(
+            "recipient",
+            "street_address",
+            "street_address_2",
+            "city",
+            "state",
+            "zip_code",
+        )[:SAMPLE_SIZE]
+    )
+    if not registrations or not addresses:
+        raise ValueError("There are no vehicles and addresses to draw variables from.")
+    completable = []
+    if mutations:
+        completable = list(
+            DeliveryJob.objects.filter(completed_at__isnull=True, vehicle__isnull=False)
+            .order_by("id")
+            .values_list("id", "delivery_slot_ends_at")[:num_operations]
+        )
+        rng.shuffle(completable)
+
+    def delivery_jobs(**variables):
+        return DELIVERY_JOBS_QUERY, {"first": PAGE_SIZE, **variables}
+
+    def create_job():
+        address = rng.choice(addresses)
+        starts_at, ends_at = far_slot(rng.randrange(100_000))
+        return CREATE_JOB_MUTATION, {
+            "input": {
+                "destination": {
+                    "recipient": address["recipient"],
+                    "streetAddress": address["street_address"],
+                    "streetAddress2": address["street_address_2"],
+                    "city": address["city"],
+                    "state": address["state"],
+                    "zipCode": address["zip_code"],
+                },
+                "income": "120.00",
+                "cost": "30.00",
+                "deliverySlotStartsAt": starts_at.isoformat(),
+                "deliverySlotEndsAt": ends_at.isoformat(),
+            }
+        }
+
+    def mark_job_completed():
+        job_id, ends_at = completable.pop()
+        return MARK_JOB_COMPLETED_MUTATION, {
+            "input": {
+                "id": to_global_id("DeliveryJobType", job_id),
+                "completedAt": ends_at.isoformat(),
+            }
+        }
+
+    builders = {
+        "deliveryJobs uncompleted": lambda: delivery_jobs(uncompleted=True),
+        "deliveryJobs vehicle schedule": lambda: delivery_jobs(
+            registration=rng.choice(registrations)
+        ),
+        "deliveryJobs zip prefix": lambda: delivery_jobs(
+            zipPrefix=rng.choice(addresses)["zip_code"][:2]
+        ),
+        "vehicles by total income": lambda: (VEHICLES_QUERY, {"first": PAGE_SIZE}),
+        "createJob": create_job,
+        "markJobCompleted": mark_job_completed,
+    }
+    weights = dict(READ_WEIGHTS)
+    if mutations:
+        weights.update(MUTATION_WEIGHTS)
+
+    operations = []
+    for _ in range(num_operations):
+        if not completable:
+            weights.pop("markJobCompleted", None)
+        (name,) = rng.choices(list(weights), list(weights.values()))
+        query, variables = builders[name]()
+        operations.append((name, {"query": query, "variables": variables}))
+    return operations
+
+
+def run_load(url, operations, concurrency=10, timeout=30):
+    """
+    Posts the bodies of `operations`, `(name, body)` pairs, to the GraphQL
+    endpoint at `url` from `concurrency` threads, each keeping its connection
+    alive. Returns the `(latency, error)` of each operation, in order, the error
+    being None for a response without errors, and the total time taken.
+    """
+    local = threading.local()
+    sessions = []
+
+    def post(operation):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+            sessions.append(session)
+        started = perf_counter()
+        try:
+            response = session.post(url, json=operation[1], timeout=timeout)
+        except requests.RequestException as e:
+            return perf_counter() - started, str(e) or type(e).__name__
+        return perf_counter() - started, get_error(response)
+
+    started = perf_counter()
+    try:
+        with ThreadPoolExecutor(concurrency) as executor:
+            outcomes = list(executor.map(post, operations))
+    finally:
+        for session in sessions:
+            session.close()
+    return outcomes, perf_counter() - started
+
+
+def get_error(response):
+    """Returns the first error of a GraphQL response, if any."""
+    try:
+        errors = response.json().get("errors")
+    except ValueError:
+        errors = None
+    if errors:
+        return errors[0].get("message", "Unknown error.")
+    if response.status_code != 200:
+        return f"HTTP {response.status_code}"
+    return None
+
+
+def summarize(operations, outcomes, elapsed):
+    """
+    Returns the throughput, latency percentiles and error rate of each operation
+    name, and of all operations under "total". Errors are counted by message.
+    """
+    by_name = defaultdict(list)
+    for (name, _), outcome in zip(operations, outcomes):
+        by_name[name].append(outcome)
+        by_name["total"].append(outcome)
+    results = {}
+    for name, name_outcomes in sorted(by_name.items()):
+        latencies = sorted(latency * 1000 for latency, _ in name_outcomes)
+        errors = Counter(error for _, error in name_outcomes if error is not None)
+        result = {
+            "requests": len(latencies),
+            "requests_per_second": round(len(latencies) / elapsed, 2),
+        }
+        for percentile in PERCENTILES:
+            # Nearest rank
+            position = math.ceil(len(latencies) * percentile / 100) - 1
+            result[f"p{percentile}_ms"] = round(latencies[max(0, position)], 3)
+        result["max_ms"] = round(latencies[-1], 3)
+        result["errors"] = sum(errors.values())
+        result["error_rate"] = round(result["errors"] / len(latencies), 4)
+        result["error_messages"] = dict(errors.most_common(5))
+        results[name] = result
+    # Last, as a footer
+    results["total"] = results.pop("total")
+    return results
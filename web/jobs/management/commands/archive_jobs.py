@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from jobs.archive import archive_jobs
+from jobs.partitions import month_start, previous_month
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves the delivery jobs completed before the start of the month some "
+        "months ago, and the addresses only they referred to, to the archive "
+        "tables. Queries only read the archive when filtering on completion dates "
+        "before it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months",
+            type=int,
+            default=12,
+            help="Number of whole months before the current one to keep jobs of",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10_000,
+            help="Number of jobs moved per transaction",
+        )
+
+    def handle(self, *args, **options):
+        completed_before = month_start(timezone.now())
+        for _ in range(max(0, options["months"])):
+            completed_before = previous_month(completed_before)
+        run = archive_jobs(completed_before, batch_size=max(1, options["batch_size"]))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {run.jobs} delivery jobs completed before "
+                f"{completed_before:%Y-%m-%d} and {run.addresses} addresses."
+            )
+        )
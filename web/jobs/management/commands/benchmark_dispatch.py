@@ -0,0 +1,56 @@
+import datetime
+import random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from jobs.dispatch import Schedule, solve
+
+
+class Command(BaseCommand):
+    help = "Times the dispatch solver on generated jobs and fleet, without the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--jobs", type=int, default=100_000, help="Number of jobs to assign"
+        )
+        parser.add_argument(
+            "--vehicles", type=int, default=2000, help="Number of vehicles"
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=7,
+            help="Number of days the slots of the jobs start over",
+        )
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        seconds = options["days"] * 86400
+        zip_codes = [f"{rng.randrange(100000):05}" for _ in range(5000)]
+        jobs = []
+        for job_id in range(options["jobs"]):
+            # Slots of one to six hours
+            starts_at = start + datetime.timedelta(seconds=rng.uniform(0, seconds))
+            ends_at = starts_at + datetime.timedelta(hours=rng.randint(1, 6))
+            jobs.append((job_id, starts_at, ends_at, rng.choice(zip_codes)))
+        schedules = {
+            f"V{number:05}": Schedule() for number in range(options["vehicles"])
+        }
+
+        started = perf_counter()
+        assignments = solve(jobs, schedules, centroids={})
+        elapsed = perf_counter() - started
+
+        loads = sorted(len(schedule.starts) for schedule in schedules.values())
+        self.stdout.write(
+            f"Assigned {len(assignments)} of {len(jobs)} jobs to "
+            f"{len(schedules)} vehicles in {elapsed:.2f}s "
+            f"({len(jobs) / elapsed:,.0f} jobs/s)"
+        )
+        self.stdout.write(
+            f"Jobs per vehicle: min {loads[0]}, median {loads[len(loads) // 2]}, "
+            f"max {loads[-1]}"
+        )
@@ -0,0 +1,95 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from jobs.models import DeliveryJob
+from jobs.schema import DeliveryJobFilter
+
+# Planner settings that leave only sequential scans, i.e. the plans the filters
+# got before the indexes existed
+WITHOUT_INDEXES = ("enable_indexscan", "enable_indexonlyscan", "enable_bitmapscan")
+
+
+class Command(BaseCommand):
+    help = (
+        "Explains common DeliveryJobFilter queries with and without index scans, "
+        "reporting the scans used and execution times"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--page-size", type=int, default=100, help="Number of jobs per page"
+        )
+
+    def handle(self, *args, **options):
+        sample = (
+            DeliveryJob.objects.select_related("destination", "vehicle")
+            .exclude(vehicle=None)
+            .order_by("id")
+            .first()
+        )
+        if sample is None:
+            raise CommandError(
+                "No jobs with a vehicle to sample, run `fake_data create` first."
+            )
+
+        for name, data in self.get_cases(sample).items():
+            queryset = DeliveryJobFilter(
+                data, queryset=DeliveryJob.objects.all()
+            ).qs.order_by("delivery_slot_starts_at", "id")[: options["page_size"]]
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name}: {data}"))
+            for label, disabled in (("seq scan", WITHOUT_INDEXES), ("indexed", ())):
+                plan = self.explain(queryset, disabled)
+                scans = ", ".join(sorted(set(self.get_scans(plan["Plan"]))))
+                self.stdout.write(
+                    f"  {label:<9} {plan['Execution Time']:>10.3f} ms  {scans}"
+                )
+
+    def get_cases(self, sample):
+        """Builds filters typical of the dashboards, using values from `sample`."""
+        destination = sample.destination
+        week_before = sample.delivery_slot_starts_at - timedelta(days=7)
+        return {
+            "recipient contains": {
+                "destination__recipient__contains": destination.recipient[1:5]
+            },
+            "street endswith": {
+                "destination__street_address__endswith": destination.street_address[-6:]
+            },
+            "city startswith": {"destination__city__startswith": destination.city[:4]},
+            "zip code startswith": {
+                "destination__zip_code__startswith": destination.zip_code[:3]
+            },
+            "state": {"destination__state": destination.state},
+            "created since": {"created_at__gte": sample.created_at},
+            "uncompleted": {"completed_at__isnull": True},
+            "completed since": {"completed_at__gte": sample.delivery_slot_starts_at},
+            "high income": {"income__gte": sample.income},
+            "low cost": {"cost__lt": sample.cost},
+            "slot window": {
+                "delivery_slot_starts_at__gte": week_before,
+                "delivery_slot_starts_at__lt": sample.delivery_slot_starts_at,
+            },
+            "slot ends by": {"delivery_slot_ends_at__lte": week_before},
+            "vehicle schedule": {
+                "vehicle__registration": sample.vehicle_id,
+                "delivery_slot_starts_at__gte": week_before,
+            },
+        }
+
+    def explain(self, queryset, disabled):
+        """Runs `EXPLAIN ANALYZE` on `queryset` with the given planner methods off."""
+        with transaction.atomic(), connection.cursor() as cursor:
+            for setting in disabled:
+                cursor.execute(f"SET LOCAL {setting} = off")
+            return json.loads(queryset.explain(format="json", analyze=True))[0]
+
+    def get_scans(self, plan):
+        """Yields a description of every scan in a plan tree."""
+        if "Scan" in plan["Node Type"]:
+            target = plan.get("Index Name") or plan.get("Relation Name", "")
+            yield f"{plan['Node Type']} {target}".strip()
+        for child in plan.get("Plans", ()):
+            yield from self.get_scans(child)
@@ -0,0 +1,123 @@
+import json
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from jobs.benchmarks import BENCHMARKS, get_regressions, get_sample, run_benchmarks
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Times key GraphQL operations and counts their SQL queries, failing if an "
+        "operation runs more queries than its bound. Everything the benchmarks "
+        "write, including generated data, is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--vehicles",
+            type=int,
+            default=0,
+            help="Number of vehicles to generate with fake_data before running",
+        )
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=0,
+            help="Number of delivery jobs to generate with fake_data before running",
+        )
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--iterations", type=int, default=10, help="Runs of each operation"
+        )
+        parser.add_argument(
+            "--only",
+            action="append",
+            help="Only run the benchmarks with this name (repeatable)",
+        )
+        parser.add_argument("--output", help="File to write the results to, as JSON")
+        parser.add_argument(
+            "--compare", help="JSON results of a previous run to compare with"
+        )
+
+    def handle(self, *args, **options):
+        benchmarks = [
+            benchmark
+            for benchmark in BENCHMARKS
+            if not options["only"] or benchmark.name in options["only"]
+        ]
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"]) as file:
+                baseline = json.load(file)["benchmarks"]
+
+        try:
+            with transaction.atomic():
+                if options["jobs"]:
+                    call_command(
+                        "fake_data",
+                        "create",
+                        vehicles=max(1, options["vehicles"]),
+                        jobs=options["jobs"],
+                        seed=options["seed"],
+                        method="copy",
+                        stdout=self.stderr,
+                    )
+                if get_sample() is None:
+                    raise CommandError(
+                        "No jobs with a vehicle to sample, pass --jobs or run "
+                        "`fake_data create` first."
+                    )
+                results = run_benchmarks(benchmarks, max(1, options["iterations"]))
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(
+            f"{'':<32}{'queries':>8}{'median ms':>12}{'p95 ms':>10}{'max ms':>10}"
+        )
+        for name, result in results.items():
+            line = (
+                f"{name:<32}{result['queries']:>8}{result['median_ms']:>12.2f}"
+                f"{result['p95_ms']:>10.2f}{result['max_ms']:>10.2f}"
+            )
+            previous = (baseline or {}).get(name)
+            if previous:
+                change = result["median_ms"] / previous["median_ms"] - 1
+                line += (
+                    f"  median {change:+.0%}, queries "
+                    f"{result['queries'] - previous['queries']:+d}"
+                )
+            self.stdout.write(line)
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(
+                    {
+                        "created_at": timezone.now().isoformat(),
+                        "options": {
+                            name: options[name]
+                            for name in ("vehicles", "jobs", "seed", "iterations")
+                        },
+                        "benchmarks": results,
+                    },
+                    file,
+                    indent=2,
+                )
+
+        regressions = get_regressions(results)
+        if regressions:
+            raise CommandError(
+                "More SQL queries than allowed: "
+                + ", ".join(
+                    f"{name} ({results[name]['queries']} > "
+                    f"{results[name]['max_queries']})"
+                    for name in regressions
+                )
+            )
@@ -0,0 +1,122 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import AsyncClient, Client, override_settings
+
+from logistics.result_cache import get_result_cache
+
+# A dashboard-like operation, with independent root fields
+QUERY = """
+    query Dashboard($first: Int) {
+        vehicles(first: $first) {
+            edges { node { registration totalIncome totalCost } }
+        }
+        deliveryJobs(first: $first, completedAt_Isnull: true) {
+            totalCount
+            edges { node { income destination { city } } }
+        }
+    }
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the throughput of one process serving a dashboard query through "
+        "the WSGI view and through the async view over ASGI"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests", type=int, default=200, help="Number of requests per view"
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=1,
+            help="Number of threads serving the WSGI view, as in a threaded worker",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=10,
+            help="Number of requests in flight on the async view",
+        )
+        parser.add_argument(
+            "--page-size", type=int, default=20, help="Number of nodes per connection"
+        )
+        parser.add_argument(
+            "--result-cache",
+            action="store_true",
+            help="Serve repeated requests from the result cache, which is off by "
+            "default so every request executes",
+        )
+
+    def handle(self, *args, **options):
+        data = {"query": QUERY, "variables": {"first": options["page_size"]}}
+        num_requests = options["requests"]
+
+        # The test clients send requests to "testserver"
+        overrides = {"ALLOWED_HOSTS": [*settings.ALLOWED_HOSTS, "testserver"]}
+        if not options["result_cache"]:
+            overrides["GRAPHQL_RESULT_CACHE"] = None
+        with override_settings(**overrides):
+            get_result_cache.cache_clear()
+            try:
+                for label, run in (
+                    (f"WSGI, {options['threads']} thread(s)", self.run_wsgi),
+                    (f"ASGI, {options['concurrency']} in flight", self.run_asgi),
+                ):
+                    elapsed = run(data, num_requests, options)
+                    self.stdout.write(
+                        f"{label:<28} {num_requests / elapsed:>8.1f} requests/s"
+                    )
+            finally:
+                get_result_cache.cache_clear()
+
+    def run_wsgi(self, data, num_requests, options):
+        """Serves the requests through the sync view, returning the time taken."""
+        client = Client()
+
+        def post(_):
+            try:
+                return self.check_response(
+                    client.post("/graphql/", data, content_type="application/json")
+                )
+            finally:
+                close_old_connections()
+
+        started_at = perf_counter()
+        with ThreadPoolExecutor(options["threads"]) as executor:
+            list(executor.map(post, range(num_requests)))
+        return perf_counter() - started_at
+
+    def run_asgi(self, data, num_requests, options):
+        """Serves the requests through the async view, returning the time taken."""
+        client = AsyncClient()
+
+        async def run():
+            semaphore = asyncio.Semaphore(options["concurrency"])
+
+            async def post():
+                async with semaphore:
+                    self.check_response(
+                        await client.post(
+                            "/graphql/async/", data, content_type="application/json"
+                        )
+                    )
+
+            started_at = perf_counter()
+            await asyncio.gather(*(post() for _ in range(num_requests)))
+            return perf_counter() - started_at
+
+        return asyncio.run(run())
+
+    def check_response(self, response):
+        result = response.json()
+        if "errors" in result:
+            raise RuntimeError(f"The benchmark query failed: {result['errors']}")
+        return result
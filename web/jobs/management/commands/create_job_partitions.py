@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from jobs.partitions import create_future_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates the monthly partitions of delivery jobs ahead of time, and those "
+        "of months with jobs in the default partition, moving them out of it"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=12,
+            help="Number of months after the current one to create partitions for",
+        )
+
+    def handle(self, *args, **options):
+        created = create_future_partitions(max(0, options["months_ahead"]))
+        for name in created:
+            self.stdout.write(f"Created {name}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Created {len(created)} delivery job partitions.")
+        )
@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, Value, When
+
+from jobs.models import Address, ArchivedDeliveryJob, DeliveryJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Normalizes addresses stored before deduplication and merges those with "
+        "the same content, repointing their delivery jobs, archived ones included"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of addresses processed per transaction",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        merged = hashed = 0
+
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    Address.objects.filter(content_hash=None)
+                    .order_by("id")
+                    .select_for_update()[:batch_size]
+                )
+                if not batch:
+                    break
+                batch_merged, batch_hashed = self.merge(batch)
+            merged += batch_merged
+            hashed += batch_hashed
+            self.stdout.write(f"Merged {merged} addresses, kept {hashed}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deduplicated addresses: merged {merged}, normalized {hashed}."
+            )
+        )
+
+    def merge(self, batch):
+        """
+        Hashes a batch of legacy addresses, keeping the first address seen for each
+        hash (preferring one that is already hashed) and merging the others into it.
+        """
+        for address in batch:
+            address.normalize()
+        canonical_ids = dict(
+            Address.objects.filter(
+                content_hash__in={address.content_hash for address in batch}
+            ).values_list("content_hash", "id")
+        )
+
+        kept, duplicates = [], {}
+        for address in batch:
+            canonical_id = canonical_ids.setdefault(address.content_hash, address.id)
+            if canonical_id == address.id:
+                kept.append(address)
+            else:
+                duplicates[address.id] = canonical_id
+
+        if duplicates:
+            canonical_destination = Case(
+                *(
+                    When(destination_id=duplicate_id, then=Value(canonical_id))
+                    for duplicate_id, canonical_id in duplicates.items()
+                )
+            )
+            # Archived jobs may still refer to a hot address, see
+            # ArchivedDeliveryJob, without a foreign key to repoint them
+            for model in (DeliveryJob, ArchivedDeliveryJob):
+                model.objects.filter(destination_id__in=duplicates).update(
+                    destination_id=canonical_destination
+                )
+            Address.objects.filter(id__in=duplicates).delete()
+        Address.objects.bulk_update(
+            kept, [*Address.HASHED_FIELDS, "content_hash"], batch_size=len(batch)
+        )
+        return len(duplicates), len(kept)
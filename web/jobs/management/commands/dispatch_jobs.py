@@ -0,0 +1,61 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from jobs.dispatch import dispatch_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Assigns the unassigned delivery jobs with a slot starting in the coming "
+        "days to vehicles whose slots they don't overlap, balancing the number of "
+        "jobs per vehicle and preferring vehicles whose previous job is nearby"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start",
+            help="The earliest slot start of the jobs to assign, as an ISO 8601 "
+            "datetime (now by default)",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=1,
+            help="Number of days of slot starts to assign jobs of",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of assignments written per transaction",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Compute the assignments without writing them",
+        )
+
+    def handle(self, *args, **options):
+        starts_after = timezone.now()
+        if options["start"]:
+            starts_after = parse_datetime(options["start"])
+            if starts_after is None:
+                raise CommandError(f"Invalid start: {options['start']}")
+            if timezone.is_naive(starts_after):
+                starts_after = timezone.make_aware(starts_after)
+        starts_before = starts_after + datetime.timedelta(days=options["days"])
+        num_jobs, assigned = dispatch_jobs(
+            starts_after,
+            starts_before,
+            batch_size=max(1, options["batch_size"]),
+            dry_run=options["dry_run"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{'Would assign' if options['dry_run'] else 'Assigned'} {assigned} "
+                f"of {num_jobs} unassigned delivery jobs."
+            )
+        )
@@ -1,17 +1,43 @@
 import datetime
+import multiprocessing
 import random
+from decimal import Decimal
+from functools import partial
 
 from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction
 
 from faker import Faker
-import pytz
 
-from jobs.models import DeliveryJob, Address
-from vehicles.models import Vehicle
+from jobs.models import DeliveryJob, Address, rollup_deltas
+from vehicles.models import Vehicle, VehicleRollup
 
+# Distinct values generated per chunk for each address column. Rows pick from
+# these, which is far cheaper than calling Faker for every row.
+POOL_SIZE = 1000
 
-us_timezones = ['US/Eastern', 'US/Central', 'US/Mountain', 'US/Pacific', 'US/Alaska', 'US/Hawaii']
-fake = Faker()
+ADDRESS_COLUMNS = (
+    "id",
+    "recipient",
+    "street_address",
+    "street_address_2",
+    "city",
+    "state",
+    "zip_code",
+    "content_hash",
+)
+JOB_COLUMNS = (
+    "id",
+    "vehicle_id",
+    "destination_id",
+    "created_at",
+    "completed_at",
+    "income",
+    "cost",
+    "delivery_slot_starts_at",
+    "delivery_slot_ends_at",
+    "updated_at",
+)
 
 
 class Command(BaseCommand):
@@ -19,67 +45,243 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("action", choices=["create", "destroy"])
-        parser.add_argument('--vehicles', type=int, default=2, help="Number of vehicles to create")
-        parser.add_argument('--jobs', type=int, default=10, help="Number of delivery jobs to create")
-
+        parser.add_argument(
+            "--vehicles", type=int, default=2, help="Number of vehicles to create"
+        )
+        parser.add_argument(
+            "--jobs", type=int, default=10, help="Number of delivery jobs to create"
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            help="Seed for the generated data, the same seed gives the same rows",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=10_000,
+            help="Number of jobs generated and loaded per transaction",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of processes generating and loading chunks",
+        )
+        parser.add_argument(
+            "--method",
+            choices=["bulk", "copy"],
+            default="bulk",
+            help="Load rows with batched bulk_create, or with Postgres COPY",
+        )
 
     def handle(self, *args, **options):
 
         action = options["action"]
-        num_vehicles = int(options["vehicles"])
-        num_jobs = int(options["jobs"])
+        num_vehicles = max(1, int(options["vehicles"]))
+        num_jobs = max(1, int(options["jobs"]))
 
         if action == "destroy":
-            Vehicle.objects.all().delete()
-            Address.objects.all().delete()
+            # TRUNCATE rather than the ORM's cascade, which loads every row
+            tables = ", ".join(
+                connection.ops.quote_name(model._meta.db_table)
+                for model in (DeliveryJob, Address, Vehicle)
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(f"TRUNCATE {tables} CASCADE")
             self.stdout.write(self.style.SUCCESS("Data destroyed."))
 
         elif action == "create":
-            # Create vehicles
-            vehicles = [Vehicle(registration=fake.license_plate()) for _ in range(max(1, num_vehicles))]
-            Vehicle.objects.bulk_create(vehicles)
-
-            # Create delivery jobs
-            for _ in range(max(1, num_jobs)):
-                address = Address.objects.create(
-                    recipient=fake.name(),
-                    street_address=fake.street_address(),
-                    street_address_2=fake.secondary_address() if fake.boolean() else '',
-                    city=fake.city(),
-                    state=fake.state_abbr(),
-                    zip_code=fake.zipcode()
-                )
-                vehicle = random.choice(vehicles)
+            seed = options["seed"]
+            if seed is None:
+                seed = random.randrange(2**32)
+            chunk_size = max(1, options["chunk_size"])
 
+            registrations = self.create_vehicles(num_vehicles, seed)
+            self.stdout.write(
+                self.style.SUCCESS(f"Generated {num_vehicles} vehicle objects")
+            )
+
+            # Reserve primary keys up front so every chunk, in any process, knows
+            # the ids it writes and the output only depends on the seed
+            address_start = reserve_ids(Address, num_jobs)
+            job_start = reserve_ids(DeliveryJob, num_jobs)
+            chunks = [
                 (
-                    delivery_slot_starts_at,
-                    delivery_slot_ends_at,
-                    completed_at,
-                ) = self.generate_datetimes()
-
-                DeliveryJob.objects.create(
-                    vehicle_id=vehicle.registration,
-                    destination=address,
-                    completed_at=completed_at,
-                    income=fake.pydecimal(left_digits=4, right_digits=2, positive=True),
-                    cost=fake.pydecimal(left_digits=3, right_digits=2, positive=True),
-                    delivery_slot_starts_at=delivery_slot_starts_at,
-                    delivery_slot_ends_at=delivery_slot_ends_at,
+                    index,
+                    min(chunk_size, num_jobs - offset),
+                    address_start + offset,
+                    job_start + offset,
                 )
+                for index, offset in enumerate(range(0, num_jobs, chunk_size))
+            ]
+            load = partial(
+                load_chunk,
+                seed=seed,
+                registrations=registrations,
+                year=datetime.datetime.now(datetime.timezone.utc).year,
+                method=options["method"],
+            )
+
+            workers = max(1, options["workers"])
+            created = 0
+            if workers == 1:
+                results = map(load, chunks)
+            else:
+                # Children must open their own database connections
+                connections.close_all()
+                pool = multiprocessing.Pool(workers)
+                results = pool.imap_unordered(load, chunks)
+            for count in results:
+                created += count
+                self.stdout.write(f"Loaded {created}/{num_jobs} delivery jobs")
+            if workers > 1:
+                pool.close()
+                pool.join()
+
+            self.stdout.write(
+                self.style.SUCCESS(f"Generated {num_jobs} delivery job objects")
+            )
+            self.stdout.write(f"Seed: {seed}")
+
+    def create_vehicles(self, num_vehicles, seed):
+        """Creates `num_vehicles` vehicles with unique registrations."""
+        vehicle_fake = Faker()
+        vehicle_fake.seed_instance(seed)
+        registrations = set()
+        while len(registrations) < num_vehicles:
+            registrations.add(vehicle_fake.license_plate())
+        registrations = sorted(registrations)
+        Vehicle.objects.bulk_create(
+            [Vehicle(registration=registration) for registration in registrations],
+            ignore_conflicts=True,
+        )
+        return registrations
+
+
+def reserve_ids(model, count):
+    """
+    Advances the primary key sequence of `model` by `count`, returning the first
+    id of the reserved block.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+            "nextval(pg_get_serial_sequence(%s, 'id')) + %s - 1)",
+            [table, table, count],
+        )
+        return cursor.fetchone()[0] - count + 1
+
+
+def load_chunk(chunk, seed, registrations, year, method):
+    """
+    Generates and loads one chunk of addresses and jobs in a single transaction,
+    returning the number of jobs loaded.
+
+    The chunk's random state is derived from the seed and its index only, so the
+    rows don't depend on how chunks are spread across processes.
+    """
+    index, count, address_start, job_start = chunk
+    rng = random.Random(f"{seed}:{index}")
+    chunk_fake = Faker()
+    chunk_fake.seed_instance(rng.randrange(2**32))
+    pools = {
+        "recipient": [chunk_fake.name() for _ in range(POOL_SIZE)],
+        "street_address": [chunk_fake.street_address() for _ in range(POOL_SIZE)],
+        "street_address_2": [chunk_fake.secondary_address() for _ in range(POOL_SIZE)],
+        "city": [chunk_fake.city() for _ in range(POOL_SIZE)],
+        "state": [chunk_fake.state_abbr() for _ in range(POOL_SIZE)],
+        "zip_code": [chunk_fake.zipcode() for _ in range(POOL_SIZE)],
+    }
+
+    year_start = datetime.datetime(year, 1, 1, tzinfo=datetime.timezone.utc)
+    year_seconds = (
+        datetime.datetime(year + 1, 1, 1, tzinfo=datetime.timezone.utc) - year_start
+    ).total_seconds()
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    addresses, jobs = [], []
+    address_ids = {}
+    for offset in range(count):
+        address = Address(
+            id=address_start + offset,
+            recipient=rng.choice(pools["recipient"]),
+            street_address=rng.choice(pools["street_address"]),
+            street_address_2=(
+                rng.choice(pools["street_address_2"]) if rng.random() < 0.5 else ""
+            ),
+            city=rng.choice(pools["city"]),
+            state=rng.choice(pools["state"]),
+            zip_code=rng.choice(pools["zip_code"]),
+        )
+        address.normalize()
+        # Addresses are unique by content, repeats deliver to the first one
+        address_id = address_ids.setdefault(address.content_hash, address.id)
+        if address_id == address.id:
+            addresses.append(
+                tuple(getattr(address, column) for column in ADDRESS_COLUMNS)
+            )
+
+        # Slots fall within the current year and end later in it
+        start_seconds = rng.uniform(0, year_seconds)
+        end_seconds = rng.uniform(start_seconds, year_seconds)
+        starts_at = year_start + datetime.timedelta(seconds=start_seconds)
+        ends_at = year_start + datetime.timedelta(seconds=end_seconds)
+        # Half of the jobs are completed during the delivery slot
+        completed_at = (
+            year_start
+            + datetime.timedelta(seconds=rng.uniform(start_seconds, end_seconds))
+            if rng.random() < 0.5
+            else None
+        )
+        jobs.append(
+            (
+                job_start + offset,
+                rng.choice(registrations),
+                address_id,
+                now,
+                completed_at,
+                Decimal(rng.randrange(1, 1_000_000)) / 100,
+                Decimal(rng.randrange(1, 100_000)) / 100,
+                starts_at,
+                ends_at,
+                now,
+            )
+        )
+
+    with transaction.atomic():
+        if method == "copy":
+            copy_rows(Address, ADDRESS_COLUMNS, addresses)
+            copy_rows(DeliveryJob, JOB_COLUMNS, jobs)
+        else:
+            Address.objects.bulk_create(
+                [Address(**dict(zip(ADDRESS_COLUMNS, row))) for row in addresses],
+                batch_size=1000,
+            )
+            DeliveryJob.objects.bulk_create(
+                [DeliveryJob(**dict(zip(JOB_COLUMNS, row))) for row in jobs],
+                batch_size=1000,
+            )
+        # Neither COPY nor bulk_create go through save(), which keeps the rollups
+        VehicleRollup.objects.apply(
+            rollup_deltas(
+                added=[
+                    (vehicle_id, completed_at is not None, income, cost)
+                    for _, vehicle_id, _, _, completed_at, income, cost, *_ in jobs
+                ]
+            )
+        )
+    return count
+
 
-            self.stdout.write(self.style.SUCCESS(f"Generated {num_vehicles} vehicle objects"))
-            self.stdout.write(self.style.SUCCESS(f"Generated {num_jobs} delivery job objects"))
-
-    def generate_datetimes(self):
-        timezone_str = random.choice(us_timezones)  # Randomly pick a timezone
-        timezone = pytz.timezone(timezone_str)
-        now = datetime.datetime.now(timezone)
-        max_end_time = now.replace(day=31, month=12)
-        start_time = fake.date_time_between_dates(datetime_start=now.replace(day=1, month=1),
-                                                  datetime_end=max_end_time).astimezone(timezone)
-        end_time = fake.date_time_between_dates(datetime_start=start_time, datetime_end=max_end_time).astimezone(
-            timezone)  # Guarantee end time is later
-        completed_at = None if fake.boolean() else fake.date_time_between_dates(
-            datetime_start=start_time, datetime_end=end_time
-        ).astimezone(timezone)  # Half of the jobs are completed during the delivery slot
-        return start_time, end_time, completed_at
\ No newline at end of file
+def copy_rows(model, columns, rows):
+    """Loads `rows` into the table of `model` with Postgres `COPY`."""
+    quote_name = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        with cursor.copy(
+            f"COPY {quote_name(model._meta.db_table)} "
+            f"({', '.join(quote_name(column) for column in columns)}) FROM STDIN"
+        ) as copy:
+            for row in rows:
+                copy.write_row(row)
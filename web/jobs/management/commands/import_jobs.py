@@ -0,0 +1,306 @@
+import csv
+import json
+import os
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from jobs.cache import invalidate_job_results
+from jobs.models import Address, DeliveryJob, JobImport, rollup_deltas
+from vehicles.models import Vehicle, VehicleRollup
+
+# The columns of the imported rows, as exported by /export/delivery-jobs/ (whose
+# `id` column is ignored). Only vehicle_registration, created_at, completed_at and
+# street_address_2 are optional.
+JOB_FIELDS = (
+    "created_at",
+    "completed_at",
+    "income",
+    "cost",
+    "delivery_slot_starts_at",
+    "delivery_slot_ends_at",
+)
+ADDRESS_FIELDS = (
+    "recipient",
+    "street_address",
+    "street_address_2",
+    "city",
+    "state",
+    "zip_code",
+    "content_hash",
+)
+STAGING_TABLE = "import_jobs_staging"
+STAGING_COLUMNS = ("row_number", "vehicle_id", *JOB_FIELDS, *ADDRESS_FIELDS)
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports delivery jobs, with their addresses and vehicles, from a CSV or "
+        "NDJSON file. Rows are validated and loaded in chunks, each committed with "
+        "the progress of the import, so running the command again on an "
+        "interrupted import resumes it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="The CSV or NDJSON file to import")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "ndjson"],
+            help="The format of the file, by default from its extension",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=10_000,
+            help="Number of rows validated and loaded per transaction",
+        )
+        parser.add_argument(
+            "--rejects",
+            help="Append the rejected rows, with their errors, to this NDJSON file "
+            "rather than print them",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Read the file from its first row, even if it was (partly) "
+            "imported before. Jobs imported then are kept.",
+        )
+
+    def handle(self, *args, **options):
+        path = os.path.abspath(options["path"])
+        export_format = options["format"] or (
+            "csv" if path.lower().endswith(".csv") else "ndjson"
+        )
+        chunk_size = max(1, options["chunk_size"])
+        size = os.path.getsize(path)
+
+        job_import, created = JobImport.objects.get_or_create(
+            source=path, defaults={"size": size}
+        )
+        if options["restart"] and not created:
+            job_import.size = size
+            job_import.rows_read = job_import.imported = job_import.rejected = 0
+            job_import.finished_at = None
+            job_import.save()
+        elif job_import.size != size:
+            raise CommandError(
+                f"{path} changed since it was first imported, use --restart to "
+                "import it again."
+            )
+        elif job_import.finished_at is not None:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{path} was already imported at {job_import.finished_at}."
+                )
+            )
+            return
+        elif job_import.rows_read:
+            self.stdout.write(f"Resuming after row {job_import.rows_read}")
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} (
+                    row_number bigint,
+                    vehicle_id varchar(10),
+                    created_at timestamptz,
+                    completed_at timestamptz,
+                    income numeric(6, 2),
+                    cost numeric(6, 2),
+                    delivery_slot_starts_at timestamptz,
+                    delivery_slot_ends_at timestamptz,
+                    recipient varchar(100),
+                    street_address varchar(100),
+                    street_address_2 varchar(100),
+                    city varchar(50),
+                    state varchar(2),
+                    zip_code varchar(10),
+                    content_hash varchar(64)
+                )
+                """
+            )
+
+        with open(path, newline="", encoding="utf-8") as file:
+            if export_format == "csv":
+                rows = csv.DictReader(file)
+            else:
+                # Parsed with the validation, rejecting malformed lines
+                rows = (line for line in file if line.strip())
+            rows = enumerate(rows, 1)
+            # Rows are only parsed, not validated, until the resumed one
+            rows = islice(rows, job_import.rows_read, None)
+            while chunk := list(islice(rows, chunk_size)):
+                rejects = self.load_chunk(job_import, chunk)
+                self.report_rejects(rejects, options["rejects"])
+                self.stdout.write(
+                    f"Read {job_import.rows_read} rows: imported "
+                    f"{job_import.imported} jobs, rejected {job_import.rejected}"
+                )
+
+        job_import.finished_at = timezone.now()
+        job_import.save(update_fields=["finished_at"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {job_import.imported} delivery jobs from {path}, "
+                f"rejected {job_import.rejected} rows."
+            )
+        )
+
+    def load_chunk(self, job_import, chunk):
+        """
+        Validates a chunk of numbered rows and loads the valid ones, recording the
+        progress in the same transaction. Returns the rejected rows with their
+        errors.
+        """
+        staged, rejects, rollup_rows = [], [], []
+        for row_number, row in chunk:
+            try:
+                values = self.clean_row(row)
+            except ValidationError as e:
+                rejects.append({"row": row_number, "errors": e.messages, "data": row})
+                continue
+            staged.append((row_number, *values))
+            vehicle_id, _, completed_at, income, cost, *_ = values
+            rollup_rows.append((vehicle_id, completed_at is not None, income, cost))
+
+        with transaction.atomic():
+            # Another run of the same import would have moved past this chunk
+            locked = JobImport.objects.select_for_update().get(pk=job_import.pk)
+            if locked.rows_read != job_import.rows_read:
+                raise CommandError(f"{job_import.source} is imported by another run.")
+
+            imported = self.insert_rows(staged) if staged else 0
+            VehicleRollup.objects.apply(rollup_deltas(added=rollup_rows))
+            job_import.rows_read += len(chunk)
+            job_import.imported += imported
+            job_import.rejected += len(rejects)
+            job_import.save(update_fields=["rows_read", "imported", "rejected"])
+            if imported:
+                invalidate_job_results(
+                    registrations=[vehicle_id for vehicle_id, *_ in rollup_rows]
+                )
+        return rejects
+
+    def clean_row(self, row):
+        """
+        Returns the values of a row in `STAGING_COLUMNS` order (but the row number),
+        raising ValidationError if it isn't valid.
+        """
+        if isinstance(row, str):
+            try:
+                row = json.loads(row)
+            except ValueError as e:
+                raise ValidationError(f"Invalid JSON: {e}")
+            if not isinstance(row, dict):
+                raise ValidationError("Rows must be JSON objects.")
+        # Empty CSV cells and JSON nulls are missing values
+        values = {
+            name: value.strip() if isinstance(value, str) else value
+            for name, value in row.items()
+        }
+        values = {name: value for name, value in values.items() if value != ""}
+        registration = values.get("vehicle_registration")
+        if registration is not None:
+            registration = Vehicle._meta.get_field("registration").clean(
+                registration, None
+            )
+        address = Address(
+            **{
+                name: values.get(name) or ""
+                for name in ADDRESS_FIELDS
+                if name != "content_hash"
+            }
+        )
+        job = DeliveryJob(
+            **{name: values.get(name) for name in JOB_FIELDS if name != "created_at"}
+        )
+        address.full_clean(validate_unique=False, validate_constraints=False)
+        job.full_clean(
+            exclude=["vehicle", "destination"],
+            validate_unique=False,
+            validate_constraints=False,
+        )
+        # Historical jobs keep their creation time
+        job.created_at = DeliveryJob._meta.get_field("created_at").to_python(
+            values.get("created_at")
+        )
+        address.normalize()
+        return (
+            registration,
+            *(getattr(job, name) for name in JOB_FIELDS),
+            *(getattr(address, name) for name in ADDRESS_FIELDS),
+        )
+
+    def insert_rows(self, staged):
+        """
+        Copies validated rows into the staging table, then creates their vehicles,
+        addresses (reusing stored ones) and jobs with one statement each. Returns
+        the number of jobs created.
+        """
+        quote_name = connection.ops.quote_name
+        address_columns = ", ".join(ADDRESS_FIELDS)
+        now = timezone.now()
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+            with cursor.copy(
+                f"COPY {STAGING_TABLE} ({', '.join(STAGING_COLUMNS)}) FROM STDIN"
+            ) as copy:
+                for row in staged:
+                    copy.write_row(row)
+
+            cursor.execute(
+                f"""
+                INSERT INTO {quote_name(Vehicle._meta.db_table)} (registration)
+                SELECT DISTINCT vehicle_id FROM {STAGING_TABLE}
+                WHERE vehicle_id IS NOT NULL
+                ON CONFLICT DO NOTHING
+                """
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {quote_name(Address._meta.db_table)} ({address_columns})
+                SELECT DISTINCT ON (content_hash) {address_columns}
+                FROM {STAGING_TABLE}
+                ORDER BY content_hash, row_number
+                ON CONFLICT (content_hash) DO NOTHING
+                """
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {quote_name(DeliveryJob._meta.db_table)} (
+                    vehicle_id, destination_id, created_at, completed_at, income,
+                    cost, delivery_slot_starts_at, delivery_slot_ends_at, updated_at
+                )
+                SELECT
+                    staged.vehicle_id,
+                    address.id,
+                    coalesce(staged.created_at, %(now)s),
+                    staged.completed_at,
+                    staged.income,
+                    staged.cost,
+                    staged.delivery_slot_starts_at,
+                    staged.delivery_slot_ends_at,
+                    %(now)s
+                FROM {STAGING_TABLE} staged
+                JOIN {quote_name(Address._meta.db_table)} address
+                    ON address.content_hash = staged.content_hash
+                ORDER BY staged.row_number
+                """,
+                {"now": now},
+            )
+            return cursor.rowcount
+
+    def report_rejects(self, rejects, path):
+        """Appends rejected rows to the rejects file, or prints them."""
+        if not rejects:
+            return
+        if path is None:
+            for reject in rejects:
+                self.stderr.write(f"Row {reject['row']}: {' '.join(reject['errors'])}")
+            return
+        with open(path, "a", encoding="utf-8") as file:
+            for reject in rejects:
+                file.write(json.dumps(reject) + "\n")
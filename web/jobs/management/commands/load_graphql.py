@@ -0,0 +1,120 @@
+import json
+from itertools import cycle, islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from jobs.load import build_mix, load_recorded, run_load, summarize
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives a GraphQL endpoint with concurrent requests, replaying recorded "
+        "operations or a synthetic mix of the schema's queries (and mutations, "
+        "with --mutations), and reports the throughput, latency percentiles and "
+        "error rate of each operation"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            default="http://localhost:8000/graphql/",
+            help="GraphQL endpoint to send requests to",
+        )
+        parser.add_argument(
+            "--replay",
+            help="File of recorded operations to replay, one request body per line "
+            "as JSON (query, variables and operationName)",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            help="Number of requests to send, cycling through replayed operations "
+            "(default: each replayed operation once, or 1000 synthetic ones)",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=10, help="Number of requests in flight"
+        )
+        parser.add_argument(
+            "--mutations",
+            action="store_true",
+            help="Mix in mutations creating and completing jobs, which are kept",
+        )
+        parser.add_argument("--seed", type=int, help="Seed of the synthetic mix")
+        parser.add_argument(
+            "--timeout", type=float, default=30, help="Seconds to wait for a response"
+        )
+        parser.add_argument("--output", help="File to write the results to, as JSON")
+
+    def handle(self, *args, **options):
+        num_requests = options["requests"]
+        if options["replay"]:
+            with open(options["replay"]) as file:
+                try:
+                    operations = load_recorded(file)
+                except ValueError as e:
+                    raise CommandError(str(e))
+            if not operations:
+                raise CommandError("There are no operations to replay.")
+            if num_requests is not None:
+                operations = list(islice(cycle(operations), num_requests))
+        else:
+            # Variables are drawn from the database of this project's settings
+            try:
+                operations = build_mix(
+                    1000 if num_requests is None else num_requests,
+                    mutations=options["mutations"],
+                    seed=options["seed"],
+                )
+            except ValueError as e:
+                raise CommandError(f"{e} Run `fake_data create` first.")
+        if not operations:
+            raise CommandError("The number of requests must be positive.")
+
+        outcomes, elapsed = run_load(
+            options["url"],
+            operations,
+            max(1, options["concurrency"]),
+            options["timeout"],
+        )
+        results = summarize(operations, outcomes, elapsed)
+
+        self.stdout.write(
+            f"{'':<32}{'requests':>9}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}"
+            f"{'p99 ms':>10}{'errors':>8}"
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<32}{result['requests']:>9}"
+                f"{result['requests_per_second']:>9.1f}{result['p50_ms']:>10.2f}"
+                f"{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+                f"{result['error_rate']:>8.1%}"
+            )
+        for name, result in results.items():
+            if name == "total":
+                continue
+            for message, count in result["error_messages"].items():
+                self.stderr.write(f"{name}: {count} x {message}")
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(
+                    {
+                        "created_at": timezone.now().isoformat(),
+                        "options": {
+                            name: options[name]
+                            for name in (
+                                "url",
+                                "replay",
+                                "requests",
+                                "concurrency",
+                                "mutations",
+                                "seed",
+                            )
+                        },
+                        "elapsed_seconds": round(elapsed, 3),
+                        "operations": results,
+                    },
+                    file,
+                    indent=2,
+                )
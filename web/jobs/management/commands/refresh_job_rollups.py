@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from jobs.analytics import refresh_job_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Refreshes the daily job rollups analytics are served from, recomputing "
+        "the days with jobs changed since the last refresh"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Recompute every day, which also accounts for deleted jobs and "
+            "jobs moved to another day",
+        )
+
+    def handle(self, *args, **options):
+        refresh = refresh_job_rollups(full=options["full"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Refreshed job rollups: recomputed {refresh.days} days, complete "
+                f"until {refresh.complete_until}."
+            )
+        )
@@ -0,0 +1,106 @@
+# Generated by Django 5.0.14 on 2026-10-17 03:58
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import (
+    AddIndexConcurrently,
+    TrigramExtension,
+)
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently so large tables stay writable meanwhile
+    atomic = False
+
+    dependencies = [
+        ("jobs", "0001_initial"),
+        ("vehicles", "0001_initial"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name="address",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["recipient"],
+                name="address_recipient_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="address",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["street_address"],
+                name="address_street_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="address",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["street_address_2"],
+                name="address_street_2_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="address",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["city"],
+                name="address_city_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="address",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["zip_code"],
+                name="address_zip_code_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="address",
+            index=models.Index(fields=["state"], name="address_state_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="deliveryjob",
+            index=models.Index(
+                fields=["created_at"], name="deliveryjob_created_at_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="deliveryjob",
+            index=models.Index(
+                fields=["completed_at"], name="deliveryjob_completed_at_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="deliveryjob",
+            index=models.Index(fields=["income"], name="deliveryjob_income_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="deliveryjob",
+            index=models.Index(fields=["cost"], name="deliveryjob_cost_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="deliveryjob",
+            index=models.Index(
+                fields=["delivery_slot_starts_at", "id"],
+                name="deliveryjob_slot_start_id_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="deliveryjob",
+            index=models.Index(
+                fields=["delivery_slot_ends_at"], name="deliveryjob_slot_ends_at_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="deliveryjob",
+            index=models.Index(
+                fields=["vehicle", "delivery_slot_starts_at"],
+                name="deliveryjob_vehicle_slot_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.14 on 2026-10-17 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("jobs", "0002_delivery_job_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="address",
+            name="content_hash",
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name="address",
+            constraint=models.UniqueConstraint(
+                fields=("content_hash",), name="address_content_hash_key"
+            ),
+        ),
+    ]
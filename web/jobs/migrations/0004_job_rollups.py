@@ -0,0 +1,69 @@
+# Generated by Django 5.0.14 on 2026-10-17 04:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("jobs", "0003_address_content_hash"),
+        ("vehicles", "0002_vehiclerollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JobRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("basis", models.CharField(max_length=32)),
+                ("day", models.DateField()),
+                ("dimension", models.CharField(blank=True, max_length=16)),
+                ("key", models.CharField(blank=True, max_length=10)),
+                ("job_count", models.IntegerField()),
+                ("completed_count", models.IntegerField()),
+                ("income", models.DecimalField(decimal_places=2, max_digits=14)),
+                ("cost", models.DecimalField(decimal_places=2, max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="JobRollupRefresh",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("refreshed_at", models.DateTimeField()),
+                ("complete_until", models.DateField()),
+                ("full", models.BooleanField(default=False)),
+                ("days", models.IntegerField(default=0)),
+            ],
+            options={
+                "get_latest_by": "refreshed_at",
+            },
+        ),
+        migrations.AddField(
+            model_name="deliveryjob",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddConstraint(
+            model_name="jobrollup",
+            constraint=models.UniqueConstraint(
+                fields=("basis", "dimension", "day", "key"),
+                name="jobrollup_bucket_unique",
+            ),
+        ),
+    ]
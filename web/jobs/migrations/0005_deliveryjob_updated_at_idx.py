@@ -0,0 +1,22 @@
+# Generated by Django 5.0.14 on 2026-10-17 04:22
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Built concurrently so large tables stay writable meanwhile
+    atomic = False
+
+    dependencies = [
+        ("jobs", "0004_job_rollups"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="deliveryjob",
+            index=models.Index(
+                fields=["updated_at"], name="deliveryjob_updated_at_idx"
+            ),
+        ),
+    ]
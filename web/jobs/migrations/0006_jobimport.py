@@ -0,0 +1,34 @@
+# Generated by Django 5.0.14 on 2026-10-17 04:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("jobs", "0005_deliveryjob_updated_at_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JobImport",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("source", models.CharField(max_length=255, unique=True)),
+                ("size", models.BigIntegerField()),
+                ("rows_read", models.BigIntegerField(default=0)),
+                ("imported", models.BigIntegerField(default=0)),
+                ("rejected", models.BigIntegerField(default=0)),
+                ("started_at", models.DateTimeField(auto_now_add=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,132 @@
+import datetime
+
+from django.db import migrations
+
+TABLE = "jobs_deliveryjob"
+COLUMNS = (
+    "id",
+    "created_at",
+    "completed_at",
+    "income",
+    "cost",
+    "delivery_slot_starts_at",
+    "delivery_slot_ends_at",
+    "destination_id",
+    "vehicle_id",
+    "updated_at",
+)
+# Partitions are created this many months past the current one, after which
+# the create_job_partitions command keeps them ahead
+MONTHS_AHEAD = 12
+
+
+def next_month(month):
+    return month.replace(
+        year=month.year + month.month // 12, month=month.month % 12 + 1
+    )
+
+
+def convert(cursor, partitioned):
+    """
+    Recreates the jobs table, partitioned by month of slot start or not, copying
+    its rows, indexes and foreign keys. The id sequence is kept, but no longer as
+    an identity, as partitions don't inherit it before Postgres 17.
+    """
+    cursor.execute(
+        "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname != %s",
+        [TABLE, f"{TABLE}_pkey"],
+    )
+    # The definitions on a partitioned table only apply to it, not its partitions
+    indexes = [indexdef.replace(" ON ONLY ", " ON ") for indexdef, in cursor]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [TABLE],
+    )
+    foreign_keys = cursor.fetchall()
+    cursor.execute(
+        "SELECT pg_get_serial_sequence(%s, 'id'), attidentity != '' "
+        "FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'id'",
+        [TABLE, TABLE],
+    )
+    sequence, is_identity = cursor.fetchone()
+
+    cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {TABLE}_old")
+    cursor.execute(
+        f"CREATE TABLE {TABLE} "
+        f"(LIKE {TABLE}_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        + (" PARTITION BY RANGE (delivery_slot_starts_at)" if partitioned else "")
+    )
+    if partitioned:
+        cursor.execute(f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT")
+        cursor.execute(
+            "SELECT date_trunc('month', min(delivery_slot_starts_at) AT TIME ZONE "
+            f"'UTC') FROM {TABLE}_old"
+        )
+        (first_month,) = cursor.fetchone()
+        now = datetime.datetime.now(datetime.timezone.utc)
+        current_month = datetime.datetime(now.year, now.month, 1)
+        last_month = current_month
+        for _ in range(MONTHS_AHEAD):
+            last_month = next_month(last_month)
+        month = min(first_month or current_month, current_month)
+        while month <= last_month:
+            cursor.execute(
+                f"CREATE TABLE {TABLE}_p{month:%Y_%m} PARTITION OF {TABLE} "
+                f"FOR VALUES FROM ('{month.isoformat()}+00') "
+                f"TO ('{next_month(month).isoformat()}+00')"
+            )
+            month = next_month(month)
+
+    columns = ", ".join(COLUMNS)
+    cursor.execute(f"INSERT INTO {TABLE} ({columns}) SELECT {columns} FROM {TABLE}_old")
+    if is_identity:
+        # Replaced by a sequence starting where the identity's would continue
+        cursor.execute("SELECT nextval(%s)", [sequence])
+        (start,) = cursor.fetchone()
+        cursor.execute(f"ALTER TABLE {TABLE}_old ALTER COLUMN id DROP IDENTITY")
+        sequence = f"{TABLE}_id_seq"
+        cursor.execute(f"CREATE SEQUENCE {sequence} START {start}")
+    cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id")
+    cursor.execute(
+        f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval(%s::regclass)",
+        [sequence],
+    )
+    cursor.execute(f"DROP TABLE {TABLE}_old")
+
+    # Primary keys of partitioned tables must include the partition key
+    primary_key = "id, delivery_slot_starts_at" if partitioned else "id"
+    cursor.execute(
+        f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY ({primary_key})"
+    )
+    for indexdef in indexes:
+        cursor.execute(indexdef)
+    for name, definition in foreign_keys:
+        cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}")
+
+
+def partition(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        convert(cursor, partitioned=True)
+
+
+def unpartition(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        convert(cursor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+    """
+    Partitions the jobs table by month of `delivery_slot_starts_at`, rewriting it.
+
+    Indexes can no longer be added concurrently to the table, only to each of its
+    partitions.
+    """
+
+    dependencies = [
+        ("jobs", "0006_jobimport"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition, unpartition, elidable=False),
+    ]
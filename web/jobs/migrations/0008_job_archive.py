@@ -0,0 +1,150 @@
+# Generated by Django 5.0.14 on 2026-10-17 04:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+JOB_COLUMNS = (
+    "id, vehicle_id, created_at, completed_at, destination_id, income, cost, "
+    "delivery_slot_starts_at, delivery_slot_ends_at, updated_at"
+)
+ADDRESS_COLUMNS = (
+    "id, recipient, street_address, street_address_2, city, state, zip_code, "
+    "content_hash"
+)
+
+# Altering the columns of the tables requires recreating these views
+CREATE_VIEWS = f"""
+CREATE VIEW jobs_deliveryjob_with_archive AS
+    SELECT {JOB_COLUMNS} FROM jobs_deliveryjob
+    UNION ALL
+    SELECT {JOB_COLUMNS} FROM jobs_archiveddeliveryjob;
+CREATE VIEW jobs_address_with_archive AS
+    SELECT {ADDRESS_COLUMNS} FROM jobs_address
+    UNION ALL
+    SELECT {ADDRESS_COLUMNS} FROM jobs_archivedaddress;
+"""
+DROP_VIEWS = """
+DROP VIEW jobs_deliveryjob_with_archive;
+DROP VIEW jobs_address_with_archive;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("jobs", "0007_partition_deliveryjob"),
+        ("vehicles", "0002_vehiclerollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AddressWithArchive",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("recipient", models.CharField(max_length=100)),
+                ("street_address", models.CharField(max_length=100)),
+                ("street_address_2", models.CharField(blank=True, max_length=100)),
+                ("city", models.CharField(max_length=50)),
+                ("state", models.CharField(max_length=2)),
+                ("zip_code", models.CharField(max_length=10)),
+                (
+                    "content_hash",
+                    models.CharField(editable=False, max_length=64, null=True),
+                ),
+            ],
+            options={
+                "db_table": "jobs_address_with_archive",
+                "managed": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="DeliveryJobWithArchive",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("created_at", models.DateTimeField()),
+                ("completed_at", models.DateTimeField(null=True)),
+                ("income", models.DecimalField(decimal_places=2, max_digits=6)),
+                ("cost", models.DecimalField(decimal_places=2, max_digits=6)),
+                ("delivery_slot_starts_at", models.DateTimeField()),
+                ("delivery_slot_ends_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+            ],
+            options={
+                "db_table": "jobs_deliveryjob_with_archive",
+                "managed": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="ArchivedAddress",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("recipient", models.CharField(max_length=100)),
+                ("street_address", models.CharField(max_length=100)),
+                ("street_address_2", models.CharField(blank=True, max_length=100)),
+                ("city", models.CharField(max_length=50)),
+                ("state", models.CharField(max_length=2)),
+                ("zip_code", models.CharField(max_length=10)),
+                (
+                    "content_hash",
+                    models.CharField(editable=False, max_length=64, null=True),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="JobArchiveRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("started_at", models.DateTimeField(auto_now_add=True)),
+                ("archived_before", models.DateTimeField()),
+                ("jobs", models.BigIntegerField(default=0)),
+                ("addresses", models.BigIntegerField(default=0)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ArchivedDeliveryJob",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("created_at", models.DateTimeField()),
+                ("completed_at", models.DateTimeField()),
+                ("destination_id", models.BigIntegerField()),
+                ("income", models.DecimalField(decimal_places=2, max_digits=6)),
+                ("cost", models.DecimalField(decimal_places=2, max_digits=6)),
+                ("delivery_slot_starts_at", models.DateTimeField()),
+                ("delivery_slot_ends_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+                (
+                    "vehicle",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="vehicles.vehicle",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["completed_at"], name="archivedjob_completed_at_idx"
+                    ),
+                    models.Index(
+                        fields=["created_at"], name="archivedjob_created_at_idx"
+                    ),
+                    models.Index(
+                        fields=["delivery_slot_starts_at", "id"],
+                        name="archivedjob_slot_start_id_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunSQL(CREATE_VIEWS, DROP_VIEWS),
+    ]
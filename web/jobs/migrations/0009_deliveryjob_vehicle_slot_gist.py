@@ -0,0 +1,54 @@
+# Generated by Django 5.0.14 on 2026-10-17 04:35
+
+import django.contrib.postgres.indexes
+import jobs.models
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+
+
+# Slots were only checked by DeliveryJob.clean(), which not every write called.
+# A range can't end before it starts, so inverted slots (entered the wrong way
+# round) are swapped before they are indexed. The jobs are marked as changed for
+# the next refresh of the job rollups.
+SWAP_INVERTED_SLOTS = """
+    UPDATE jobs_deliveryjob
+    SET delivery_slot_starts_at = delivery_slot_ends_at,
+        delivery_slot_ends_at = delivery_slot_starts_at,
+        updated_at = now()
+    WHERE delivery_slot_ends_at < delivery_slot_starts_at
+"""
+
+
+class Migration(migrations.Migration):
+    """
+    Indexes the slots of each vehicle's jobs as ranges. btree_gist lets the GiST
+    index also cover the vehicle. Built on every partition, blocking writes to
+    the jobs meanwhile.
+
+    Not atomic, so that inverted slots are swapped for good before the index is
+    built: it would also compute the range of the rows as they were before an
+    uncommitted update.
+    """
+
+    atomic = False
+
+    dependencies = [
+        ("jobs", "0008_job_archive"),
+        ("vehicles", "0002_vehiclerollup"),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.RunSQL(SWAP_INVERTED_SLOTS, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name="deliveryjob",
+            index=django.contrib.postgres.indexes.GistIndex(
+                models.F("vehicle"),
+                jobs.models.SlotRange(
+                    "delivery_slot_starts_at", "delivery_slot_ends_at"
+                ),
+                condition=models.Q(("vehicle__isnull", False)),
+                name="deliveryjob_vehicle_slot_gist",
+            ),
+        ),
+    ]
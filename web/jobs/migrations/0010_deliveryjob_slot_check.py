@@ -0,0 +1,39 @@
+# Generated by Django 5.0.14 on 2026-10-17 05:32
+
+from django.db import migrations, models
+
+# As in 0009, for databases that applied it before it swapped inverted slots,
+# which then only had unassigned ones
+SWAP_INVERTED_SLOTS = """
+    UPDATE jobs_deliveryjob
+    SET delivery_slot_starts_at = delivery_slot_ends_at,
+        delivery_slot_ends_at = delivery_slot_starts_at,
+        updated_at = now()
+    WHERE delivery_slot_ends_at < delivery_slot_starts_at
+"""
+
+
+class Migration(migrations.Migration):
+    """
+    Keeps slots from ending before they start in the database, not only in
+    DeliveryJob.clean(). Validated on every partition, blocking writes to the
+    jobs meanwhile.
+    """
+
+    dependencies = [
+        ("jobs", "0009_deliveryjob_vehicle_slot_gist"),
+        ("vehicles", "0002_vehiclerollup"),
+    ]
+
+    operations = [
+        migrations.RunSQL(SWAP_INVERTED_SLOTS, migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name="deliveryjob",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    ("delivery_slot_ends_at__gte", models.F("delivery_slot_starts_at"))
+                ),
+                name="deliveryjob_slot_ends_after_start",
+            ),
+        ),
+    ]
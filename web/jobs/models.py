@@ -1,6 +1,108 @@
-from django.db import models
+from hashlib import sha256
 
-from vehicles.models import Vehicle
+from django.contrib.postgres.fields import DateTimeRangeField
+from django.contrib.postgres.indexes import GinIndex, GistIndex
+from django.core.exceptions import ValidationError
+from django.db import connection, models, transaction
+
+from vehicles.models import Vehicle, VehicleRollup
+
+
+def rollup_deltas(added=(), removed=()):
+    """
+    Sums what jobs add to and remove from the rollups of their vehicles, given as
+    `DeliveryJob.get_rollup_values` tuples, into deltas for
+    `VehicleRollup.objects.apply`.
+    """
+    deltas = {}
+    for sign, rows in ((1, added), (-1, removed)):
+        for vehicle_id, completed, income, cost in rows:
+            if vehicle_id is None:
+                continue
+            job_count, completed_count, total_income, total_cost = deltas.get(
+                vehicle_id, (0, 0, 0, 0)
+            )
+            deltas[vehicle_id] = (
+                job_count + sign,
+                completed_count + sign * completed,
+                total_income + sign * income,
+                total_cost + sign * cost,
+            )
+    return deltas
+
+
+def overlapping_slots(slots):
+    """
+    Finds the slots, `(vehicle_id, starts_at, ends_at)` tuples, overlapping another
+    of the same vehicle, with one sort rather than comparing every pair.
+
+    Slots are kept in order of start, but those overlapping a kept one. Returns
+    the position of the kept slot each of those overlaps, by position.
+    """
+    overlaps = {}
+    kept = {}
+    for position in sorted(
+        (position for position, slot in enumerate(slots) if slot[0] is not None),
+        key=lambda position: slots[position][1],
+    ):
+        vehicle_id, starts_at, ends_at = slots[position]
+        if starts_at >= ends_at:
+            # Empty slots overlap nothing
+            continue
+        other = kept.get(vehicle_id)
+        # Slots include their start but not their end
+        if other is not None and starts_at < slots[other][2]:
+            overlaps[position] = other
+        else:
+            kept[vehicle_id] = position
+    return overlaps
+
+
+class SlotRange(models.Func):
+    """The delivery slot of a job as a `tstzrange`, including its start only."""
+
+    function = "TSTZRANGE"
+    output_field = DateTimeRangeField()
+
+
+class DeliveryJobManager(models.Manager):
+    def find_slot_conflicts(self, slots, exclude_ids=()):
+        """
+        Finds the jobs whose delivery slot overlaps one of `slots`, `(vehicle_id,
+        starts_at, ends_at)` tuples, on the same vehicle, with a single query
+        served by the GiST index of the vehicles' slots.
+
+        Returns the ids of the jobs conflicting with each slot that has any, by
+        position, leaving out `exclude_ids` (e.g. the jobs being reassigned).
+        """
+        slots = [(position, *slot) for position, slot in enumerate(slots) if slot[0]]
+        if not slots:
+            return {}
+        positions, vehicle_ids, starts, ends = map(list, zip(*slots))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT slot.position, job.id
+                FROM unnest(
+                    %s::integer[], %s::varchar[], %s::timestamptz[],
+                    %s::timestamptz[]
+                ) AS slot(position, vehicle_id, starts_at, ends_at)
+                JOIN {self.model._meta.db_table} job
+                    ON job.vehicle_id = slot.vehicle_id
+                    AND tstzrange(
+                        job.delivery_slot_starts_at, job.delivery_slot_ends_at
+                    ) && tstzrange(slot.starts_at, slot.ends_at)
+                    -- Implied by the overlap, skips the partitions of later months
+                    AND job.delivery_slot_starts_at < slot.ends_at
+                WHERE job.id != ALL(%s::bigint[])
+                ORDER BY slot.position, job.id
+                """,
+                [positions, vehicle_ids, starts, ends, list(exclude_ids)],
+            )
+            conflicts = {}
+            for position, job_id in cursor.fetchall():
+                conflicts.setdefault(position, []).append(job_id)
+            return conflicts
 
 
 class DeliveryJob(models.Model):
@@ -8,6 +110,10 @@ class DeliveryJob(models.Model):
     Represents a single delivery job, including vehicle assignment, destination,
     financial details, and time range for the delivery.
 
+    The table is partitioned by month of `delivery_slot_starts_at`, see
+    `jobs.partitions`, so its primary key is `(id, delivery_slot_starts_at)` in
+    the database. Ids stay unique as they all come from one sequence.
+
     Attributes:
         vehicle (ForeignKey): The vehicle assigned to the delivery job.
         created_at (DateTimeField): Timestamp when the job was created.
@@ -17,6 +123,8 @@ class DeliveryJob(models.Model):
         cost (DecimalField): The expenses associated with the delivery.
         delivery_slot_starts_at (DateTimeField): The start datetime designated for the delivery slot.
         delivery_slot_ends_at (DateTimeField): The end datetime designated for the delivery slot.
+        updated_at (DateTimeField): Timestamp of the last change, which tells the
+            refresh of the job rollups which days changed.
     """
 
     vehicle = models.ForeignKey(
@@ -35,6 +143,52 @@ class DeliveryJob(models.Model):
     cost = models.DecimalField(max_digits=6, decimal_places=2)  # In USD
     delivery_slot_starts_at = models.DateTimeField()
     delivery_slot_ends_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = DeliveryJobManager()
+
+    class Meta:
+        constraints = [
+            # Also checked by clean(), with a readable error
+            models.CheckConstraint(
+                check=models.Q(
+                    delivery_slot_ends_at__gte=models.F("delivery_slot_starts_at")
+                ),
+                name="deliveryjob_slot_ends_after_start",
+            ),
+        ]
+        # Backs the range filters in DeliveryJobFilter
+        indexes = [
+            models.Index(fields=["created_at"], name="deliveryjob_created_at_idx"),
+            models.Index(fields=["completed_at"], name="deliveryjob_completed_at_idx"),
+            models.Index(fields=["income"], name="deliveryjob_income_idx"),
+            models.Index(fields=["cost"], name="deliveryjob_cost_idx"),
+            # Also the keyset pagination order
+            models.Index(
+                fields=["delivery_slot_starts_at", "id"],
+                name="deliveryjob_slot_start_id_idx",
+            ),
+            models.Index(
+                fields=["delivery_slot_ends_at"], name="deliveryjob_slot_ends_at_idx"
+            ),
+            models.Index(
+                fields=["vehicle", "delivery_slot_starts_at"],
+                name="deliveryjob_vehicle_slot_idx",
+            ),
+            # Finds the jobs changed since the last refresh of the job rollups
+            models.Index(fields=["updated_at"], name="deliveryjob_updated_at_idx"),
+            # Finds the jobs of a vehicle overlapping a slot, see
+            # DeliveryJobManager.find_slot_conflicts
+            GistIndex(
+                models.F("vehicle"),
+                SlotRange("delivery_slot_starts_at", "delivery_slot_ends_at"),
+                condition=models.Q(vehicle__isnull=False),
+                name="deliveryjob_vehicle_slot_gist",
+            ),
+        ]
+
+    # The fields counted in the rollup of the vehicle
+    ROLLUP_FIELDS = ("vehicle_id", "completed_at", "income", "cost")
 
     def __str__(self):
         """Provides a human-readable string representation of a DeliveryJob object."""
@@ -45,11 +199,108 @@ class DeliveryJob(models.Model):
         """Indicates if a delivery job has been completed."""
         return self.completed_at is not None
 
+    def clean(self):
+        """Checks that the delivery slot doesn't end before it starts."""
+        if (
+            self.delivery_slot_starts_at is not None
+            and self.delivery_slot_ends_at is not None
+            and self.delivery_slot_ends_at < self.delivery_slot_starts_at
+        ):
+            raise ValidationError("The delivery slot can't end before it starts.")
+
+    def get_rollup_values(self):
+        """Returns what the job counts for in the rollup of its vehicle."""
+        return (
+            self.vehicle_id,
+            self.completed_at is not None,
+            self._meta.get_field("income").to_python(self.income),
+            self._meta.get_field("cost").to_python(self.cost),
+        )
+
+    def get_stored_rollup_values(self):
+        """
+        Returns the rollup values of the job as stored, locking its row until the
+        end of the transaction, so that concurrent saves move its contribution in
+        turn rather than from the same values. Returns None if it isn't stored.
+        """
+        stored = (
+            DeliveryJob.objects.select_for_update()
+            .filter(pk=self.pk)
+            .values_list(*self.ROLLUP_FIELDS)
+            .first()
+        )
+        if stored is None:
+            return None
+        vehicle_id, completed_at, income, cost = stored
+        return vehicle_id, completed_at is not None, income, cost
+
+    def save(self, *args, **kwargs):
+        """Saves the job, moving its contribution to its vehicle's rollup."""
+        with transaction.atomic():
+            stored = None if self._state.adding else self.get_stored_rollup_values()
+            super().save(*args, **kwargs)
+            VehicleRollup.objects.apply(
+                rollup_deltas([self.get_rollup_values()], [stored] if stored else [])
+            )
+
+    def delete(self, *args, **kwargs):
+        """Deletes the job, removing it from its vehicle's rollup."""
+        with transaction.atomic():
+            stored = self.get_stored_rollup_values()
+            result = super().delete(*args, **kwargs)
+            if stored:
+                VehicleRollup.objects.apply(rollup_deltas(removed=[stored]))
+        return result
+
+
+def normalize_whitespace(value):
+    """Strips a value and collapses its internal runs of whitespace."""
+    return " ".join((value or "").split())
+
+
+def normalize_zip_code(value):
+    """Formats ZIP+4 codes as `12345-6789`, however they were written."""
+    digits = "".join(character for character in value if character.isdigit())
+    if len(digits) == 9:
+        return f"{digits[:5]}-{digits[5:]}"
+    return normalize_whitespace(value)
+
+
+class AddressManager(models.Manager):
+    def bulk_get_or_create(self, addresses, batch_size=None):
+        """
+        Normalizes `addresses` and inserts those that aren't stored yet, in a single
+        `INSERT ... ON CONFLICT` upsert per batch, then loads the stored rows in one
+        query.
+
+        Returns the stored address for each input, in order: existing rows are
+        reused, with their stored text (which may differ from the input in case),
+        and inputs with the same content share one row.
+        """
+        addresses = list(addresses)
+        by_hash = {}
+        for address in addresses:
+            address.normalize()
+            by_hash.setdefault(address.content_hash, address)
+        # The no-op update makes Postgres return the id of conflicting rows
+        self.bulk_create(
+            by_hash.values(),
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["content_hash"],
+            update_fields=["content_hash"],
+        )
+        stored = self.in_bulk([address.pk for address in by_hash.values()])
+        return [stored[by_hash[address.content_hash].pk] for address in addresses]
+
 
 class Address(models.Model):
     """
     Represents a US-based address for a delivery destination.
 
+    Addresses are deduplicated: `content_hash` identifies an address by its
+    normalized content, so repeat deliveries share a single row.
+
     Attributes:
         recipient (CharField): The name of the recipient of the delivery.
         street_address (CharField): The primary street address line.
@@ -57,15 +308,304 @@ class Address(models.Model):
         city (CharField): The city name.
         state (CharField): The two-letter US state abbreviation.
         zip_code (CharField): The ZIP code.
+        content_hash (CharField): SHA-256 of the normalized address, unique. Only null
+            for rows predating deduplication, see the `dedupe_addresses` command.
     """
 
+    HASHED_FIELDS = (
+        "recipient",
+        "street_address",
+        "street_address_2",
+        "city",
+        "state",
+        "zip_code",
+    )
+
     recipient = models.CharField(max_length=100)
     street_address = models.CharField(max_length=100)
     street_address_2 = models.CharField(max_length=100, blank=True)
     city = models.CharField(max_length=50)
     state = models.CharField(max_length=2)
     zip_code = models.CharField(max_length=10)
+    content_hash = models.CharField(max_length=64, null=True, editable=False)
+
+    objects = AddressManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["content_hash"], name="address_content_hash_key"
+            ),
+        ]
+        # Trigram indexes serve the contains/startswith/endswith filters, which a
+        # btree index can't (a leading wildcard defeats it)
+        indexes = [
+            GinIndex(
+                fields=["recipient"],
+                name="address_recipient_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GinIndex(
+                fields=["street_address"],
+                name="address_street_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GinIndex(
+                fields=["street_address_2"],
+                name="address_street_2_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GinIndex(
+                fields=["city"],
+                name="address_city_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GinIndex(
+                fields=["zip_code"],
+                name="address_zip_code_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+            # Two characters are too short for trigrams to be selective
+            models.Index(fields=["state"], name="address_state_idx"),
+        ]
 
     def __str__(self):
         """Provides a human-readable string representation of an Address object."""
         return self.street_address
+
+    def save(self, *args, **kwargs):
+        """Normalizes the address before saving it."""
+        self.normalize()
+        super().save(*args, **kwargs)
+
+    def normalize(self):
+        """
+        Normalizes whitespace, state and ZIP+4 formatting, then computes the
+        content hash, which also ignores case.
+        """
+        for field_name in self.HASHED_FIELDS:
+            setattr(self, field_name, normalize_whitespace(getattr(self, field_name)))
+        self.state = self.state.upper()
+        self.zip_code = normalize_zip_code(self.zip_code)
+        content = "\x1f".join(
+            getattr(self, field_name).casefold() for field_name in self.HASHED_FIELDS
+        )
+        self.content_hash = sha256(content.encode()).hexdigest()
+
+
+class JobRollup(models.Model):
+    """
+    Daily totals of delivery jobs, by the day (UTC) of one of their timestamps and
+    broken down by one dimension, from which analytics are served for the days
+    before the latest `JobRollupRefresh`.
+
+    Refreshed by the `refresh_job_rollups` command, see `jobs.analytics`.
+
+    Attributes:
+        basis (CharField): The timestamp the jobs are bucketed by, one of `BASES`.
+        day (DateField): The day of the bucket.
+        dimension (CharField): What the totals are broken down by, one of
+            `DIMENSIONS` ("" for the totals of all the jobs of the day).
+        key (CharField): The registration, state or ZIP prefix of the jobs ("" for
+            jobs without a vehicle, and for the totals of the day).
+        job_count (IntegerField): The number of jobs.
+        completed_count (IntegerField): How many of those are completed.
+        income (DecimalField): The sum of the income of the jobs.
+        cost (DecimalField): The sum of the cost of the jobs.
+    """
+
+    BASES = ("created_at", "completed_at", "delivery_slot_starts_at")
+    DIMENSIONS = ("", "vehicle", "state", "zip_prefix")
+
+    basis = models.CharField(max_length=32)
+    day = models.DateField()
+    dimension = models.CharField(max_length=16, blank=True)
+    key = models.CharField(max_length=10, blank=True)
+    job_count = models.IntegerField()
+    completed_count = models.IntegerField()
+    income = models.DecimalField(max_digits=14, decimal_places=2)
+    cost = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            # Also the index analytics are read through
+            models.UniqueConstraint(
+                fields=["basis", "dimension", "day", "key"],
+                name="jobrollup_bucket_unique",
+            ),
+        ]
+
+
+class JobRollupRefresh(models.Model):
+    """
+    A refresh of the job rollups. The latest one tells which days they cover.
+
+    Attributes:
+        refreshed_at (DateTimeField): When the refresh started. Jobs changed since
+            are picked up by the next one.
+        complete_until (DateField): The rollups cover the days before this one.
+        full (BooleanField): Whether every day was recomputed, rather than those
+            with changed jobs.
+        days (IntegerField): The number of days recomputed, over all the bases.
+    """
+
+    refreshed_at = models.DateTimeField()
+    complete_until = models.DateField()
+    full = models.BooleanField(default=False)
+    days = models.IntegerField(default=0)
+
+    class Meta:
+        get_latest_by = "refreshed_at"
+
+
+class JobImport(models.Model):
+    """
+    The progress of an import of jobs from a file, committed with every chunk so
+    an interrupted import resumes after the last loaded row, see the `import_jobs`
+    command.
+
+    Attributes:
+        source (CharField): The absolute path of the imported file.
+        size (BigIntegerField): The size of the file, which must not change
+            between runs.
+        rows_read (BigIntegerField): The number of rows loaded or rejected so far.
+        imported (BigIntegerField): The number of jobs created.
+        rejected (BigIntegerField): The number of rows that failed validation.
+        started_at (DateTimeField): When the import started.
+        finished_at (DateTimeField): When the last row was read, if it was.
+    """
+
+    source = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField()
+    rows_read = models.BigIntegerField(default=0)
+    imported = models.BigIntegerField(default=0)
+    rejected = models.BigIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+
+class ArchivedDeliveryJob(models.Model):
+    """
+    A completed delivery job moved out of the jobs table by the `archive_jobs`
+    command, see `jobs.archive`. Archived jobs are read through
+    `DeliveryJobWithArchive` and still count in the vehicle and job rollups.
+
+    Has the fields of `DeliveryJob`, with its id, but its destination may be a hot
+    `Address` or an `ArchivedAddress`, so `destination_id` isn't a foreign key.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    vehicle = models.ForeignKey(
+        Vehicle, on_delete=models.CASCADE, null=True, related_name="+"
+    )
+    created_at = models.DateTimeField()
+    completed_at = models.DateTimeField()
+    destination_id = models.BigIntegerField()
+    income = models.DecimalField(max_digits=6, decimal_places=2)
+    cost = models.DecimalField(max_digits=6, decimal_places=2)
+    delivery_slot_starts_at = models.DateTimeField()
+    delivery_slot_ends_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        # Back the completion filters, and the refresh of the job rollups
+        indexes = [
+            models.Index(fields=["completed_at"], name="archivedjob_completed_at_idx"),
+            models.Index(fields=["created_at"], name="archivedjob_created_at_idx"),
+            models.Index(
+                fields=["delivery_slot_starts_at", "id"],
+                name="archivedjob_slot_start_id_idx",
+            ),
+        ]
+
+
+class ArchivedAddress(models.Model):
+    """
+    An address moved out of the addresses table along with the last job referring
+    to it. Has the fields of `Address`, with its id, but its content hash isn't
+    unique: the same address may be stored again for a new job, then archived.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    recipient = models.CharField(max_length=100)
+    street_address = models.CharField(max_length=100)
+    street_address_2 = models.CharField(max_length=100, blank=True)
+    city = models.CharField(max_length=50)
+    state = models.CharField(max_length=2)
+    zip_code = models.CharField(max_length=10)
+    content_hash = models.CharField(max_length=64, null=True, editable=False)
+
+
+class AddressWithArchive(models.Model):
+    """
+    The hot and archived addresses, read through a view (see migration 0008) by
+    `DeliveryJobWithArchive`.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    recipient = models.CharField(max_length=100)
+    street_address = models.CharField(max_length=100)
+    street_address_2 = models.CharField(max_length=100, blank=True)
+    city = models.CharField(max_length=50)
+    state = models.CharField(max_length=2)
+    zip_code = models.CharField(max_length=10)
+    content_hash = models.CharField(max_length=64, null=True, editable=False)
+
+    class Meta:
+        managed = False
+        db_table = "jobs_address_with_archive"
+
+
+class DeliveryJobWithArchive(models.Model):
+    """
+    The hot and archived delivery jobs, read through a `UNION ALL` view (see
+    migration 0008) whose filters Postgres pushes down to both tables. Only used
+    by queries reaching into the archive, see `jobs.archive.reaches_archive`.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    vehicle = models.ForeignKey(
+        Vehicle,
+        on_delete=models.DO_NOTHING,
+        null=True,
+        db_constraint=False,
+        related_name="+",
+    )
+    created_at = models.DateTimeField()
+    completed_at = models.DateTimeField(null=True)
+    destination = models.ForeignKey(
+        AddressWithArchive,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="delivery_jobs",
+    )
+    income = models.DecimalField(max_digits=6, decimal_places=2)
+    cost = models.DecimalField(max_digits=6, decimal_places=2)
+    delivery_slot_starts_at = models.DateTimeField()
+    delivery_slot_ends_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = "jobs_deliveryjob_with_archive"
+
+
+class JobArchiveRun(models.Model):
+    """
+    A run of the `archive_jobs` command. Recorded before any job is moved, so the
+    latest `archived_before` tells which queries must read the archive.
+
+    Attributes:
+        started_at (DateTimeField): When the run started.
+        archived_before (DateTimeField): Every archived job was completed before
+            this time.
+        jobs (BigIntegerField): The number of jobs archived by the run.
+        addresses (BigIntegerField): The number of addresses archived by the run.
+        finished_at (DateTimeField): When the last job was moved, if it was.
+    """
+
+    started_at = models.DateTimeField(auto_now_add=True)
+    archived_before = models.DateTimeField()
+    jobs = models.BigIntegerField(default=0)
+    addresses = models.BigIntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
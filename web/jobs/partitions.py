@@ -0,0 +1,115 @@
+import datetime
+
+from django.db import connection, transaction
+
+from jobs.models import DeliveryJob
+
+# DeliveryJob is partitioned by month of its slot start (in UTC), see migration
+# 0007. Rows outside every monthly partition land in the default one.
+PARTITION_KEY = "delivery_slot_starts_at"
+
+
+def month_start(value):
+    """Returns the start (in UTC) of the month of a date or datetime."""
+    if isinstance(value, datetime.datetime):
+        value = value.astimezone(datetime.timezone.utc)
+    return datetime.datetime(value.year, value.month, 1, tzinfo=datetime.timezone.utc)
+
+
+def next_month(month):
+    """Returns the start of the month after `month`, a month start."""
+    return month.replace(
+        year=month.year + month.month // 12, month=month.month % 12 + 1
+    )
+
+
+def previous_month(month):
+    """Returns the start of the month before `month`, a month start."""
+    return month.replace(
+        year=month.year - (month.month == 1), month=(month.month - 2) % 12 + 1
+    )
+
+
+def partition_name(month):
+    """Returns the name of the partition of jobs for the month starting at `month`."""
+    return f"{DeliveryJob._meta.db_table}_p{month:%Y_%m}"
+
+
+def default_partition_name():
+    return f"{DeliveryJob._meta.db_table}_default"
+
+
+def get_partitions():
+    """Returns the names of the partitions of the jobs table."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT inhrelid::regclass::text FROM pg_inherits "
+            "WHERE inhparent = %s::regclass",
+            [DeliveryJob._meta.db_table],
+        )
+        return {name for name, in cursor.fetchall()}
+
+
+def get_default_partition_months():
+    """Returns the months of the rows in the default partition, in order."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', {PARTITION_KEY} AT TIME ZONE 'UTC') "
+            f"FROM {default_partition_name()} ORDER BY 1"
+        )
+        return [month_start(month) for month, in cursor.fetchall()]
+
+
+def create_partitions(months):
+    """
+    Creates the partitions of the given months that don't exist yet, moving their
+    rows out of the default partition, and returns their names.
+
+    Each partition is created and attached in its own transaction. Attaching scans
+    the default partition, under an exclusive lock, so it is best kept empty by
+    creating partitions ahead of the jobs.
+    """
+    table = DeliveryJob._meta.db_table
+    default = default_partition_name()
+    existing = get_partitions()
+    created = []
+    for month in sorted({month_start(month) for month in months}):
+        name = partition_name(month)
+        if name in existing:
+            continue
+        bounds = f"FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE {name} "
+                f"(LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            )
+            cursor.execute(
+                f"""
+                WITH moved AS (
+                    DELETE FROM {default}
+                    WHERE {PARTITION_KEY} >= %s AND {PARTITION_KEY} < %s
+                    RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+                """,
+                [month, next_month(month)],
+            )
+            # Also creates the partition's indexes, from the table's
+            cursor.execute(
+                f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES {bounds}"
+            )
+        created.append(name)
+    return created
+
+
+def create_future_partitions(months_ahead, now=None):
+    """
+    Creates the partitions from the current month through `months_ahead` months
+    later, and those of the months of rows in the default partition.
+    """
+    month = month_start(now or datetime.datetime.now(datetime.timezone.utc))
+    months = get_default_partition_months()
+    for _ in range(months_ahead + 1):
+        months.append(month)
+        month = next_month(month)
+    return create_partitions(months)
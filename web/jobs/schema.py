@@ -1,14 +1,33 @@
 from decimal import Decimal
 
 import graphene
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import QuerySet, Sum
+from django.utils import timezone
 from django_filters import FilterSet
 from graphene_django import DjangoObjectType
-from graphene_django.filter import DjangoFilterConnectionField
 from graphene_django.types import Connection
-from graphql_relay import from_global_id
-
-from jobs.models import Address, DeliveryJob
-from vehicles.models import Vehicle
+from graphql_relay import from_global_id, to_global_id
+
+from jobs.analytics import MAX_DAYS, job_analytics
+from jobs.archive import reaches_archive
+from jobs.cache import invalidate_job_results
+from jobs.dispatch import dispatch_jobs
+from jobs.models import (
+    Address,
+    AddressWithArchive,
+    DeliveryJob,
+    DeliveryJobWithArchive,
+    overlapping_slots,
+    rollup_deltas,
+)
+from logistics.loaders import get_loader, load_related, prime_related
+from logistics.optimizer import optimize_queryset
+from logistics.pagination import KeysetConnectionField
+from logistics.relay import decode_global_ids
+from logistics.result_cache import add_result_tags, result_tag
+from vehicles.models import Vehicle, VehicleRollup
 
 
 class AddressType(DjangoObjectType):
@@ -19,7 +38,16 @@ class AddressType(DjangoObjectType):
     class Meta:
         model = Address
         interfaces = (graphene.relay.Node,)
-        fields = "__all__"
+        exclude = ("content_hash",)
+
+    @classmethod
+    def get_node(cls, info, id):
+        return get_loader(info, Address).load(id)
+
+    @classmethod
+    def is_type_of(cls, root, info):
+        # Addresses read through the archive view are addresses too
+        return isinstance(root, AddressWithArchive) or super().is_type_of(root, info)
 
 
 class DeliveryJobFilter(FilterSet):
@@ -59,15 +87,40 @@ class DeliveryJobFilter(FilterSet):
 
 class DeliveryJobConnection(Connection):
     """
-    A paginated connection that includes a count of items on the current page.
+    A paginated connection that includes counts and financial totals, both for the
+    current page and for the whole filtered set of jobs.
     """
 
     class Meta:
         abstract = True
 
+    # Node columns read by the connection-level fields, see optimize_queryset.
+    # Totals only read them when the jobs were prefetched.
+    selection_columns = {
+        "currentPageIncome": ("income",),
+        "currentPageCost": ("cost",),
+        "totalIncome": ("income", "cost"),
+        "totalCost": ("income", "cost"),
+        "totalProfit": ("income", "cost"),
+    }
+
     currentPageCount = graphene.Int()
+    currentPageIncome = graphene.Decimal()
+    currentPageCost = graphene.Decimal()
+    totalCount = graphene.Int()
     totalIncome = graphene.Decimal()
     totalCost = graphene.Decimal()
+    totalProfit = graphene.Decimal()
+
+    def resolve_edges(self, info, **kwargs):
+        """
+        Returns the page's edges, queueing every node's vehicle and destination so
+        that they are fetched with one query per type rather than one per edge.
+        """
+        jobs = [edge.node for edge in self.edges]
+        prime_related(info, jobs, "vehicle")
+        prime_related(info, jobs, "destination")
+        return self.edges
 
     def resolve_currentPageCount(self, info, **kwargs):
         """
@@ -75,14 +128,53 @@ class DeliveryJobConnection(Connection):
         """
         return len(self.edges)
 
-    def resolve_totalIncome(self, info, **kwargs):
+    def resolve_currentPageIncome(self, info, **kwargs):
         """Calculates the total income for the current page."""
         return Decimal(sum(edge.node.income for edge in self.edges))
 
-    def resolve_totalCost(self, info, **kwargs):
+    def resolve_currentPageCost(self, info, **kwargs):
         """Calculates the total cost for the current page."""
         return Decimal(sum(edge.node.cost for edge in self.edges))
 
+    def resolve_totalCount(self, info, **kwargs):
+        """Returns the number of jobs matching the filters, across all pages."""
+        if self.length is None:
+            # Keyset pages don't count the filtered set up front
+            return self.iterable.count()
+        return self.length
+
+    def resolve_totalIncome(self, info, **kwargs):
+        """Returns the total income of the jobs matching the filters."""
+        return self.get_totals()["total_income"]
+
+    def resolve_totalCost(self, info, **kwargs):
+        """Returns the total cost of the jobs matching the filters."""
+        return self.get_totals()["total_cost"]
+
+    def resolve_totalProfit(self, info, **kwargs):
+        """Returns the total income less cost of the jobs matching the filters."""
+        totals = self.get_totals()
+        return totals["total_income"] - totals["total_cost"]
+
+    def get_totals(self):
+        """
+        Aggregates income and cost over the full filtered set in a single query,
+        the first time any total is resolved.
+        """
+        if not hasattr(self, "_totals"):
+            if isinstance(self.iterable, QuerySet):
+                self._totals = self.iterable.aggregate(
+                    total_income=Sum("income", default=Decimal(0)),
+                    total_cost=Sum("cost", default=Decimal(0)),
+                )
+            else:
+                # Prefetched jobs are already in memory
+                self._totals = {
+                    "total_income": Decimal(sum(job.income for job in self.iterable)),
+                    "total_cost": Decimal(sum(job.cost for job in self.iterable)),
+                }
+        return self._totals
+
 
 class DeliveryJobType(DjangoObjectType):
     """
@@ -98,13 +190,113 @@ class DeliveryJobType(DjangoObjectType):
         filterset_class = DeliveryJobFilter
         connection_class = DeliveryJobConnection
 
+    @classmethod
+    def get_queryset(cls, queryset, info):
+        return optimize_queryset(queryset, info)
+
+    @classmethod
+    def is_type_of(cls, root, info):
+        # Jobs read through the archive view are jobs too
+        return isinstance(root, DeliveryJobWithArchive) or super().is_type_of(
+            root, info
+        )
+
+    def resolve_vehicle(self, info):
+        return load_related(info, self, "vehicle")
+
+    def resolve_destination(self, info):
+        return load_related(info, self, "destination")
+
+
+class AnalyticsInterval(graphene.Enum):
+    """The length of the time buckets of analytics."""
+
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+class AnalyticsDateField(graphene.Enum):
+    """The timestamp jobs are bucketed by in analytics."""
+
+    CREATED_AT = "created_at"
+    COMPLETED_AT = "completed_at"
+    DELIVERY_SLOT_STARTS_AT = "delivery_slot_starts_at"
+
+
+class AnalyticsGroupBy(graphene.Enum):
+    """What analytics are broken down by within each time bucket."""
+
+    VEHICLE = "vehicle"
+    STATE = "state"
+    ZIP_PREFIX = "zip_prefix"
+
+
+class AnalyticsBucketType(graphene.ObjectType):
+    """Totals of the jobs of one time bucket, for one key of the breakdown."""
+
+    start = graphene.Date(required=True, description="The first day of the bucket.")
+    key = graphene.String(
+        description="The registration, state or three-digit ZIP prefix the totals "
+        "are for. Null for jobs without a vehicle, or without a breakdown."
+    )
+    job_count = graphene.Int(required=True)
+    completed_count = graphene.Int(required=True)
+    income = graphene.Decimal(required=True)
+    cost = graphene.Decimal(required=True)
+    margin = graphene.Decimal(required=True)
+
+    def resolve_margin(self, info):
+        return self["income"] - self["cost"]
+
 
 class Query(graphene.ObjectType):
     """
     Root-level query fields for accessing and filtering DeliveryJob data.
     """
 
-    delivery_jobs = DjangoFilterConnectionField(DeliveryJobType)
+    delivery_jobs = KeysetConnectionField(
+        DeliveryJobType, keyset_ordering=("delivery_slot_starts_at", "id")
+    )
+    analytics = graphene.List(
+        graphene.NonNull(AnalyticsBucketType),
+        required=True,
+        interval=AnalyticsInterval(required=True),
+        date_field=AnalyticsDateField(default_value=AnalyticsDateField.CREATED_AT),
+        group_by=AnalyticsGroupBy(),
+        start=graphene.Date(required=True),
+        end=graphene.Date(required=True, description="The day after the last day."),
+        description="Income, cost, margin and job counts per time bucket (UTC), "
+        "optionally broken down by vehicle, state or ZIP prefix.",
+    )
+
+    def resolve_delivery_jobs(self, info, **kwargs):
+        """
+        Reads the hot jobs table, unless the filters reach back before the archive
+        cutoff, in which case the archived jobs are read too, through a view.
+        """
+        if reaches_archive(kwargs):
+            # The view's results are invalidated with the lists of jobs
+            add_result_tags(info, result_tag(DeliveryJob))
+            return DeliveryJobWithArchive.objects.all()
+        return DeliveryJob.objects.all()
+
+    def resolve_analytics(self, info, interval, date_field, start, end, group_by=None):
+        """
+        Aggregates the jobs per bucket, reading the days before the last refresh of
+        the job rollups from them.
+        """
+        if (end - start).days > MAX_DAYS:
+            raise Exception(f"Analytics can't span more than {MAX_DAYS} days.")
+        # Invalidated by every job mutation, like the lists of jobs
+        add_result_tags(info, result_tag(DeliveryJob))
+        return job_analytics(
+            interval.value,
+            basis=date_field.value,
+            dimension=group_by.value if group_by else "",
+            start=start,
+            end=end,
+        )
 
 
 class AddressInput(graphene.InputObjectType):
@@ -136,6 +328,8 @@ class CreateJobInput(graphene.InputObjectType):
 class CreateJob(graphene.Mutation):
     """
     Mutation for creating new DeliveryJob instances.
+
+    The job is rejected if its slot overlaps one of another job of its vehicle.
     """
 
     class Arguments:
@@ -148,25 +342,196 @@ class CreateJob(graphene.Mutation):
         """
         Performs the mutation logic, creates a DeliveryJob, and returns the created instance.
         """
-        address = Address.objects.create(**input.destination)
-        job_kwargs = {
-            "destination": address,
-            "income": input.income,
-            "cost": input.cost,
-            "delivery_slot_starts_at": input.delivery_slot_starts_at,
-            "delivery_slot_ends_at": input.delivery_slot_ends_at,
-        }
-        if input.get("vehicle_registration"):
-            try:
-                vehicle = Vehicle.objects.get(registration=input.vehicle_registration)
-                job_kwargs["vehicle"] = vehicle
-            except Vehicle.DoesNotExist:
-                raise Exception("Vehicle with specified registration not found.")
-
-        job = DeliveryJob.objects.create(**job_kwargs)
+        # Reuses the stored address if the destination was delivered to before
+        (address,) = Address.objects.bulk_get_or_create([Address(**input.destination)])
+        job = DeliveryJob(
+            destination=address,
+            income=input.income,
+            cost=input.cost,
+            delivery_slot_starts_at=input.delivery_slot_starts_at,
+            delivery_slot_ends_at=input.delivery_slot_ends_at,
+        )
+        try:
+            job.clean()
+        except ValidationError as e:
+            raise Exception(" ".join(e.messages))
+
+        with transaction.atomic():
+            if input.get("vehicle_registration"):
+                try:
+                    # Locked so that concurrent assignments to the vehicle are
+                    # checked for conflicts in turn
+                    job.vehicle = Vehicle.objects.select_for_update().get(
+                        registration=input.vehicle_registration
+                    )
+                except Vehicle.DoesNotExist:
+                    raise Exception("Vehicle with specified registration not found.")
+                conflicts = DeliveryJob.objects.find_slot_conflicts(
+                    [
+                        (
+                            job.vehicle_id,
+                            job.delivery_slot_starts_at,
+                            job.delivery_slot_ends_at,
+                        )
+                    ]
+                )
+                if conflicts:
+                    raise Exception(slot_conflict_message(conflicts[0]))
+            job.save()
+        invalidate_job_results(registrations=[job.vehicle_id])
         return CreateJob(job=job)
 
 
+def slot_conflict_message(job_ids):
+    """Describes the jobs of a vehicle whose slots overlap a new one."""
+    global_ids = ", ".join(
+        to_global_id(DeliveryJobType._meta.name, job_id) for job_id in job_ids
+    )
+    return f"The delivery slot overlaps other jobs of the vehicle: {global_ids}."
+
+
+class JobError(graphene.ObjectType):
+    """Describes why one item of a bulk job mutation failed."""
+
+    index = graphene.Int(
+        required=True, description="The position of the item in the input list."
+    )
+    message = graphene.String(required=True)
+
+
+class CreateJobs(graphene.Mutation):
+    """
+    Mutation for creating many DeliveryJob instances at once.
+
+    Referenced vehicles are looked up with a single query, and addresses (reusing
+    stored ones) and jobs are inserted in batches within one transaction. Items
+    that fail validation, or whose slot overlaps another job of their vehicle, are
+    reported in `errors` and skipped; the rest are created.
+    """
+
+    BATCH_SIZE = 1000
+
+    class Arguments:
+        input = graphene.List(graphene.NonNull(CreateJobInput), required=True)
+
+    jobs = graphene.List(
+        DeliveryJobType, description="The created jobs, in input order."
+    )
+    errors = graphene.List(graphene.NonNull(JobError), required=True)
+
+    @staticmethod
+    def mutate(root, info, input):
+        """
+        Validates every item, then bulk creates the valid ones whose slot doesn't
+        overlap another job of their vehicle.
+        """
+        registrations = {
+            item.vehicle_registration
+            for item in input
+            if item.get("vehicle_registration")
+        }
+        with transaction.atomic():
+            # Locked so that concurrent assignments to the vehicles are checked for
+            # conflicts in turn
+            vehicles = (
+                Vehicle.objects.select_for_update()
+                .order_by("registration")
+                .in_bulk(registrations)
+            )
+
+            indexes, addresses, jobs, errors = [], [], [], []
+            for index, item in enumerate(input):
+                vehicle = None
+                if item.get("vehicle_registration"):
+                    vehicle = vehicles.get(item.vehicle_registration)
+                    if vehicle is None:
+                        errors.append(
+                            JobError(
+                                index=index,
+                                message="Vehicle with specified registration not "
+                                "found.",
+                            )
+                        )
+                        continue
+
+                address = Address(**item.destination)
+                job = DeliveryJob(
+                    vehicle=vehicle,
+                    income=item.income,
+                    cost=item.cost,
+                    delivery_slot_starts_at=item.delivery_slot_starts_at,
+                    delivery_slot_ends_at=item.delivery_slot_ends_at,
+                )
+                try:
+                    address.full_clean(
+                        validate_unique=False, validate_constraints=False
+                    )
+                    job.full_clean(
+                        exclude=["vehicle", "destination"],
+                        validate_unique=False,
+                        validate_constraints=False,
+                    )
+                except ValidationError as e:
+                    errors.append(JobError(index=index, message=" ".join(e.messages)))
+                    continue
+                indexes.append(index)
+                addresses.append(address)
+                jobs.append(job)
+
+            # Slots conflict with stored jobs, or with those of earlier items
+            slots = [
+                (job.vehicle_id, job.delivery_slot_starts_at, job.delivery_slot_ends_at)
+                for job in jobs
+            ]
+            conflicts = DeliveryJob.objects.find_slot_conflicts(slots)
+            # Items conflicting with stored jobs are left out of the comparison
+            overlaps = overlapping_slots(
+                [
+                    (None, None, None) if position in conflicts else slot
+                    for position, slot in enumerate(slots)
+                ]
+            )
+            for position, job_ids in conflicts.items():
+                errors.append(
+                    JobError(
+                        index=indexes[position], message=slot_conflict_message(job_ids)
+                    )
+                )
+            for position, other in overlaps.items():
+                errors.append(
+                    JobError(
+                        index=indexes[position],
+                        message="The delivery slot overlaps the one of item "
+                        f"{indexes[other]}, for the same vehicle.",
+                    )
+                )
+            rejected = conflicts.keys() | overlaps.keys()
+            addresses = [
+                address
+                for position, address in enumerate(addresses)
+                if position not in rejected
+            ]
+            jobs = [
+                job for position, job in enumerate(jobs) if position not in rejected
+            ]
+
+            addresses = Address.objects.bulk_get_or_create(
+                addresses, batch_size=CreateJobs.BATCH_SIZE
+            )
+            for job, address in zip(jobs, addresses):
+                job.destination = address
+            DeliveryJob.objects.bulk_create(jobs, batch_size=CreateJobs.BATCH_SIZE)
+            # bulk_create skips save(), which keeps the rollups otherwise
+            VehicleRollup.objects.apply(
+                rollup_deltas(added=[job.get_rollup_values() for job in jobs])
+            )
+            if jobs:
+                invalidate_job_results(registrations=[job.vehicle_id for job in jobs])
+
+        errors.sort(key=lambda error: error.index)
+        return CreateJobs(jobs=jobs, errors=errors)
+
+
 class MarkJobCompletedInput(graphene.InputObjectType):
     """Input type for marking a job as completed."""
 
@@ -193,7 +558,7 @@ class MarkJobCompleted(graphene.Mutation):
         job = DeliveryJob.objects.get(id=internal_id)
 
         # Check vehicle has been assigned before completing job
-        if not job.vehicle:
+        if job.vehicle_id is None:
             raise Exception(
                 "Job must have an assigned vehicle to mark it as completed."
             )
@@ -206,16 +571,186 @@ class MarkJobCompleted(graphene.Mutation):
 
         # Do not check completion date falls within delivery slot - too restrictive
 
-        job.completed_at = input.completed_at
-        job.save()
-        return MarkJobCompleted(job=job)
+        # Conditional, so that a concurrent completion since the checks above isn't
+        # counted twice
+        with transaction.atomic():
+            completed = complete_jobs({job.id: input.completed_at})
+        if job.id not in completed:
+            raise Exception(
+                get_completion_errors([job.id]).get(
+                    job.id, "Job could not be marked as completed."
+                )
+            )
+        return MarkJobCompleted(job=completed[job.id])
+
+
+class MarkJobCompletedResult(graphene.ObjectType):
+    """The outcome of marking one job of a bulk mutation as completed."""
+
+    id = graphene.ID(required=True, description="The ID given in the input.")
+    job = graphene.Field(DeliveryJobType, description="The job, if completed.")
+    error = graphene.String(description="Why the job wasn't completed, if it wasn't.")
+
+
+class MarkJobsCompleted(graphene.Mutation):
+    """
+    Mutation for marking many jobs as completed at once.
+
+    Jobs are checked with one query and completed with one conditional update, so
+    a job completed concurrently since it was checked is reported rather than
+    completed twice. Jobs that can't be completed are reported in their result;
+    the rest are completed.
+    """
+
+    class Arguments:
+        input = graphene.List(graphene.NonNull(MarkJobCompletedInput), required=True)
+
+    results = graphene.List(
+        graphene.NonNull(MarkJobCompletedResult),
+        required=True,
+        description="The result of each item, in input order.",
+    )
+
+    @staticmethod
+    def mutate(root, info, input):
+        """Validates every item, then completes the valid ones in one update."""
+        job_ids = decode_global_ids([item.id for item in input], "DeliveryJobType")
+        errors = {}
+        positions = {}
+        for position, job_id in enumerate(job_ids):
+            if job_id is None:
+                errors[position] = "Invalid job ID."
+            elif job_id in positions:
+                errors[position] = "Job appears more than once in the input."
+            else:
+                positions[job_id] = position
+        for job_id, error in get_completion_errors(list(positions)).items():
+            errors[positions.pop(job_id)] = error
+
+        completed = {}
+        if positions:
+            with transaction.atomic():
+                completed = complete_jobs(
+                    {
+                        job_id: input[position].completed_at
+                        for job_id, position in positions.items()
+                    }
+                )
+                # Completed or unassigned concurrently since they were checked
+                for job_id, error in get_completion_errors(
+                    [job_id for job_id in positions if job_id not in completed]
+                ).items():
+                    errors[positions[job_id]] = error
+
+        return MarkJobsCompleted(
+            results=[
+                MarkJobCompletedResult(
+                    id=item.id,
+                    job=None if position in errors else completed.get(job_id),
+                    error=errors.get(position),
+                )
+                for position, (item, job_id) in enumerate(zip(input, job_ids))
+            ]
+        )
+
+
+def get_completion_errors(job_ids):
+    """
+    Returns why each of the given jobs can't be marked as completed, by id, with
+    one query. Jobs that can are left out.
+    """
+    found = dict.fromkeys(job_ids, "Job does not exist.")
+    for job_id, vehicle_id, completed_at in DeliveryJob.objects.filter(
+        id__in=job_ids
+    ).values_list("id", "vehicle_id", "completed_at"):
+        if vehicle_id is None:
+            found[job_id] = "Job must have an assigned vehicle to mark it as completed."
+        elif completed_at is not None:
+            found[job_id] = (
+                f"Job has already been marked as completed at {completed_at}."
+            )
+        else:
+            del found[job_id]
+    return found
+
+
+def complete_jobs(completed_at):
+    """
+    Marks the jobs of `completed_at`, a mapping of job ids to completion times, as
+    completed in one update, if they have a vehicle and aren't completed yet.
+    Returns the completed jobs by id.
+    """
+    job_ids = sorted(completed_at)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {DeliveryJob._meta.db_table} job
+            SET completed_at = completion.completed_at, updated_at = %s
+            FROM unnest(%s::bigint[], %s::timestamptz[])
+                AS completion(id, completed_at)
+            WHERE job.id = completion.id
+                AND job.completed_at IS NULL
+                AND job.vehicle_id IS NOT NULL
+            RETURNING job.id, job.vehicle_id, job.income, job.cost
+            """,
+            [timezone.now(), job_ids, [completed_at[job_id] for job_id in job_ids]],
+        )
+        rows = cursor.fetchall()
+    if not rows:
+        return {}
+    VehicleRollup.objects.apply(
+        rollup_deltas(
+            added=[
+                (vehicle_id, True, income, cost) for _, vehicle_id, income, cost in rows
+            ],
+            removed=[
+                (vehicle_id, False, income, cost)
+                for _, vehicle_id, income, cost in rows
+            ],
+        )
+    )
+    invalidate_job_results(
+        job_ids=[job_id for job_id, *_ in rows],
+        registrations=[vehicle_id for _, vehicle_id, *_ in rows],
+    )
+    return DeliveryJob.objects.in_bulk([job_id for job_id, *_ in rows])
+
+
+class DispatchJobs(graphene.Mutation):
+    """
+    Mutation for assigning the unassigned jobs with a slot starting in a range to
+    vehicles whose slots they don't overlap, balancing the number of jobs per
+    vehicle. See `jobs.dispatch`.
+    """
+
+    class Arguments:
+        delivery_slot_starts_after = graphene.DateTime(required=True)
+        delivery_slot_starts_before = graphene.DateTime(required=True)
+
+    assigned = graphene.Int(required=True)
+    unassigned = graphene.Int(
+        required=True, description="Jobs in the range no vehicle was free for."
+    )
+
+    @staticmethod
+    def mutate(root, info, delivery_slot_starts_after, delivery_slot_starts_before):
+        """Computes the assignments, then writes them in batches."""
+        if delivery_slot_starts_after >= delivery_slot_starts_before:
+            raise Exception("The range of slot starts is empty.")
+        num_jobs, assigned = dispatch_jobs(
+            delivery_slot_starts_after, delivery_slot_starts_before
+        )
+        return DispatchJobs(assigned=assigned, unassigned=num_jobs - assigned)
 
 
 class Mutation(graphene.ObjectType):
     """Root-level mutation fields."""
 
     create_job = CreateJob.Field()
+    create_jobs = CreateJobs.Field()
     mark_job_completed = MarkJobCompleted.Field()
+    mark_jobs_completed = MarkJobsCompleted.Field()
+    dispatch_jobs = DispatchJobs.Field()
 
 
 schema = graphene.Schema(query=Query, mutation=Mutation)
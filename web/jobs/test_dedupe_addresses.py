@@ -0,0 +1,74 @@
+from datetime import datetime, timezone
+
+from django.core.management import call_command
+
+from jobs.archive import archive_jobs
+from jobs.factories import DeliveryJobFactory
+from jobs.models import (
+    Address,
+    ArchivedDeliveryJob,
+    DeliveryJob,
+    DeliveryJobWithArchive,
+)
+
+
+def test_dedupe_addresses_merges_legacy_rows(db):
+    fields = {
+        "recipient": "Jane Doe",
+        "street_address": "1 Main Street",
+        "city": "Springfield",
+        "state": "IL",
+        "zip_code": "627011234",
+    }
+    canonical = Address.objects.create(**fields)
+    # Rows stored before deduplication, which bulk_create leaves unhashed
+    legacy = Address.objects.bulk_create(
+        [
+            Address(**{**fields, "recipient": "JANE  DOE"}),
+            Address(**{**fields, "zip_code": "62701-1234"}),
+            Address(**{**fields, "city": "Shelbyville"}),
+        ]
+    )
+    jobs = [DeliveryJobFactory(destination=address) for address in legacy]
+
+    call_command("dedupe_addresses", batch_size=2)
+
+    assert not Address.objects.filter(content_hash=None).exists()
+    assert Address.objects.count() == 2
+    assert [DeliveryJob.objects.get(pk=job.pk).destination_id for job in jobs] == [
+        canonical.id,
+        canonical.id,
+        legacy[2].id,
+    ]
+    assert Address.objects.get(pk=legacy[2].pk).zip_code == "62701-1234"
+
+
+def test_dedupe_addresses_repoints_archived_jobs(db):
+    fields = {
+        "recipient": "Jane Doe",
+        "street_address": "1 Main Street",
+        "city": "Springfield",
+        "state": "IL",
+        "zip_code": "62701",
+    }
+    canonical = Address.objects.create(**fields)
+    (legacy,) = Address.objects.bulk_create(
+        [Address(**{**fields, "recipient": "JANE DOE"})]
+    )
+    archived = DeliveryJobFactory(
+        destination=legacy,
+        delivery_slot_starts_at=datetime(2022, 6, 1, 10, tzinfo=timezone.utc),
+        completed_at=datetime(2022, 6, 1, 11, tzinfo=timezone.utc),
+    )
+    # Keeps the legacy address in the hot table
+    DeliveryJobFactory(destination=legacy)
+    archive_jobs(datetime(2023, 1, 1, tzinfo=timezone.utc))
+    assert ArchivedDeliveryJob.objects.get().destination_id == legacy.id
+
+    call_command("dedupe_addresses")
+
+    assert ArchivedDeliveryJob.objects.get().destination_id == canonical.id
+    job = DeliveryJobWithArchive.objects.select_related("destination").get(
+        pk=archived.pk
+    )
+    assert job.destination.recipient == "Jane Doe"
@@ -0,0 +1,34 @@
+import pytest
+from django.core.management import call_command
+
+from jobs.models import Address, DeliveryJob
+from vehicles.models import Vehicle
+
+
+def generated_rows():
+    return list(
+        DeliveryJob.objects.order_by("id").values_list(
+            "vehicle_id",
+            "destination__recipient",
+            "destination__zip_code",
+            "income",
+            "cost",
+            "delivery_slot_starts_at",
+            "completed_at",
+        )
+    )
+
+
+@pytest.mark.parametrize("method", ["bulk", "copy"])
+def test_fake_data_is_reproducible(transactional_db, method):
+    options = {"vehicles": 3, "jobs": 25, "chunk_size": 10, "seed": 42}
+
+    call_command("fake_data", "create", method=method, **options)
+    first_run = generated_rows()
+    call_command("fake_data", "destroy")
+    assert not Vehicle.objects.exists() and not Address.objects.exists()
+
+    call_command("fake_data", "create", method=method, **options)
+
+    assert len(first_run) == 25
+    assert generated_rows() == first_run
@@ -0,0 +1,154 @@
+import csv
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from jobs.management.commands.import_jobs import Command
+from jobs.models import Address, DeliveryJob, JobImport
+from vehicles.models import Vehicle, VehicleRollup
+
+COLUMNS = (
+    "vehicle_registration",
+    "created_at",
+    "completed_at",
+    "income",
+    "cost",
+    "delivery_slot_starts_at",
+    "delivery_slot_ends_at",
+    "recipient",
+    "street_address",
+    "street_address_2",
+    "city",
+    "state",
+    "zip_code",
+)
+
+
+def job_row(**kwargs):
+    return {
+        "vehicle_registration": "AB12 CDE",
+        "created_at": "2023-06-01T09:00:00Z",
+        "completed_at": "",
+        "income": "120.00",
+        "cost": "30.00",
+        "delivery_slot_starts_at": "2023-06-02T10:00:00Z",
+        "delivery_slot_ends_at": "2023-06-02T12:00:00Z",
+        "recipient": "Jane Doe",
+        "street_address": "1 Main Street",
+        "street_address_2": "",
+        "city": "Springfield",
+        "state": "IL",
+        "zip_code": "62701",
+        **kwargs,
+    }
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    rows = [
+        job_row(),
+        job_row(income="lots"),
+        # The same address, written differently
+        job_row(recipient=" jane  doe", state="il", completed_at="2023-06-02T11:00Z"),
+        job_row(vehicle_registration="", zip_code="10001"),
+        job_row(vehicle_registration="XY99 ZZZ", cost="5.00"),
+    ]
+    path = tmp_path / "jobs.csv"
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def import_jobs(path, **options):
+    stdout, stderr = StringIO(), StringIO()
+    call_command("import_jobs", str(path), stdout=stdout, stderr=stderr, **options)
+    return stdout.getvalue(), stderr.getvalue()
+
+
+def test_import_jobs_from_csv(db, csv_file):
+    stdout, stderr = import_jobs(csv_file, chunk_size=2)
+
+    assert "Imported 4 delivery jobs" in stdout and "rejected 1 rows" in stdout
+    assert stderr.startswith("Row 2: ")
+    assert set(Vehicle.objects.values_list("registration", flat=True)) == {
+        "AB12 CDE",
+        "XY99 ZZZ",
+    }
+    assert Address.objects.count() == 2
+    jobs = list(DeliveryJob.objects.order_by("id"))
+    assert [job.income for job in jobs] == [120, 120, 120, 120]
+    assert jobs[0].created_at.year == 2023
+    assert jobs[0].destination_id == jobs[1].destination_id
+    assert jobs[2].vehicle_id is None
+    rollup = VehicleRollup.objects.get(vehicle_id="AB12 CDE")
+    assert (rollup.job_count, rollup.completed_count, rollup.total_cost) == (2, 1, 60)
+
+    # A finished import isn't loaded again
+    stdout, _ = import_jobs(csv_file)
+    assert "was already imported" in stdout
+    assert DeliveryJob.objects.count() == 4
+
+
+def test_import_jobs_resumes_after_interruption(db, csv_file, monkeypatch):
+    insert_rows = Command.insert_rows
+    calls = []
+
+    def interrupted_insert_rows(self, staged):
+        calls.append(staged)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        return insert_rows(self, staged)
+
+    monkeypatch.setattr(Command, "insert_rows", interrupted_insert_rows)
+    with pytest.raises(KeyboardInterrupt):
+        import_jobs(csv_file, chunk_size=2)
+    assert JobImport.objects.get().rows_read == 2
+    assert DeliveryJob.objects.count() == 1
+
+    monkeypatch.setattr(Command, "insert_rows", insert_rows)
+    stdout, _ = import_jobs(csv_file, chunk_size=2)
+
+    assert "Resuming after row 2" in stdout
+    assert DeliveryJob.objects.count() == 4
+    job_import = JobImport.objects.get()
+    assert (job_import.rows_read, job_import.imported, job_import.rejected) == (5, 4, 1)
+    assert job_import.finished_at is not None
+
+
+def test_import_jobs_from_ndjson(db, tmp_path):
+    path = tmp_path / "jobs.ndjson"
+    rejects = tmp_path / "rejects.ndjson"
+    path.write_text(
+        "\n".join(
+            [
+                json.dumps(job_row(completed_at=None, income=99.5)),
+                "{not json",
+                json.dumps(job_row(state="Illinois")),
+            ]
+        )
+    )
+
+    stdout, stderr = import_jobs(path, rejects=str(rejects))
+
+    assert "Imported 1 delivery jobs" in stdout and not stderr
+    assert DeliveryJob.objects.get().income == 99.5
+    assert [
+        reject["row"] for reject in map(json.loads, rejects.read_text().splitlines())
+    ] == [2, 3]
+
+
+def test_import_jobs_rejects_changed_files(db, csv_file):
+    import_jobs(csv_file)
+    with open(csv_file, "a") as file:
+        file.write("\n")
+
+    with pytest.raises(CommandError, match="changed since"):
+        import_jobs(csv_file)
+    stdout, _ = import_jobs(csv_file, restart=True)
+
+    assert "Imported 4 delivery jobs" in stdout
+    assert DeliveryJob.objects.count() == 8
@@ -0,0 +1,188 @@
+from datetime import datetime, timezone
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from jobs.analytics import job_analytics, refresh_job_rollups
+from jobs.archive import archive_jobs
+from jobs.factories import AddressFactory, DeliveryJobFactory
+from jobs.models import (
+    Address,
+    ArchivedAddress,
+    ArchivedDeliveryJob,
+    DeliveryJob,
+    JobArchiveRun,
+)
+from vehicles.factories import VehicleFactory
+from vehicles.models import VehicleRollup
+
+CUTOFF = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+JOBS_QUERY = """
+    query Jobs($completedBefore: DateTime, $completedAfter: DateTime) {
+        deliveryJobs(
+            completedAt_Lt: $completedBefore
+            completedAt_Gte: $completedAfter
+        ) {
+            totalCount
+            totalIncome
+            edges {
+                node {
+                    id
+                    income
+                    vehicle { registration }
+                    destination { city }
+                }
+            }
+        }
+    }
+"""
+
+
+@pytest.fixture
+def jobs(db):
+    vehicle = VehicleFactory(registration="AB12 CDE")
+    shared = AddressFactory(city="Springfield")
+    return [
+        # Archived, with an address no other job refers to
+        DeliveryJobFactory(
+            vehicle=vehicle,
+            destination__city="Shelbyville",
+            delivery_slot_starts_at=datetime(2022, 5, 1, 10, tzinfo=timezone.utc),
+            completed_at=datetime(2022, 5, 1, 11, tzinfo=timezone.utc),
+            income="100.00",
+        ),
+        # Archived, but its address is still used by the next job
+        DeliveryJobFactory(
+            vehicle=vehicle,
+            destination=shared,
+            delivery_slot_starts_at=datetime(2022, 6, 1, 10, tzinfo=timezone.utc),
+            completed_at=datetime(2022, 6, 1, 11, tzinfo=timezone.utc),
+            income="50.00",
+        ),
+        DeliveryJobFactory(
+            vehicle=vehicle,
+            destination=shared,
+            delivery_slot_starts_at=datetime(2023, 3, 1, 10, tzinfo=timezone.utc),
+            completed_at=datetime(2023, 3, 1, 11, tzinfo=timezone.utc),
+            income="20.00",
+        ),
+        # Not completed
+        DeliveryJobFactory(
+            vehicle=None,
+            delivery_slot_starts_at=datetime(2022, 7, 1, 10, tzinfo=timezone.utc),
+            income="5.00",
+        ),
+    ]
+
+
+def test_archive_jobs_moves_old_completed_jobs(jobs):
+    rollup = VehicleRollup.objects.values_list("job_count", "total_income").get()
+    analytics = job_analytics(
+        "month", start=datetime(2022, 1, 1).date(), end=datetime(2024, 1, 1).date()
+    )
+    refresh_job_rollups()
+
+    run = archive_jobs(CUTOFF, batch_size=1)
+
+    assert (run.jobs, run.addresses) == (2, 1)
+    assert run.archived_before == CUTOFF and run.finished_at is not None
+    assert set(ArchivedDeliveryJob.objects.values_list("id", flat=True)) == {
+        jobs[0].id,
+        jobs[1].id,
+    }
+    assert set(DeliveryJob.objects.values_list("id", flat=True)) == {
+        jobs[2].id,
+        jobs[3].id,
+    }
+    assert ArchivedAddress.objects.get().city == "Shelbyville"
+    assert Address.objects.filter(city="Springfield").exists()
+
+    # Archived jobs still count in the rollups, even once rebuilt
+    assert VehicleRollup.objects.rebuild() == 0
+    assert (
+        VehicleRollup.objects.values_list("job_count", "total_income").get() == rollup
+    )
+    refresh_job_rollups(full=True)
+    assert (
+        job_analytics(
+            "month", start=datetime(2022, 1, 1).date(), end=datetime(2024, 1, 1).date()
+        )
+        == analytics
+    )
+
+
+def test_archive_jobs_command_keeps_the_cutoff(jobs):
+    stdout = StringIO()
+    call_command("archive_jobs", months=1, stdout=stdout)
+    assert "Archived 3 delivery jobs" in stdout.getvalue()
+
+    # A later run with an earlier cutoff doesn't hide the archived jobs
+    run = archive_jobs(CUTOFF)
+    assert run.jobs == 0 and run.archived_before > CUTOFF
+    assert JobArchiveRun.objects.count() == 2
+
+
+def get_jobs(graphql_client, graphql_context, **variables):
+    response = graphql_client.execute(
+        JOBS_QUERY, variables=variables, context_value=graphql_context
+    )
+    assert "errors" not in response
+    connection = response["data"]["deliveryJobs"]
+    return (
+        connection["totalCount"],
+        connection["totalIncome"],
+        [edge["node"]["destination"]["city"] for edge in connection["edges"]],
+    )
+
+
+def test_delivery_jobs_only_read_the_archive_when_filters_reach_it(
+    graphql_client, graphql_context, jobs, django_assert_num_queries
+):
+    archive_jobs(CUTOFF)
+
+    # The hot path doesn't look up the archive
+    with django_assert_num_queries(3):
+        total_count, total_income, _ = get_jobs(graphql_client, graphql_context)
+    assert (total_count, total_income) == (2, "25.00")
+    total_count, _, _ = get_jobs(
+        graphql_client, graphql_context, completedAfter="2022-12-01T00:00Z"
+    )
+    assert total_count == 1
+
+    total_count, total_income, cities = get_jobs(
+        graphql_client, graphql_context, completedBefore="2023-06-01T00:00Z"
+    )
+    assert (total_count, total_income) == (3, "170.00")
+    assert sorted(cities) == ["Shelbyville", "Springfield", "Springfield"]
+    total_count, _, _ = get_jobs(
+        graphql_client, graphql_context, completedBefore="2022-05-15T00:00Z"
+    )
+    assert total_count == 1
+
+
+def test_delivery_jobs_resolve_archived_jobs(graphql_client, graphql_context, jobs):
+    archive_jobs(CUTOFF)
+
+    response = graphql_client.execute(
+        """
+        query {
+            deliveryJobs(completedAt_Lt: "2022-05-15T00:00Z", keyset: true) {
+                edges { node { income vehicle { registration } destination { city } } }
+            }
+        }
+        """,
+        context_value=graphql_context,
+    )
+
+    assert "errors" not in response
+    assert response["data"]["deliveryJobs"]["edges"] == [
+        {
+            "node": {
+                "income": "100.00",
+                "vehicle": {"registration": "AB12 CDE"},
+                "destination": {"city": "Shelbyville"},
+            }
+        }
+    ]
@@ -0,0 +1,76 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from jobs.benchmarks import BENCHMARKS, Benchmark, run_benchmarks
+from jobs.factories import DeliveryJobFactory
+from jobs.models import DeliveryJob
+from vehicles.factories import VehicleFactory
+
+
+@pytest.mark.parametrize("num_vehicles", [1, 5])
+def test_benchmarks_stay_within_their_query_bounds(db, num_vehicles):
+    for vehicle in VehicleFactory.create_batch(num_vehicles):
+        DeliveryJobFactory.create_batch(5, vehicle=vehicle)
+
+    results = run_benchmarks(iterations=2)
+
+    # The same counts whatever the size of the data
+    assert {name: result["queries"] for name, result in results.items()} == {
+        benchmark.name: benchmark.max_queries for benchmark in BENCHMARKS
+    }
+
+
+def test_benchmark_operations_command(db, tmp_path):
+    output = tmp_path / "results.json"
+    stdout = StringIO()
+
+    call_command(
+        "benchmark_operations",
+        vehicles=3,
+        jobs=30,
+        iterations=2,
+        only=["deliveryJobs uncompleted", "markJobCompleted"],
+        output=str(output),
+        stdout=stdout,
+        stderr=StringIO(),
+    )
+
+    results = json.loads(output.read_text())
+    assert results["options"]["jobs"] == 30
+    assert set(results["benchmarks"]) == {
+        "deliveryJobs uncompleted",
+        "markJobCompleted",
+    }
+    assert results["benchmarks"]["markJobCompleted"]["iterations"] == 2
+    # Generated and benchmark data are rolled back
+    assert not DeliveryJob.objects.exists()
+
+    call_command(
+        "benchmark_operations",
+        jobs=30,
+        iterations=1,
+        only=["markJobCompleted"],
+        compare=str(output),
+        stdout=stdout,
+        stderr=StringIO(),
+    )
+    assert "queries +0" in stdout.getvalue()
+
+
+def test_benchmark_operations_fails_past_query_bounds(db, monkeypatch):
+    DeliveryJobFactory()
+    strict = [
+        Benchmark(benchmark.name, benchmark.query, 1, benchmark.get_variables)
+        for benchmark in BENCHMARKS
+        if benchmark.name == "deliveryJobs uncompleted"
+    ]
+    monkeypatch.setattr(
+        "jobs.management.commands.benchmark_operations.BENCHMARKS", strict
+    )
+
+    with pytest.raises(CommandError, match=r"deliveryJobs uncompleted \(2 > 1\)"):
+        call_command("benchmark_operations", iterations=1, stdout=StringIO())
@@ -0,0 +1,180 @@
+import math
+from datetime import datetime, timezone
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from jobs.dispatch import (
+    Schedule,
+    dispatch_jobs,
+    get_zip_centroids,
+    solve,
+    write_assignments,
+    zip_distance,
+)
+from jobs.factories import DeliveryJobFactory
+from jobs.models import DeliveryJob
+from vehicles.factories import VehicleFactory
+from vehicles.models import VehicleRollup
+
+
+def at(day, hour):
+    return datetime(2024, 12, day, hour, tzinfo=timezone.utc)
+
+
+def test_zip_distance():
+    centroids = {
+        # Springfield, IL and Chicago, IL
+        "62701": (math.radians(39.80), math.radians(-89.65)),
+        "60601": (math.radians(41.89), math.radians(-87.62)),
+    }
+
+    assert zip_distance("62701", "62701-1234", centroids) == 0
+    assert 280 < zip_distance("62701", "60601", centroids) < 290
+    # Without a centroid, from the common prefix
+    assert zip_distance("62701", "62704", centroids) == 5
+    assert zip_distance("62701", "10001", centroids) == 1500
+
+
+def test_bundled_zip_centroids(settings):
+    settings.DISPATCH_ZIP_CENTROIDS = None
+    get_zip_centroids.cache_clear()
+    try:
+        centroids = get_zip_centroids()
+    finally:
+        get_zip_centroids.cache_clear()
+
+    # Springfield, IL and Chicago, IL, by their 3-digit prefix
+    assert 280 < zip_distance("62704", "60614", centroids) < 290
+    # Prefixes of one city
+    assert zip_distance("77002", "77201", centroids) == 25
+    assert zip_distance("77002", "77019", centroids) == 25
+    # Without a centroid
+    assert zip_distance("77002", "59801", centroids) == 1500
+
+
+def test_solve_respects_slots_and_balances_load():
+    schedules = {"A": Schedule(), "B": Schedule()}
+    # A stored job of B
+    schedules["B"].add(at(1, 9), at(1, 11), "10001")
+    jobs = [
+        (1, at(1, 10), at(1, 12), "62701"),
+        (2, at(1, 10), at(1, 12), "62701"),
+        (3, at(1, 12), at(1, 13), "62701"),
+        (4, at(1, 12), at(1, 13), "10001"),
+        (5, at(1, 12), at(1, 13), "62701"),
+    ]
+
+    assignments = solve(jobs, schedules, centroids={})
+
+    # Only A is free at 10, then both are at 12 and jobs go to the one whose
+    # previous job is nearest, until it's taken
+    assert assignments == {1: "A", 3: "A", 4: "B"}
+    for schedule in schedules.values():
+        assert all(
+            end <= start for end, start in zip(schedule.ends, schedule.starts[1:])
+        )
+
+
+def test_solve_offers_jobs_to_the_vehicles_with_fewest_jobs():
+    schedules = {"A": Schedule(), "B": Schedule(), "C": Schedule()}
+    schedules["A"].add(at(1, 8), at(1, 9), "62701")
+    jobs = [
+        (job_id, at(1, 10 + job_id), at(1, 11 + job_id), "62701") for job_id in range(6)
+    ]
+
+    assignments = solve(jobs, schedules, candidates=1, centroids={})
+
+    assert list(assignments.values()) == ["B", "C", "A", "B", "C", "A"]
+
+
+@pytest.fixture
+def jobs(db):
+    vehicles = [VehicleFactory(registration="AB12 CDE"), VehicleFactory()]
+    DeliveryJobFactory(
+        vehicle=vehicles[0], delivery_slot_starts_at=at(2, 10), slot_hours=2
+    )
+    return [
+        DeliveryJobFactory(
+            vehicle=None,
+            delivery_slot_starts_at=at(2, hour),
+            slot_hours=2,
+            income="100.00",
+            cost="30.00",
+        )
+        for hour in (10, 10, 10, 14)
+    ]
+
+
+def test_dispatch_jobs(jobs):
+    assert dispatch_jobs(at(2, 0), at(3, 0), batch_size=1) == (4, 2)
+
+    assigned = set(
+        DeliveryJob.objects.filter(vehicle__isnull=False).values_list("id", flat=True)
+    )
+    # One of the jobs at 10 fits the free vehicle, the one at 14 either
+    assert len(assigned & {job.id for job in jobs[:3]}) == 1
+    assert jobs[3].id in assigned
+    assert sorted(VehicleRollup.objects.values_list("job_count", flat=True)) == [1, 2]
+    assert VehicleRollup.objects.rebuild() == 0
+
+    # Nothing left that fits
+    assert dispatch_jobs(at(2, 0), at(3, 0)) == (2, 0)
+
+
+def test_write_assignments_skips_jobs_taken_meanwhile(jobs):
+    registration = VehicleFactory().registration
+    DeliveryJobFactory(
+        vehicle_id=registration, delivery_slot_starts_at=at(2, 15), slot_hours=1
+    )
+    DeliveryJob.objects.filter(id=jobs[1].id).update(vehicle="AB12 CDE")
+
+    assert (
+        write_assignments(
+            {
+                jobs[0].id: (registration, at(2, 10), at(2, 12)),
+                jobs[1].id: (registration, at(2, 12), at(2, 14)),
+                jobs[3].id: (registration, at(2, 14), at(2, 16)),
+            }
+        )
+        == 1
+    )
+    assert DeliveryJob.objects.get(id=jobs[0].id).vehicle_id == registration
+    assert DeliveryJob.objects.get(id=jobs[1].id).vehicle_id == "AB12 CDE"
+    assert DeliveryJob.objects.get(id=jobs[3].id).vehicle_id is None
+
+
+def test_dispatch_jobs_command(jobs):
+    stdout = StringIO()
+    call_command("dispatch_jobs", start="2024-12-02T00:00Z", stdout=stdout)
+
+    assert "Assigned 2 of 4 unassigned delivery jobs" in stdout.getvalue()
+
+
+def test_dispatch_jobs_mutation(graphql_client, jobs):
+    mutation = """
+        mutation Dispatch($after: DateTime!, $before: DateTime!) {
+            dispatchJobs(
+                deliverySlotStartsAfter: $after
+                deliverySlotStartsBefore: $before
+            ) {
+                assigned
+                unassigned
+            }
+        }
+    """
+
+    response = graphql_client.execute(
+        mutation,
+        variables={"after": "2024-12-02T00:00Z", "before": "2024-12-03T00:00Z"},
+    )
+
+    assert response["data"]["dispatchJobs"] == {"assigned": 2, "unassigned": 2}
+
+    response = graphql_client.execute(
+        mutation,
+        variables={"after": "2024-12-03T00:00Z", "before": "2024-12-02T00:00Z"},
+    )
+
+    assert response["errors"][0]["message"] == "The range of slot starts is empty."
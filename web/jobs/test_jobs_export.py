@@ -0,0 +1,87 @@
+import csv
+import json
+from datetime import datetime, timezone
+from io import StringIO
+
+import pytest
+
+from jobs.archive import archive_jobs
+from jobs.factories import DeliveryJobFactory
+from jobs.views import DeliveryJobExportView
+
+
+@pytest.fixture
+def jobs(db):
+    return [
+        DeliveryJobFactory(income="10.00", destination__city="Springfield"),
+        DeliveryJobFactory(
+            vehicle=None,
+            income="99.00",
+            completed_at=datetime(2024, 3, 5, 10, tzinfo=timezone.utc),
+        ),
+        DeliveryJobFactory(income="60.00"),
+    ]
+
+
+def test_export_streams_ndjson(client, jobs, monkeypatch):
+    monkeypatch.setattr(DeliveryJobExportView, "chunk_size", 2)
+
+    response = client.get("/export/delivery-jobs/")
+
+    assert response.status_code == 200
+    assert response.streaming
+    assert response["Content-Type"] == "application/x-ndjson"
+    chunks = [chunk.decode() for chunk in response.streaming_content]
+    assert len(chunks) == 2
+    rows = [json.loads(line) for line in "".join(chunks).splitlines()]
+    assert [row["id"] for row in rows] == [job.id for job in jobs]
+    assert rows[0]["city"] == "Springfield"
+    assert rows[0]["vehicle_registration"] == jobs[0].vehicle_id
+    assert rows[1]["vehicle_registration"] is None
+    assert rows[1]["completed_at"] == "2024-03-05T10:00:00Z"
+
+
+def test_export_csv_applies_delivery_job_filters(client, jobs):
+    response = client.get(
+        "/export/delivery-jobs/",
+        {"format": "csv", "income_Gt": "50", "vehicle_Registration_Isnull": "false"},
+    )
+
+    assert response.status_code == 200
+    assert response["Content-Type"] == "text/csv"
+    rows = list(csv.DictReader(StringIO(b"".join(response.streaming_content).decode())))
+    assert [int(row["id"]) for row in rows] == [jobs[2].id]
+    assert rows[0]["income"] == "60.00"
+    assert rows[0]["zip_code"] == jobs[2].destination.zip_code
+
+
+@pytest.mark.parametrize(
+    "params", [{"format": "xml"}, {"income_Gt": "lots"}], ids=["format", "filter"]
+)
+def test_export_rejects_invalid_parameters(client, db, params):
+    response = client.get("/export/delivery-jobs/", params)
+
+    assert response.status_code == 400
+    assert "errors" in response.json()
+
+
+def test_export_reads_archived_jobs_when_filters_reach_them(client, db):
+    old = DeliveryJobFactory(completed_at=datetime(2022, 5, 1, 11, tzinfo=timezone.utc))
+    recent = DeliveryJobFactory(
+        completed_at=datetime(2023, 3, 1, 11, tzinfo=timezone.utc)
+    )
+    DeliveryJobFactory()
+    archive_jobs(datetime(2023, 1, 1, tzinfo=timezone.utc))
+
+    response = client.get(
+        "/export/delivery-jobs/", {"completedAt_Lt": "2023-06-01T00:00Z"}
+    )
+
+    assert response.status_code == 200
+    rows = [
+        json.loads(line)
+        for line in b"".join(response.streaming_content).decode().splitlines()
+    ]
+    assert [row["id"] for row in rows] == [old.id, recent.id]
+    assert rows[0]["city"] == old.destination.city
+    assert rows[0]["vehicle_registration"] == old.vehicle_id
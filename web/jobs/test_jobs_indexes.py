@@ -0,0 +1,75 @@
+import pytest
+from django.db import connection
+from django.utils import timezone
+
+from jobs.factories import DeliveryJobFactory
+from jobs.models import DeliveryJob
+from jobs.schema import DeliveryJobFilter
+
+
+@pytest.fixture
+def no_seqscan(db):
+    # Test tables are too small for the planner to prefer an index on its own.
+    # Plain index scans are off too, as a full scan of a primary key, filtered, may
+    # then look cheaper than a trigram index bloated by rows other tests rolled back,
+    # whereas a bitmap scan needs an index matching the filter.
+    with connection.cursor() as cursor:
+        cursor.execute("SET enable_seqscan = off")
+        cursor.execute("SET enable_indexscan = off")
+    yield
+    with connection.cursor() as cursor:
+        cursor.execute("RESET enable_seqscan")
+        cursor.execute("RESET enable_indexscan")
+
+
+@pytest.mark.parametrize(
+    "data,index_name",
+    [
+        ({"destination__recipient__contains": "mit"}, "address_recipient_trgm_idx"),
+        (
+            {"destination__street_address__endswith": "Street"},
+            "address_street_trgm_idx",
+        ),
+        (
+            {"destination__street_address_2__contains": "Apt"},
+            "address_street_2_trgm_idx",
+        ),
+        ({"destination__city__startswith": "Port"}, "address_city_trgm_idx"),
+        ({"destination__zip_code__startswith": "902"}, "address_zip_code_trgm_idx"),
+        ({"destination__state": "CA"}, "address_state_idx"),
+        ({"created_at__gte": timezone.now()}, "deliveryjob_created_at_idx"),
+        ({"completed_at__lt": timezone.now()}, "deliveryjob_completed_at_idx"),
+        ({"income__gt": 500}, "deliveryjob_income_idx"),
+        ({"cost__lte": 50}, "deliveryjob_cost_idx"),
+        (
+            {"delivery_slot_starts_at__gt": timezone.now()},
+            "deliveryjob_slot_start_id_idx",
+        ),
+        ({"delivery_slot_ends_at__lt": timezone.now()}, "deliveryjob_slot_ends_at_idx"),
+        (
+            {
+                "vehicle__registration": "AB12CDE",
+                "delivery_slot_starts_at__gte": timezone.now(),
+            },
+            "deliveryjob_vehicle_slot_idx",
+        ),
+    ],
+)
+def test_delivery_job_filters_use_indexes(no_seqscan, data, index_name):
+    DeliveryJobFactory.create_batch(3)
+
+    queryset = DeliveryJobFilter(data, queryset=DeliveryJob.objects.all()).qs
+
+    plan = queryset.explain()
+    assert any(name in plan for name in get_index_names(index_name))
+
+
+def get_index_names(index_name):
+    """Returns the names of an index and of its partitions (the table's indexes)."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT inhrelid::regclass::text FROM pg_inherits "
+            "WHERE inhparent = %s::regclass",
+            [index_name],
+        )
+        return {index_name, *(name for name, in cursor.fetchall())}
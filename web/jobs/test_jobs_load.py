@@ -0,0 +1,107 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from jobs.factories import DeliveryJobFactory
+from jobs.load import MUTATION_WEIGHTS, READ_WEIGHTS, summarize
+from jobs.models import DeliveryJob
+from vehicles.factories import VehicleFactory
+
+
+def test_summarize():
+    operations = [("Jobs", {})] * 100 + [("Vehicles", {})]
+    outcomes = [(index / 1000, None) for index in range(1, 101)]
+    outcomes[-1] = (0.1, "Job does not exist.")
+    outcomes.append((0.5, "HTTP 502"))
+
+    results = summarize(operations, outcomes, elapsed=2)
+
+    assert list(results) == ["Jobs", "Vehicles", "total"]
+    assert results["Jobs"] == {
+        "requests": 100,
+        "requests_per_second": 50.0,
+        "p50_ms": 50.0,
+        "p95_ms": 95.0,
+        "p99_ms": 99.0,
+        "max_ms": 100.0,
+        "errors": 1,
+        "error_rate": 0.01,
+        "error_messages": {"Job does not exist.": 1},
+    }
+    assert results["total"]["requests"] == 101
+    assert results["total"]["max_ms"] == 500.0
+    assert results["total"]["errors"] == 2
+
+
+def test_load_graphql_synthetic_mix(live_server, transactional_db, tmp_path):
+    for vehicle in VehicleFactory.create_batch(3):
+        DeliveryJobFactory.create_batch(2, vehicle=vehicle)
+    output = tmp_path / "results.json"
+
+    call_command(
+        "load_graphql",
+        url=f"{live_server.url}/graphql/",
+        requests=40,
+        concurrency=4,
+        mutations=True,
+        seed=1,
+        output=str(output),
+        stdout=StringIO(),
+        stderr=StringIO(),
+    )
+
+    results = json.loads(output.read_text())["operations"]
+    assert set(results) - {"total"} <= {*READ_WEIGHTS, *MUTATION_WEIGHTS}
+    assert results["total"]["requests"] == 40
+    assert results["total"]["errors"] == 0
+    assert results["markJobCompleted"]["requests"] > 0
+    assert DeliveryJob.objects.filter(completed_at__isnull=False).count() == (
+        results["markJobCompleted"]["requests"]
+    )
+
+
+def test_load_graphql_replays_recorded_operations(
+    live_server, transactional_db, tmp_path
+):
+    VehicleFactory()
+    recorded = tmp_path / "operations.ndjson"
+    recorded.write_text(
+        json.dumps(
+            {
+                "query": "query Vehicles { vehicles { edges { node { registration } } } }",
+                "operationName": "Vehicles",
+            }
+        )
+        + "\n\n"
+        + json.dumps({"query": "{ vehicles { unknownField } }"})
+        + "\n"
+    )
+    stdout, stderr = StringIO(), StringIO()
+
+    call_command(
+        "load_graphql",
+        url=f"{live_server.url}/graphql/",
+        replay=str(recorded),
+        requests=5,
+        concurrency=2,
+        stdout=stdout,
+        stderr=stderr,
+    )
+
+    lines = stdout.getvalue().splitlines()
+    assert lines[1].split()[:2] == ["Vehicles", "3"]
+    assert lines[1].endswith("0.0%")
+    assert lines[2].split()[:2] == ["anonymous", "2"]
+    assert lines[2].endswith("100.0%")
+    assert "anonymous: 2 x Cannot query field 'unknownField'" in stderr.getvalue()
+
+
+def test_load_graphql_rejects_invalid_recordings(tmp_path):
+    recorded = tmp_path / "operations.ndjson"
+    recorded.write_text('{"query": "{ vehicles { totalCount } }"}\n[1]\n')
+
+    with pytest.raises(CommandError, match="Line 2 isn't a request body."):
+        call_command("load_graphql", replay=str(recorded), stdout=StringIO())
@@ -1,16 +1,12 @@
 import pytest
 from django.utils import timezone
 from graphql_relay.node.node import to_global_id
-from graphene.test import Client
 
 from jobs.factories import DeliveryJobFactory
-from jobs.schema import schema
+from jobs.models import Address, DeliveryJob
+from jobs.schema import complete_jobs
 from vehicles.factories import VehicleFactory
-
-
-@pytest.fixture
-def client():
-    return Client(schema)
+from vehicles.models import VehicleRollup
 
 
 @pytest.fixture
@@ -28,7 +24,7 @@ def completed_job(db):
     return DeliveryJobFactory(completed_at=timezone.now())
 
 
-def test_mark_job_completed_no_vehicle(client, job_without_vehicle):
+def test_mark_job_completed_no_vehicle(graphql_client, job_without_vehicle):
     assert job_without_vehicle.completed_at is None
     assert job_without_vehicle.vehicle is None
 
@@ -42,7 +38,7 @@ def test_mark_job_completed_no_vehicle(client, job_without_vehicle):
         }
     """
 
-    response = client.execute(
+    response = graphql_client.execute(
         mutation,
         variables={
             "input": {
@@ -56,7 +52,7 @@ def test_mark_job_completed_no_vehicle(client, job_without_vehicle):
     assert "Job must have an assigned vehicle" in response["errors"][0]["message"]
 
 
-def test_mark_job_completed_already_completed(client, completed_job):
+def test_mark_job_completed_already_completed(graphql_client, completed_job):
     assert completed_job.completed_at is not None
     assert completed_job.vehicle is not None
 
@@ -70,7 +66,7 @@ def test_mark_job_completed_already_completed(client, completed_job):
         }
     """
 
-    response = client.execute(
+    response = graphql_client.execute(
         mutation,
         variables={
             "input": {
@@ -84,3 +80,220 @@ def test_mark_job_completed_already_completed(client, completed_job):
     assert (
         "Job has already been marked as completed" in response["errors"][0]["message"]
     )
+
+
+def create_job_input(**kwargs):
+    return {
+        "destination": {
+            "recipient": "Jane Doe",
+            "streetAddress": "1 Main Street",
+            "city": "Springfield",
+            "state": "IL",
+            "zipCode": "62701",
+        },
+        "income": "120.00",
+        "cost": "30.00",
+        "deliverySlotStartsAt": "2024-12-25T10:00:00Z",
+        "deliverySlotEndsAt": "2024-12-25T12:00:00Z",
+        **kwargs,
+    }
+
+
+CREATE_JOBS_MUTATION = """
+    mutation CreateJobs($input: [CreateJobInput!]!) {
+        createJobs(input: $input) {
+            jobs {
+                income
+                vehicle { registration }
+                destination { city }
+            }
+            errors { index message }
+        }
+    }
+"""
+
+
+@pytest.mark.parametrize("num_jobs", [1, 20])
+def test_create_jobs_in_bulk(graphql_client, db, django_assert_num_queries, num_jobs):
+    vehicle = VehicleFactory()
+    items = [
+        create_job_input(
+            vehicleRegistration=vehicle.registration,
+            deliverySlotStartsAt=f"2024-12-{day:02}T10:00:00Z",
+            deliverySlotEndsAt=f"2024-12-{day:02}T12:00:00Z",
+        )
+        for day in range(1, num_jobs + 1)
+    ]
+
+    # savepoint, vehicles, slot conflicts, addresses upsert and load, jobs, rollups,
+    # release - for any item count
+    with django_assert_num_queries(8):
+        response = graphql_client.execute(
+            CREATE_JOBS_MUTATION, variables={"input": items}
+        )
+
+    assert "errors" not in response
+    result = response["data"]["createJobs"]
+    assert result["errors"] == []
+    assert len(result["jobs"]) == num_jobs
+    assert all(
+        job["vehicle"]["registration"] == vehicle.registration for job in result["jobs"]
+    )
+    assert DeliveryJob.objects.filter(vehicle=vehicle).count() == num_jobs
+
+
+def test_create_jobs_reports_errors_per_item(graphql_client, db):
+    items = [
+        create_job_input(),
+        create_job_input(vehicleRegistration="UNKNOWN"),
+        create_job_input(income="123456.00"),
+    ]
+
+    response = graphql_client.execute(CREATE_JOBS_MUTATION, variables={"input": items})
+
+    assert "errors" not in response
+    result = response["data"]["createJobs"]
+    assert [job["destination"]["city"] for job in result["jobs"]] == ["Springfield"]
+    assert [error["index"] for error in result["errors"]] == [1, 2]
+    assert "Vehicle with specified registration not found" in (
+        result["errors"][0]["message"]
+    )
+    assert DeliveryJob.objects.count() == 1
+
+
+def test_create_jobs_reuses_addresses(graphql_client, db):
+    first = create_job_input()
+    second = create_job_input()
+    second["destination"] = {
+        **first["destination"],
+        "recipient": "  jane   DOE ",
+        "state": "il",
+    }
+
+    response = graphql_client.execute(
+        CREATE_JOBS_MUTATION, variables={"input": [first, second]}
+    )
+    assert response["data"]["createJobs"]["errors"] == []
+    response = graphql_client.execute(
+        CREATE_JOBS_MUTATION, variables={"input": [first]}
+    )
+    assert response["data"]["createJobs"]["errors"] == []
+
+    address = Address.objects.get()
+    assert (address.recipient, address.state) == ("Jane Doe", "IL")
+    assert DeliveryJob.objects.filter(destination=address).count() == 3
+
+
+def test_create_job_returns_the_stored_address(graphql_client, db):
+    graphql_client.execute(
+        CREATE_JOBS_MUTATION, variables={"input": [create_job_input()]}
+    )
+    item = create_job_input()
+    item["destination"] = {**item["destination"], "recipient": "jane doe"}
+
+    response = graphql_client.execute(
+        """
+        mutation CreateJob($input: CreateJobInput!) {
+            createJob(input: $input) { job { destination { recipient } } }
+        }
+        """,
+        variables={"input": item},
+    )
+
+    assert response["data"]["createJob"]["job"]["destination"] == {
+        "recipient": "Jane Doe"
+    }
+
+
+MARK_JOBS_COMPLETED_MUTATION = """
+    mutation MarkJobsCompleted($input: [MarkJobCompletedInput!]!) {
+        markJobsCompleted(input: $input) {
+            results {
+                id
+                job { completedAt }
+                error
+            }
+        }
+    }
+"""
+
+
+@pytest.mark.parametrize("num_jobs", [1, 20])
+def test_mark_jobs_completed_in_bulk(
+    graphql_client, db, django_assert_num_queries, num_jobs
+):
+    vehicle = VehicleFactory()
+    jobs = DeliveryJobFactory.create_batch(num_jobs, vehicle=vehicle, income="10.00")
+    items = [
+        {
+            "id": to_global_id("DeliveryJobType", job.id),
+            "completedAt": "2024-12-25T10:00:00+00:00",
+        }
+        for job in jobs
+    ]
+
+    # checks, savepoint, update, rollups, jobs, release - for any item count
+    with django_assert_num_queries(6):
+        response = graphql_client.execute(
+            MARK_JOBS_COMPLETED_MUTATION, variables={"input": items}
+        )
+
+    assert "errors" not in response
+    assert response["data"]["markJobsCompleted"]["results"] == [
+        {"id": item["id"], "job": {"completedAt": item["completedAt"]}, "error": None}
+        for item in items
+    ]
+    rollup = VehicleRollup.objects.get(vehicle=vehicle)
+    assert (rollup.job_count, rollup.completed_count) == (num_jobs, num_jobs)
+    assert VehicleRollup.objects.rebuild() == 0
+
+
+def test_mark_jobs_completed_reports_errors_per_item(
+    graphql_client, job_with_vehicle, job_without_vehicle, completed_job
+):
+    global_id = to_global_id("DeliveryJobType", job_with_vehicle.id)
+    items = [
+        {"id": global_id, "completedAt": "2024-12-25T10:00:00Z"},
+        {"id": global_id, "completedAt": "2024-12-25T11:00:00Z"},
+        {
+            "id": to_global_id("DeliveryJobType", job_without_vehicle.id),
+            "completedAt": "2024-12-25T10:00:00Z",
+        },
+        {
+            "id": to_global_id("DeliveryJobType", completed_job.id),
+            "completedAt": "2024-12-25T10:00:00Z",
+        },
+        {"id": to_global_id("DeliveryJobType", 0), "completedAt": "2024-12-25T10:00Z"},
+        {"id": to_global_id("VehicleType", "AB12"), "completedAt": "2024-12-25T10:00Z"},
+    ]
+
+    response = graphql_client.execute(
+        MARK_JOBS_COMPLETED_MUTATION, variables={"input": items}
+    )
+
+    assert "errors" not in response
+    results = response["data"]["markJobsCompleted"]["results"]
+    assert [result["job"] is not None for result in results] == [
+        True,
+        False,
+        False,
+        False,
+        False,
+        False,
+    ]
+    assert [result["error"] for result in results[1:]] == [
+        "Job appears more than once in the input.",
+        "Job must have an assigned vehicle to mark it as completed.",
+        f"Job has already been marked as completed at {completed_job.completed_at}.",
+        "Job does not exist.",
+        "Invalid job ID.",
+    ]
+
+
+def test_complete_jobs_skips_jobs_completed_concurrently(job_with_vehicle):
+    completed_at = {job_with_vehicle.id: timezone.now()}
+
+    assert list(complete_jobs(completed_at)) == [job_with_vehicle.id]
+    # As a request that checked the job before the first completed it would
+    assert complete_jobs(completed_at) == {}
+    assert VehicleRollup.objects.get().completed_count == 1
@@ -0,0 +1,102 @@
+from datetime import datetime, timezone
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from jobs.factories import DeliveryJobFactory
+from jobs.models import DeliveryJob
+from jobs.partitions import (
+    create_future_partitions,
+    create_partitions,
+    default_partition_name,
+    get_partitions,
+    month_start,
+    partition_name,
+)
+from jobs.schema import DeliveryJobFilter
+
+
+def partition_of(job):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT tableoid::regclass::text FROM {DeliveryJob._meta.db_table} "
+            "WHERE id = %s",
+            [job.pk],
+        )
+        return cursor.fetchone()[0]
+
+
+def test_jobs_are_stored_in_monthly_partitions(db):
+    # The migration creates partitions from the current month on
+    now = datetime.now(timezone.utc)
+    job = DeliveryJobFactory(delivery_slot_starts_at=now)
+    old_job = DeliveryJobFactory(
+        delivery_slot_starts_at=datetime(1999, 12, 31, 23, tzinfo=timezone.utc)
+    )
+
+    assert partition_of(job) == partition_name(month_start(now))
+    assert partition_of(old_job) == default_partition_name()
+
+
+def test_create_partitions_moves_jobs_out_of_default(db):
+    old_job = DeliveryJobFactory(
+        delivery_slot_starts_at=datetime(1999, 12, 31, 23, tzinfo=timezone.utc)
+    )
+    future_month = datetime(2030, 2, 1, tzinfo=timezone.utc)
+
+    created = create_future_partitions(
+        1, now=datetime(2030, 1, 15, tzinfo=timezone.utc)
+    )
+
+    assert created == [
+        "jobs_deliveryjob_p1999_12",
+        "jobs_deliveryjob_p2030_01",
+        "jobs_deliveryjob_p2030_02",
+    ]
+    assert partition_of(old_job) == "jobs_deliveryjob_p1999_12"
+    assert partition_name(future_month) in get_partitions()
+    call_command("create_job_partitions", months_ahead=1)
+    assert DeliveryJob.objects.get() == old_job
+
+
+@pytest.mark.parametrize(
+    "data,partitions",
+    [
+        (
+            {
+                "delivery_slot_starts_at__gte": datetime(
+                    2026, 11, 2, tzinfo=timezone.utc
+                ),
+                "delivery_slot_starts_at__lt": datetime(
+                    2026, 12, 1, tzinfo=timezone.utc
+                ),
+            },
+            {"jobs_deliveryjob_p2026_11"},
+        ),
+        (
+            {
+                "delivery_slot_starts_at__gt": datetime(
+                    2026, 11, 30, tzinfo=timezone.utc
+                ),
+                "delivery_slot_starts_at__lte": datetime(
+                    2026, 12, 1, tzinfo=timezone.utc
+                ),
+            },
+            {"jobs_deliveryjob_p2026_11", "jobs_deliveryjob_p2026_12"},
+        ),
+    ],
+)
+def test_slot_filters_prune_partitions(db, data, partitions):
+    create_partitions(
+        [
+            datetime(2026, 11, 1, tzinfo=timezone.utc),
+            datetime(2026, 12, 1, tzinfo=timezone.utc),
+        ]
+    )
+    queryset = DeliveryJobFilter(data, queryset=DeliveryJob.objects.all()).qs
+
+    plan = queryset.explain()
+
+    scanned = {name for name in get_partitions() if f" {name} " in plan}
+    assert scanned == partitions
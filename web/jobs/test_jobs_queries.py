@@ -0,0 +1,214 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from graphql_relay.node.node import to_global_id
+
+from jobs.factories import DeliveryJobFactory
+from logistics.loaders import get_loader
+from vehicles.models import Vehicle
+
+
+@pytest.mark.parametrize("page_size", [1, 10, 50])
+def test_delivery_jobs_joins_related_lookups(
+    graphql_client, graphql_context, db, django_assert_num_queries, page_size
+):
+    DeliveryJobFactory.create_batch(page_size)
+    DeliveryJobFactory(vehicle=None)
+
+    query = """
+        query DeliveryJobs($first: Int) {
+            deliveryJobs(first: $first) {
+                edges {
+                    node {
+                        vehicle { registration }
+                        destination { city }
+                    }
+                }
+            }
+        }
+    """
+
+    # count and page, with vehicle and destination joined in, regardless of page size
+    with django_assert_num_queries(2) as captured:
+        response = graphql_client.execute(
+            query, variables={"first": page_size + 1}, context_value=graphql_context
+        )
+
+    page_sql = captured.captured_queries[1]["sql"]
+    assert "JOIN" in page_sql
+    assert '"jobs_deliveryjob"."income"' not in page_sql
+    assert '"jobs_address"."recipient"' not in page_sql
+
+    assert "errors" not in response
+    nodes = [edge["node"] for edge in response["data"]["deliveryJobs"]["edges"]]
+    assert len(nodes) == page_size + 1
+    assert sum(node["vehicle"] is None for node in nodes) == 1
+    assert all(node["destination"]["city"] for node in nodes)
+
+
+def test_delivery_jobs_loads_totals_columns(
+    graphql_client, graphql_context, db, django_assert_num_queries
+):
+    DeliveryJobFactory.create_batch(5)
+
+    query = """
+        query {
+            deliveryJobs {
+                currentPageCost
+                edges {
+                    node { income }
+                }
+            }
+        }
+    """
+
+    with django_assert_num_queries(2):
+        response = graphql_client.execute(query, context_value=graphql_context)
+
+    assert "errors" not in response
+    assert len(response["data"]["deliveryJobs"]["edges"]) == 5
+    assert response["data"]["deliveryJobs"]["currentPageCost"] is not None
+
+
+def test_delivery_jobs_totals_cover_filtered_set(
+    graphql_client, graphql_context, db, django_assert_num_queries
+):
+    DeliveryJobFactory.create_batch(3, income="100.00", cost="40.00")
+    DeliveryJobFactory(income="10.00", cost="1.00")
+
+    query = """
+        query {
+            deliveryJobs(first: 2, income_Gte: 50) {
+                currentPageCount
+                currentPageIncome
+                totalCount
+                totalIncome
+                totalCost
+                totalProfit
+            }
+        }
+    """
+
+    # count, page and a single aggregate for every total
+    with django_assert_num_queries(3):
+        response = graphql_client.execute(query, context_value=graphql_context)
+
+    assert "errors" not in response
+    assert response["data"]["deliveryJobs"] == {
+        "currentPageCount": 2,
+        "currentPageIncome": "200.00",
+        "totalCount": 3,
+        "totalIncome": "300.00",
+        "totalCost": "120.00",
+        "totalProfit": "180.00",
+    }
+
+
+def test_loader_batches_primed_keys(graphql_context, db, django_assert_num_queries):
+    vehicles = [job.vehicle for job in DeliveryJobFactory.create_batch(3)]
+    info = SimpleNamespace(context=graphql_context)
+
+    loader = get_loader(info, Vehicle)
+    loader.prime([vehicle.pk for vehicle in vehicles] + ["missing"])
+    with django_assert_num_queries(1):
+        loaded = [loader.load(vehicle.pk) for vehicle in vehicles]
+        assert loader.load("missing") is None
+
+    assert loaded == vehicles
+    assert get_loader(info, Vehicle) is loader
+
+
+KEYSET_QUERY = """
+    query DeliveryJobs($first: Int, $last: Int, $after: String, $before: String) {
+        deliveryJobs(
+            keyset: true
+            first: $first
+            last: $last
+            after: $after
+            before: $before
+            income_Gte: 50
+        ) {
+            pageInfo { hasNextPage hasPreviousPage endCursor startCursor }
+            edges {
+                node { id deliverySlotStartsAt }
+            }
+        }
+    }
+"""
+
+
+def test_delivery_jobs_keyset_pagination(
+    graphql_client, graphql_context, db, django_assert_num_queries
+):
+    jobs = DeliveryJobFactory.create_batch(5, income="100.00")
+    DeliveryJobFactory(income="10.00")
+    expected = [
+        to_global_id("DeliveryJobType", job.id)
+        for job in sorted(jobs, key=lambda job: (job.delivery_slot_starts_at, job.id))
+    ]
+
+    seen = []
+    after = None
+    while True:
+        # A single query per page: no count and no offset
+        with django_assert_num_queries(1):
+            response = graphql_client.execute(
+                KEYSET_QUERY,
+                variables={"first": 2, "after": after},
+                context_value=graphql_context,
+            )
+        assert "errors" not in response
+        connection = response["data"]["deliveryJobs"]
+        seen.extend(edge["node"]["id"] for edge in connection["edges"])
+        if not connection["pageInfo"]["hasNextPage"]:
+            break
+        after = connection["pageInfo"]["endCursor"]
+
+    assert seen == expected
+
+    response = graphql_client.execute(
+        KEYSET_QUERY,
+        variables={"last": 2, "before": after},
+        context_value=graphql_context,
+    )
+    connection = response["data"]["deliveryJobs"]
+    assert [edge["node"]["id"] for edge in connection["edges"]] == expected[1:3]
+    assert connection["pageInfo"]["hasPreviousPage"]
+
+
+def test_delivery_jobs_keyset_pages_do_not_shift(graphql_client, graphql_context, db):
+    jobs = DeliveryJobFactory.create_batch(3, income="100.00")
+    first_page = graphql_client.execute(
+        KEYSET_QUERY, variables={"first": 2}, context_value=graphql_context
+    )["data"]["deliveryJobs"]
+
+    earliest = min(job.delivery_slot_starts_at for job in jobs)
+    DeliveryJobFactory(
+        income="100.00", delivery_slot_starts_at=earliest - timedelta(days=1)
+    )
+    second_page = graphql_client.execute(
+        KEYSET_QUERY,
+        variables={"first": 2, "after": first_page["pageInfo"]["endCursor"]},
+        context_value=graphql_context,
+    )["data"]["deliveryJobs"]
+
+    assert len(second_page["edges"]) == 1
+    assert second_page["edges"][0]["node"]["id"] not in {
+        edge["node"]["id"] for edge in first_page["edges"]
+    }
+
+
+def test_delivery_jobs_keyset_rejects_offset_cursor(
+    graphql_client, graphql_context, db
+):
+    DeliveryJobFactory.create_batch(2, income="100.00")
+
+    response = graphql_client.execute(
+        KEYSET_QUERY,
+        variables={"first": 1, "after": "YXJyYXljb25uZWN0aW9uOjA="},
+        context_value=graphql_context,
+    )
+
+    assert "errors" in response
+    assert "Invalid keyset cursor" in response["errors"][0]["message"]
@@ -0,0 +1,198 @@
+from datetime import datetime, timezone
+
+import pytest
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test.utils import CaptureQueriesContext
+from graphql_relay import to_global_id
+
+from jobs.factories import DeliveryJobFactory
+from jobs.models import DeliveryJob, overlapping_slots
+from jobs.test_jobs_indexes import get_index_names
+from vehicles.factories import VehicleFactory
+
+
+def at(day, hour):
+    return datetime(2024, 12, day, hour, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def vehicle(db):
+    vehicle = VehicleFactory(registration="AB12 CDE")
+    DeliveryJobFactory(vehicle=vehicle, delivery_slot_starts_at=at(2, 10), slot_hours=2)
+    return vehicle
+
+
+def test_overlapping_slots():
+    slots = [
+        ("A", at(1, 10), at(1, 12)),
+        ("A", at(1, 11), at(1, 13)),
+        # Only overlaps a slot that was left out
+        ("A", at(1, 12), at(1, 14)),
+        ("B", at(1, 11), at(1, 13)),
+        (None, at(1, 10), at(1, 12)),
+        ("A", at(1, 9), at(1, 9)),
+    ]
+
+    assert overlapping_slots(slots) == {1: 0}
+
+
+def test_find_slot_conflicts(vehicle):
+    job = DeliveryJob.objects.get()
+    slots = [
+        # Slots include their start but not their end
+        (vehicle.registration, at(2, 8), at(2, 10)),
+        (vehicle.registration, at(2, 11), at(2, 13)),
+        ("XY99 ZZZ", at(2, 11), at(2, 13)),
+        (None, at(2, 11), at(2, 13)),
+    ]
+
+    assert DeliveryJob.objects.find_slot_conflicts(slots) == {1: [job.id]}
+    assert DeliveryJob.objects.find_slot_conflicts(slots, exclude_ids=[job.id]) == {}
+
+
+def test_find_slot_conflicts_uses_the_gist_index(vehicle):
+    with CaptureQueriesContext(connection) as captured:
+        DeliveryJob.objects.find_slot_conflicts(
+            [(vehicle.registration, at(2, 11), at(2, 13))]
+        )
+
+    with connection.cursor() as cursor:
+        # Test tables are too small for the planner to prefer an index on its own
+        cursor.execute("SET enable_seqscan = off")
+        cursor.execute(f"EXPLAIN {captured[0]['sql']}")
+        plan = "\n".join(row for row, in cursor.fetchall())
+        cursor.execute("RESET enable_seqscan")
+    assert any(
+        name in plan for name in get_index_names("deliveryjob_vehicle_slot_gist")
+    )
+
+
+def test_create_jobs_rejects_overlapping_slots(graphql_client, vehicle):
+    job = DeliveryJob.objects.get()
+    items = [
+        {
+            "destination": {
+                "recipient": "Jane Doe",
+                "streetAddress": "1 Main Street",
+                "city": "Springfield",
+                "state": "IL",
+                "zipCode": "62701",
+            },
+            "income": "100.00",
+            "cost": "30.00",
+            "deliverySlotStartsAt": starts_at.isoformat(),
+            "deliverySlotEndsAt": ends_at.isoformat(),
+            "vehicleRegistration": vehicle.registration,
+        }
+        for starts_at, ends_at in (
+            (at(2, 11), at(2, 12)),
+            (at(3, 10), at(3, 12)),
+            (at(3, 11), at(3, 13)),
+            (at(2, 12), at(2, 14)),
+        )
+    ]
+
+    response = graphql_client.execute(
+        """
+        mutation CreateJobs($input: [CreateJobInput!]!) {
+            createJobs(input: $input) {
+                jobs { deliverySlotStartsAt }
+                errors { index message }
+            }
+        }
+        """,
+        variables={"input": items},
+    )
+
+    assert "errors" not in response
+    result = response["data"]["createJobs"]
+    assert result["errors"] == [
+        {
+            "index": 0,
+            "message": "The delivery slot overlaps other jobs of the vehicle: "
+            f"{to_global_id('DeliveryJobType', job.id)}.",
+        },
+        {
+            "index": 2,
+            "message": "The delivery slot overlaps the one of item 1, for the same "
+            "vehicle.",
+        },
+    ]
+    assert [job["deliverySlotStartsAt"] for job in result["jobs"]] == [
+        "2024-12-03T10:00:00+00:00",
+        "2024-12-02T12:00:00+00:00",
+    ]
+
+
+def test_assign_vehicle_to_jobs_reports_conflicts(graphql_client, vehicle):
+    assigned = DeliveryJob.objects.get()
+    jobs = [
+        DeliveryJobFactory(vehicle=None, delivery_slot_starts_at=at(2, 11)),
+        DeliveryJobFactory(vehicle=None, delivery_slot_starts_at=at(5, 10)),
+    ]
+    mutation = """
+        mutation Assign($input: AssignVehicleToJobsInput!) {
+            assignVehicleToJobs(input: $input) {
+                success
+                conflictingJobs { id }
+            }
+        }
+    """
+
+    response = graphql_client.execute(
+        mutation,
+        variables={
+            "input": {
+                "vehicleRegistration": vehicle.registration,
+                "jobIds": [to_global_id("DeliveryJobType", job.pk) for job in jobs],
+            }
+        },
+    )
+
+    assert response["data"]["assignVehicleToJobs"] == {
+        "success": False,
+        "conflictingJobs": [
+            {"id": to_global_id("DeliveryJobType", job_id)}
+            for job_id in (assigned.id, jobs[0].id)
+        ],
+    }
+    assert DeliveryJob.objects.filter(vehicle=vehicle).count() == 1
+
+    response = graphql_client.execute(
+        mutation,
+        variables={
+            "input": {
+                "vehicleRegistration": vehicle.registration,
+                "jobIds": [to_global_id("DeliveryJobType", jobs[1].pk)],
+            }
+        },
+    )
+
+    assert response["data"]["assignVehicleToJobs"]["success"]
+
+
+def test_slots_ending_before_they_start_are_rejected(vehicle):
+    with pytest.raises(IntegrityError), transaction.atomic():
+        DeliveryJob.objects.filter(vehicle=vehicle).update(
+            delivery_slot_ends_at=at(2, 9)
+        )
+
+
+def test_migrations_swap_inverted_slots(transactional_db):
+    executor = MigrationExecutor(connection)
+    latest = executor.loader.graph.leaf_nodes("jobs")
+    executor.migrate([("jobs", "0008_job_archive")])
+    try:
+        # As stored before slots were checked, with a vehicle so it's indexed
+        job = DeliveryJobFactory(
+            delivery_slot_starts_at=at(2, 12), delivery_slot_ends_at=at(2, 10)
+        )
+    finally:
+        MigrationExecutor(connection).migrate(latest)
+
+    job.refresh_from_db()
+    assert (job.delivery_slot_starts_at, job.delivery_slot_ends_at) == (
+        at(2, 10),
+        at(2, 12),
+    )
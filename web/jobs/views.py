@@ -1,3 +1,114 @@
-from django.shortcuts import render
+import csv
+import json
+from datetime import datetime
+from io import StringIO
 
-# Create your views here.
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from graphene.utils.str_converters import to_snake_case
+
+from jobs.archive import reaches_archive
+from jobs.models import DeliveryJob, DeliveryJobWithArchive
+from jobs.schema import DeliveryJobFilter
+
+# The exported columns, with the joined vehicle and address
+EXPORT_COLUMNS = {
+    "id": "id",
+    "vehicle_registration": "vehicle_id",
+    "created_at": "created_at",
+    "completed_at": "completed_at",
+    "income": "income",
+    "cost": "cost",
+    "delivery_slot_starts_at": "delivery_slot_starts_at",
+    "delivery_slot_ends_at": "delivery_slot_ends_at",
+    "recipient": "destination__recipient",
+    "street_address": "destination__street_address",
+    "street_address_2": "destination__street_address_2",
+    "city": "destination__city",
+    "state": "destination__state",
+    "zip_code": "destination__zip_code",
+}
+
+
+class DeliveryJobExportView(View):
+    """
+    Streams the delivery jobs matching the filters of the `deliveryJobs` query as
+    NDJSON (the default) or CSV, e.g.
+    `/export/delivery-jobs/?format=csv&completedAt_Gte=2024-01-01`.
+
+    Rows are read through a server-side cursor, `chunk_size` at a time, and sent
+    as they're read, so memory use doesn't grow with the number of jobs. Like the
+    query, archived jobs are exported when the filters reach before the archive
+    cutoff.
+    """
+
+    http_method_names = ["get"]
+    chunk_size = 2000
+    formats = {
+        "ndjson": ("application/x-ndjson", "format_ndjson"),
+        "csv": ("text/csv", "format_csv"),
+    }
+
+    def get(self, request):
+        data = {
+            to_snake_case(name): value
+            for name, value in request.GET.items()
+            if name != "format"
+        }
+        export_format = request.GET.get("format", "ndjson")
+        if export_format not in self.formats:
+            return JsonResponse(
+                {"errors": {"format": [f"Choose one of {', '.join(self.formats)}."]}},
+                status=400,
+            )
+        filterset = DeliveryJobFilter(
+            data, queryset=DeliveryJob.objects.all(), request=request
+        )
+        if not filterset.is_valid():
+            return JsonResponse({"errors": filterset.errors}, status=400)
+        if reaches_archive(filterset.form.cleaned_data):
+            filterset.queryset = DeliveryJobWithArchive.objects.all()
+
+        rows = (
+            filterset.qs.order_by("id")
+            .values_list(*EXPORT_COLUMNS.values())
+            .iterator(chunk_size=self.chunk_size)
+        )
+        content_type, formatter = self.formats[export_format]
+        response = StreamingHttpResponse(
+            getattr(self, formatter)(rows), content_type=content_type
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="delivery-jobs.{export_format}"'
+        )
+        return response
+
+    def format_ndjson(self, rows):
+        """Yields the rows as JSON objects, one per line, a chunk at a time."""
+        names = list(EXPORT_COLUMNS)
+        lines = []
+        for row in rows:
+            lines.append(json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder))
+            if len(lines) == self.chunk_size:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+
+    def format_csv(self, rows):
+        """Yields a header and the rows as CSV, a chunk at a time."""
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for index, row in enumerate(rows, 1):
+            # In ISO 8601, like DjangoJSONEncoder
+            writer.writerow(
+                value.isoformat() if isinstance(value, datetime) else value
+                for value in row
+            )
+            if index % self.chunk_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
@@ -0,0 +1,109 @@
+from graphene_django.settings import graphene_settings
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLList,
+    get_named_type,
+    get_nullable_type,
+    is_composite_type,
+)
+from graphql.execution.values import get_argument_values
+from graphql.utilities import type_from_ast
+
+from logistics.optimizer import is_connection
+
+
+class CostAnalysis:
+    """
+    Estimates how much work an operation takes before it is executed.
+
+    Every object, list or connection field costs one per instance of its parent
+    that is expected in the result. Connections are expected to return pages of
+    `first` or `last` edges (the connection limit if neither is given), and other
+    lists `list_size` items, so the cost grows with the product of the page sizes
+    of nested connections. Scalar fields are free, as they're loaded with their
+    object.
+    """
+
+    def __init__(self, schema, document, variables=None, list_size=None):
+        self.schema = schema
+        self.variables = variables or {}
+        self.default_size = graphene_settings.RELAY_CONNECTION_MAX_LIMIT or 100
+        self.list_size = list_size or self.default_size
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+
+    def analyze(self, operation):
+        """Returns the cost and the depth of `operation`."""
+        root_type = self.schema.get_root_type(operation.operation)
+        return self.analyze_selection(root_type, operation.selection_set, 1)
+
+    def analyze_selection(self, parent_type, selection_set, count, page_size=None):
+        """
+        Returns the cost and depth of a selection made on `count` objects, where
+        `page_size` is the size of the connection if they are one.
+        """
+        cost = depth = 0
+        for field_node, field_type in self.collect_fields(parent_type, selection_set):
+            named_type = get_named_type(field_type)
+            if not is_composite_type(named_type):
+                depth = max(depth, 1)
+                continue
+            size, field_page_size = 1, None
+            if is_connection(field_type):
+                field_page_size = self.get_page_size(parent_type, field_node)
+            elif isinstance(get_nullable_type(field_type), GraphQLList):
+                # The edges of a connection are a page
+                size = self.list_size if page_size is None else page_size
+            field_cost, field_depth = self.analyze_selection(
+                named_type, field_node.selection_set, count * size, field_page_size
+            )
+            cost += count + field_cost
+            depth = max(depth, field_depth + 1)
+        return cost, depth
+
+    def collect_fields(self, parent_type, selection_set):
+        """
+        Yields the field nodes of a selection set with their types, expanding
+        fragments (validation has already ruled out fragment cycles).
+        """
+        if selection_set is None:
+            return
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                name = selection.name.value
+                fields = getattr(parent_type, "fields", {})
+                if name.startswith("__") or name not in fields:
+                    # Introspection is answered from the schema, without queries
+                    continue
+                yield selection, fields[name].type
+                continue
+
+            fragment = selection
+            if isinstance(selection, FragmentSpreadNode):
+                fragment = self.fragments[selection.name.value]
+            fragment_type = parent_type
+            if fragment.type_condition is not None:
+                fragment_type = type_from_ast(self.schema, fragment.type_condition)
+            yield from self.collect_fields(fragment_type, fragment.selection_set)
+
+    def get_page_size(self, parent_type, field_node):
+        """Returns the number of nodes expected from a connection field."""
+        try:
+            arguments = get_argument_values(
+                parent_type.fields[field_node.name.value], field_node, self.variables
+            )
+        except GraphQLError:
+            # Invalid variables are reported by execution
+            return self.default_size
+        sizes = [
+            max(arguments[name], 0)
+            for name in ("first", "last")
+            if isinstance(arguments.get(name), int)
+        ]
+        return min(sizes) if sizes else self.default_size
@@ -0,0 +1,43 @@
+from inspect import isawaitable
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from graphql import ExecutionContext
+
+from logistics.metrics import record_queries
+
+
+class ThreadedExecutionContext(ExecutionContext):
+    """
+    Executes operations from an event loop by resolving each root field, with its
+    whole subtree, in a worker thread.
+
+    Resolvers stay synchronous (graphene-django's connection fields and object
+    types are), but every root field gets its own thread and database connection.
+    The event loop is free while they wait on Postgres, and the root fields of a
+    query, which graphql-core gathers, run in parallel. Mutation fields still run
+    one after the other, as the spec requires.
+    """
+
+    def execute_field(self, parent_type, source, field_nodes, path):
+        if path.prev is not None:
+            return super().execute_field(parent_type, source, field_nodes, path)
+        return self.execute_root_field(parent_type, source, field_nodes, path)
+
+    async def execute_root_field(self, parent_type, source, field_nodes, path):
+        result = await sync_to_async(
+            self.execute_field_in_thread, thread_sensitive=False
+        )(parent_type, source, field_nodes, path)
+        if isawaitable(result):
+            # An async resolver, awaited from the event loop
+            result = await result
+        return result
+
+    def execute_field_in_thread(self, parent_type, source, field_nodes, path):
+        close_old_connections()
+        try:
+            with record_queries():
+                return super().execute_field(parent_type, source, field_nodes, path)
+        finally:
+            # As at the end of a request, for the connection of this thread
+            close_old_connections()
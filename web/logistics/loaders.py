@@ -0,0 +1,96 @@
+from threading import get_ident
+
+
+class ModelLoader:
+    """
+    Loads model instances by primary key, batching every queued key into a single
+    `IN` query the first time any of them is requested.
+
+    Keys are queued with `prime` (typically by a connection, for every node on the
+    current page) and fetched lazily by `load`, so a page that never selects the
+    related field never pays for the lookup.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self._cache = {}
+        self._queue = set()
+
+    def prime(self, keys):
+        """Queues keys to be fetched alongside the next cache miss."""
+        self._queue.update(
+            key for key in keys if key is not None and key not in self._cache
+        )
+
+    def load(self, key):
+        """Returns the instance for `key`, or None if it does not exist."""
+        if key is None:
+            return None
+        key = self.model._meta.pk.to_python(key)
+        if key not in self._cache:
+            self._queue.add(key)
+            self.dispatch()
+        return self._cache[key]
+
+    def load_many(self, keys):
+        """Returns the instances for `keys`, in order, using at most one query."""
+        self.prime(self.model._meta.pk.to_python(key) for key in keys)
+        return [self.load(key) for key in keys]
+
+    def dispatch(self):
+        """Fetches every queued key that is not already cached."""
+        keys = self._queue - self._cache.keys()
+        self._queue.clear()
+        if not keys:
+            return
+        instances = self.model._default_manager.in_bulk(keys)
+        for key in keys:
+            self._cache[key] = instances.get(key)
+
+
+def get_loader(info, model):
+    """
+    Returns the loader for `model` scoped to the current request.
+
+    Loaders live on the execution context (the Django request for GraphQLView), so
+    the cache never outlives a single operation. Without a context there is nowhere
+    to share state, and each call gets a fresh, unbatched loader. Each thread gets
+    its own loaders, as the async view resolves root fields in parallel threads.
+    """
+    context = info.context
+    if context is None:
+        return ModelLoader(model)
+    if not hasattr(context, "loaders"):
+        context.loaders = {}
+    key = (model, get_ident())
+    if key not in context.loaders:
+        context.loaders[key] = ModelLoader(model)
+    return context.loaders[key]
+
+
+def prime_related(info, instances, field_name):
+    """
+    Queues the foreign keys of `instances`, skipping related objects that are
+    already cached and keys that were deferred (the field was not selected).
+    """
+    instances = list(instances)
+    if not instances:
+        return
+    field = instances[0]._meta.get_field(field_name)
+    get_loader(info, field.related_model).prime(
+        getattr(instance, field.attname)
+        for instance in instances
+        if not field.is_cached(instance)
+        and field.attname not in instance.get_deferred_fields()
+    )
+
+
+def load_related(info, instance, field_name):
+    """
+    Resolves a forward foreign key through the request loader, unless the related
+    object was already fetched (e.g. with `select_related`).
+    """
+    field = instance._meta.get_field(field_name)
+    if field.is_cached(instance):
+        return getattr(instance, field_name)
+    return get_loader(info, field.related_model).load(getattr(instance, field.attname))
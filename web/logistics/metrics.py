@@ -0,0 +1,235 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from threading import Lock
+from time import perf_counter
+
+from django.db import connection
+from django.http import HttpResponse
+from graphene.relay.node import GlobalID
+from graphene.types.resolver import dict_or_attr_resolver
+
+# Operations are labelled with the name clients give them, so only this many are
+# kept apart per metric, later ones being counted under OTHER_OPERATION
+MAX_OPERATIONS = 500
+ANONYMOUS_OPERATION = "anonymous"
+OTHER_OPERATION = "other"
+
+DURATION_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+class Histogram:
+    """
+    A Prometheus histogram with one label, keeping a count per bucket (not
+    cumulative, summed on exposition) for each label value.
+    """
+
+    def __init__(self, name, documentation, label, buckets, max_values=None):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = tuple(buckets)
+        self.max_values = max_values
+        self._series = {}
+        self._lock = Lock()
+
+    def observe(self, label_value, value):
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                if self.max_values is not None and (
+                    len(self._series) >= self.max_values
+                ):
+                    label_value = OTHER_OPERATION
+                    series = self._series.get(label_value)
+                if series is None:
+                    # Bucket counts (the last one for +Inf), then the sum
+                    series = self._series[label_value] = [0] * (
+                        len(self.buckets) + 1
+                    ) + [0]
+            series[position] += 1
+            series[-1] += value
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def expose(self):
+        """Returns the lines of the histogram in the Prometheus text format."""
+        with self._lock:
+            series = {value: list(counts) for value, counts in self._series.items()}
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for label_value, counts in sorted(series.items()):
+            label = f'{self.label}="{escape_label_value(label_value)}"'
+            total = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                total += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {total}')
+            lines.append(f"{self.name}_sum{{{label}}} {counts[-1]}")
+            lines.append(f"{self.name}_count{{{label}}} {total}")
+        return lines
+
+
+def escape_label_value(value):
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+OPERATION_DURATION = Histogram(
+    "graphql_operation_duration_seconds",
+    "Time to execute a GraphQL operation and serialize its result.",
+    "operation",
+    DURATION_BUCKETS,
+    MAX_OPERATIONS,
+)
+OPERATION_SQL_QUERIES = Histogram(
+    "graphql_operation_sql_queries",
+    "SQL queries run by a GraphQL operation.",
+    "operation",
+    QUERY_COUNT_BUCKETS,
+    MAX_OPERATIONS,
+)
+OPERATION_SQL_DURATION = Histogram(
+    "graphql_operation_sql_duration_seconds",
+    "Time spent in SQL queries by a GraphQL operation.",
+    "operation",
+    DURATION_BUCKETS,
+    MAX_OPERATIONS,
+)
+RESPONSE_SIZE = Histogram(
+    "graphql_response_size_bytes",
+    "Size of the serialized result of a GraphQL operation.",
+    "operation",
+    SIZE_BUCKETS,
+    MAX_OPERATIONS,
+)
+RESOLVER_DURATION = Histogram(
+    "graphql_resolver_duration_seconds",
+    "Time spent in a resolver, by parent type and field, including the time of "
+    "the resolvers it calls synchronously.",
+    "field",
+    DURATION_BUCKETS,
+)
+HISTOGRAMS = (
+    OPERATION_DURATION,
+    OPERATION_SQL_QUERIES,
+    OPERATION_SQL_DURATION,
+    RESPONSE_SIZE,
+    RESOLVER_DURATION,
+)
+
+
+class OperationRecorder:
+    """
+    Counts the SQL queries of an operation, and their time, as a database
+    execute wrapper. A recorder may wrap the connections of several threads.
+    """
+
+    def __init__(self, operation_name):
+        self.operation_name = operation_name or ANONYMOUS_OPERATION
+        self.queries = 0
+        self.sql_duration = 0
+        self.response_size = None
+        self._lock = Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - started
+            with self._lock:
+                self.queries += 1
+                self.sql_duration += duration
+
+
+current_recorder = ContextVar("current_recorder", default=None)
+
+
+@contextmanager
+def record_operation(operation_name):
+    """
+    Records the metrics of the operation executed within the block, which sets the
+    `response_size` of the recorder it's given once the response is serialized.
+    """
+    recorder = OperationRecorder(operation_name)
+    token = current_recorder.set(recorder)
+    started = perf_counter()
+    try:
+        with connection.execute_wrapper(recorder):
+            yield recorder
+    finally:
+        current_recorder.reset(token)
+        OPERATION_DURATION.observe(recorder.operation_name, perf_counter() - started)
+        OPERATION_SQL_QUERIES.observe(recorder.operation_name, recorder.queries)
+        OPERATION_SQL_DURATION.observe(recorder.operation_name, recorder.sql_duration)
+        if recorder.response_size is not None:
+            RESPONSE_SIZE.observe(recorder.operation_name, recorder.response_size)
+
+
+@contextmanager
+def record_queries():
+    """
+    Adds the SQL queries run within the block on this thread's connection to the
+    current operation, if any. For worker threads resolving part of it.
+    """
+    recorder = current_recorder.get()
+    if recorder is None:
+        yield
+        return
+    with connection.execute_wrapper(recorder):
+        yield
+
+
+def is_trivial_resolver(resolver):
+    """Indicates if a field resolver only reads an attribute or builds an ID."""
+    return isinstance(resolver, partial) and resolver.func in (
+        dict_or_attr_resolver,
+        GlobalID.id_resolver,
+    )
+
+
+class MetricsMiddleware:
+    """
+    Records the time spent in resolvers. Fields that only read an attribute, most
+    of them, aren't timed.
+    """
+
+    def resolve(self, next, root, info, **args):
+        if is_trivial_resolver(info.parent_type.fields[info.field_name].resolve):
+            return next(root, info, **args)
+        started = perf_counter()
+        try:
+            return next(root, info, **args)
+        finally:
+            RESOLVER_DURATION.observe(
+                f"{info.parent_type.name}.{info.field_name}", perf_counter() - started
+            )
+
+
+def metrics_view(request):
+    """Exposes the metrics of this process in the Prometheus text format."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.expose()
+    return HttpResponse(
+        "\n".join(lines) + "\n", content_type="text/plain; version=0.0.4"
+    )
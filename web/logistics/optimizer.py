@@ -0,0 +1,185 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Manager, Prefetch
+from graphene.utils.str_converters import to_camel_case
+from graphene_django.filter import DjangoFilterConnectionField
+from graphql import get_named_type
+from graphql.execution.collect_fields import collect_sub_fields
+
+PAGINATION_ARGS = {"first", "last", "before", "after", "offset"}
+
+
+def get_selection(info, field_nodes, graphql_type):
+    """
+    Maps each field selected under `field_nodes` to the field nodes selecting it.
+
+    Fragments, aliases and `@skip`/`@include` directives are resolved, so a field is
+    only reported if it will actually be resolved.
+    """
+    selection = {}
+    for nodes in collect_sub_fields(
+        info.schema, info.fragments, info.variable_values, graphql_type, field_nodes
+    ).values():
+        selection.setdefault(nodes[0].name.value, []).extend(nodes)
+    return selection
+
+
+def get_connection_selection(info, field_nodes, connection_type):
+    """
+    Returns the fields selected on a connection itself, the node type and the
+    fields selected on each node (through `edges { node { ... } }`).
+    """
+    connection_type = get_named_type(connection_type)
+    connection_selection = get_selection(info, field_nodes, connection_type)
+    edge_type = get_named_type(connection_type.fields["edges"].type)
+    edge_selection = get_selection(
+        info, connection_selection.get("edges", []), edge_type
+    )
+    node_type = get_named_type(edge_type.fields["node"].type)
+    node_selection = get_selection(info, edge_selection.get("node", []), node_type)
+    return connection_selection, node_type, node_selection
+
+
+def is_connection(graphql_type):
+    """Indicates if `graphql_type` is a relay connection."""
+    graphql_type = get_named_type(graphql_type)
+    return hasattr(graphql_type, "fields") and "edges" in graphql_type.fields
+
+
+def get_model_field_names(graphene_type):
+    """Maps the GraphQL field names of a DjangoObjectType to its attribute names."""
+    return {
+        getattr(field, "name", None) or to_camel_case(name): name
+        for name, field in graphene_type._meta.fields.items()
+    }
+
+
+def get_connection_columns(info, field_nodes, connection_type):
+    """
+    Returns the node type, the fields selected on each node and the columns that
+    the selected connection-level fields read from the nodes.
+
+    Connections declare the latter in a `selection_columns` mapping, e.g.
+    `{"totalIncome": ("income",)}` for a total computed over the page.
+    """
+    connection_selection, node_type, node_selection = get_connection_selection(
+        info, field_nodes, connection_type
+    )
+    selection_columns = getattr(
+        get_named_type(connection_type).graphene_type, "selection_columns", {}
+    )
+    columns = set()
+    for name in connection_selection:
+        columns.update(selection_columns.get(name, ()))
+    return node_type, node_selection, columns
+
+
+def optimize_queryset(queryset, info):
+    """
+    Tailors a connection's queryset to the fields the client selected: forward
+    relations are joined with `select_related`, reverse relations are fetched with
+    `prefetch_related` and only the selected columns are loaded.
+
+    Querysets for anything other than a connection are returned unchanged.
+    """
+    if isinstance(queryset, Manager):
+        queryset = queryset.get_queryset()
+    if not is_connection(info.return_type):
+        return queryset
+
+    node_type, node_selection, columns = get_connection_columns(
+        info, info.field_nodes, info.return_type
+    )
+    return _optimize(queryset, info, node_type, node_selection, columns)
+
+
+def _optimize(queryset, info, graphql_type, selection, columns):
+    only, select_related, prefetch_related = _collect(
+        queryset.model, info, graphql_type, selection, columns
+    )
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    return queryset.only(*only)
+
+
+def _collect(model, info, graphql_type, selection, columns=(), prefix=""):
+    """
+    Walks `selection` on `graphql_type`, returning the `only`, `select_related` and
+    `prefetch_related` arguments needed to resolve it from `model`.
+    """
+    attnames = get_model_field_names(graphql_type.graphene_type)
+    only = {f"{prefix}{model._meta.pk.name}"}
+    only.update(f"{prefix}{column}" for column in columns)
+    select_related = []
+    prefetch_related = []
+
+    for graphql_name, field_nodes in selection.items():
+        try:
+            field = model._meta.get_field(attnames.get(graphql_name, graphql_name))
+        except FieldDoesNotExist:
+            # Computed fields (annotations, properties) can't be projected
+            continue
+        field_type = graphql_type.fields[graphql_name].type
+
+        if field.many_to_one:
+            path = f"{prefix}{field.name}"
+            related_type = get_named_type(field_type)
+            related_only, related_select, _ = _collect(
+                field.related_model,
+                info,
+                related_type,
+                get_selection(info, field_nodes, related_type),
+                prefix=f"{path}__",
+            )
+            only.add(path)
+            only.update(related_only)
+            select_related.append(path)
+            select_related.extend(related_select)
+        elif field.one_to_many and not prefix and is_connection(field_type):
+            # Filtered relations are resolved with their own query
+            if any(
+                argument.name.value not in PAGINATION_ARGS
+                for node in field_nodes
+                for argument in node.arguments
+            ):
+                continue
+            node_type, node_selection, related_columns = get_connection_columns(
+                info, field_nodes, field_type
+            )
+            related_columns.add(field.field.name)
+            related_queryset = _optimize(
+                field.related_model._default_manager.all(),
+                info,
+                node_type,
+                node_selection,
+                related_columns,
+            )
+            prefetch_related.append(Prefetch(field.name, queryset=related_queryset))
+        elif field.concrete and not field.is_relation:
+            only.add(f"{prefix}{field.attname}")
+
+    return only, select_related, prefetch_related
+
+
+class PrefetchedConnectionField(DjangoFilterConnectionField):
+    """
+    A filterable connection over a reverse relation that serves pages from the
+    rows `optimize_queryset` prefetched for the parent, instead of issuing a query
+    per parent.
+
+    Filter arguments still go through the FilterSet against the database.
+    """
+
+    @classmethod
+    def resolve_queryset(
+        cls, connection, iterable, info, args, filtering_args, filterset_class
+    ):
+        if isinstance(iterable, Manager):
+            queryset = iterable.get_queryset()
+            is_filtered = any(args.get(name) is not None for name in filtering_args)
+            if queryset._result_cache is not None and not is_filtered:
+                return queryset._result_cache
+        return super().resolve_queryset(
+            connection, iterable, info, args, filtering_args, filterset_class
+        )
@@ -0,0 +1,157 @@
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+from functools import partial
+
+import graphene
+from django.db.models import Q
+from graphene.relay import PageInfo
+from graphene_django.filter import DjangoFilterConnectionField
+from graphene_django.utils import maybe_queryset
+
+KEYSET_CURSOR_PREFIX = "keyset:"
+
+
+class KeysetConnectionField(DjangoFilterConnectionField):
+    """
+    A filterable connection that can also be paginated by keyset ("seek") rather
+    than by offset.
+
+    With `keyset: true`, results are ordered by `keyset_ordering` (which must end in
+    a unique column) and cursors encode the sort key of their node, so `after` and
+    `before` become an indexed `WHERE` on the sort key instead of an `OFFSET` scan.
+    Pages cost the same at any depth and don't shift when rows are inserted.
+    """
+
+    def __init__(self, *args, keyset_ordering, **kwargs):
+        self.keyset_ordering = keyset_ordering
+        kwargs.setdefault(
+            "keyset",
+            graphene.Boolean(
+                description="Paginate by sort key rather than offset. Cursors from "
+                "one mode can't be used in the other."
+            ),
+        )
+        super().__init__(*args, **kwargs)
+
+    def wrap_resolve(self, parent_resolver):
+        offset_resolver = super().wrap_resolve(parent_resolver)
+        return partial(
+            self.keyset_connection_resolver,
+            offset_resolver,
+            self.resolver or parent_resolver,
+        )
+
+    def keyset_connection_resolver(self, offset_resolver, resolver, root, info, **args):
+        if not args.get("keyset"):
+            return offset_resolver(root, info, **args)
+
+        first = args.get("first")
+        last = args.get("last")
+        if args.get("offset") is not None:
+            raise Exception("Keyset pagination can't be combined with an offset.")
+        if args.get("order_by"):
+            raise Exception("Keyset pagination can't be combined with order_by.")
+        if self.max_limit:
+            for name, value in (("first", first), ("last", last)):
+                if value and value > self.max_limit:
+                    raise Exception(
+                        f"Requesting {value} records on the `{info.field_name}` "
+                        f"connection exceeds the `{name}` limit of {self.max_limit} "
+                        "records."
+                    )
+            if first is None and last is None:
+                first = self.max_limit
+
+        iterable = resolver(root, info, **args)
+        if iterable is None:
+            iterable = self.get_manager()
+        queryset = maybe_queryset(
+            self.get_queryset_resolver()(self.connection_type, iterable, info, args)
+        )
+        return self.resolve_keyset_connection(queryset, args, first, last)
+
+    def resolve_keyset_connection(self, queryset, args, first, last):
+        """Fetches one page of `queryset` and builds its connection."""
+        ordering = self.keyset_ordering
+        fields, defer = queryset.query.deferred_loading
+        if not defer:
+            # Cursors are built from the sort key, which must be loaded
+            queryset = queryset.only(*fields, *ordering)
+
+        page = queryset.order_by(*ordering)
+        if args.get("after"):
+            page = page.filter(self.seek(self.decode_cursor(args["after"]), "gt"))
+        if args.get("before"):
+            page = page.filter(self.seek(self.decode_cursor(args["before"]), "lt"))
+
+        has_previous_page = has_next_page = False
+        if last is not None and first is None:
+            page = page.reverse()
+            nodes = list(page[: last + 1])
+            has_previous_page = len(nodes) > last
+            nodes = nodes[:last][::-1]
+        else:
+            nodes = list(page[: first + 1])
+            has_next_page = len(nodes) > first
+            nodes = nodes[:first]
+            if last is not None:
+                has_previous_page = len(nodes) > last
+                nodes = nodes[-last:] if last else []
+
+        connection_type = self.connection_type
+        edges = [
+            connection_type.Edge(node=node, cursor=self.encode_cursor(node))
+            for node in nodes
+        ]
+        connection = connection_type(
+            edges=edges,
+            page_info=PageInfo(
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None,
+                has_previous_page=has_previous_page,
+                has_next_page=has_next_page,
+            ),
+        )
+        connection.iterable = queryset
+        connection.length = None  # Unknown without a count, which keyset avoids
+        return connection
+
+    def seek(self, values, lookup):
+        """
+        Builds the condition for rows strictly after (`gt`) or before (`lt`) the
+        given sort key, i.e. `(a, b) > (x, y)` expanded as
+        `a >= x AND (a > x OR (a = x AND b > y))` so the leading column can use an
+        index range scan.
+        """
+        names = self.keyset_ordering
+        condition = Q(**{f"{names[-1]}__{lookup}": values[-1]})
+        for name, value in zip(names[-2::-1], values[-2::-1]):
+            condition = Q(**{f"{name}__{lookup}": value}) | (
+                Q(**{name: value}) & condition
+            )
+        if len(names) > 1:
+            condition &= Q(**{f"{names[0]}__{lookup}e": values[0]})
+        return condition
+
+    def encode_cursor(self, node):
+        """Encodes the sort key of `node` as an opaque cursor."""
+        values = [
+            node._meta.get_field(name).value_to_string(node)
+            for name in self.keyset_ordering
+        ]
+        return b64encode(
+            f"{KEYSET_CURSOR_PREFIX}{json.dumps(values)}".encode()
+        ).decode()
+
+    def decode_cursor(self, cursor):
+        """Decodes a cursor built by `encode_cursor` back into its sort key."""
+        try:
+            value = b64decode(cursor).decode()
+            if value.startswith(KEYSET_CURSOR_PREFIX):
+                values = json.loads(value[len(KEYSET_CURSOR_PREFIX) :])
+                if len(values) == len(self.keyset_ordering):
+                    return values
+        except (BinasciiError, UnicodeDecodeError, ValueError):
+            pass
+        raise Exception(f"Invalid keyset cursor: {cursor}")
@@ -0,0 +1,16 @@
+from graphql_relay import from_global_id
+
+
+def decode_global_ids(global_ids, type_name):
+    """
+    Decodes the global IDs of nodes of a type into their integer ids, None for
+    those that aren't valid IDs of that type.
+    """
+    ids = []
+    for global_id in global_ids:
+        try:
+            node_type, node_id = from_global_id(global_id)
+            ids.append(int(node_id) if node_type == type_name else None)
+        except (TypeError, ValueError):
+            ids.append(None)
+    return ids
@@ -0,0 +1,218 @@
+from collections import OrderedDict
+from functools import lru_cache
+from threading import Lock
+from time import monotonic, time_ns
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import models, transaction
+from django.db.models import QuerySet
+from django.utils.module_loading import import_string
+
+TAGS_ATTRIBUTE = "result_cache_tags"
+
+
+class LocalResultCache:
+    """
+    Keeps query results in an in-process LRU, with an index from each tag to the
+    entries depending on it. Invalidations from other processes (other workers,
+    management commands) don't reach it, so it's only correct for a single
+    process making every write.
+
+    Invalidations are numbered, and the number of the last one of each tag is
+    kept, for as many tags as there are entries, so that a result computed before
+    one of its tags was invalidated isn't stored after.
+    """
+
+    def __init__(self, maxsize=1024, timeout=30):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._keys_by_tag = {}
+        self._invalidations = 0
+        self._invalidated = OrderedDict()
+        # The number of the last invalidation no longer kept
+        self._forgotten = 0
+        self._lock = Lock()
+
+    def checkpoint(self):
+        """Returns the mark to pass to `set` for a result computed from now on."""
+        with self._lock:
+            return self._invalidations
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            data, tags, expires_at = entry
+            if expires_at is not None and expires_at < monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def set(self, key, data, tags, since=None):
+        """
+        Stores a result, unless one of its tags was invalidated since the
+        `checkpoint` taken before it was computed.
+        """
+        expires_at = None if self.timeout is None else monotonic() + self.timeout
+        with self._lock:
+            if since is not None and (
+                self._forgotten > since
+                or any(self._invalidated.get(tag, 0) > since for tag in tags)
+            ):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (data, tags, expires_at)
+            for tag in tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tags):
+        with self._lock:
+            self._invalidations += 1
+            for tag in tags:
+                for key in self._keys_by_tag.pop(tag, ()):
+                    self._remove(key)
+                self._invalidated[tag] = self._invalidations
+                self._invalidated.move_to_end(tag)
+            while len(self._invalidated) > self.maxsize:
+                self._forgotten = self._invalidated.popitem(last=False)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_tag.clear()
+            self._invalidated.clear()
+            self._forgotten = self._invalidations
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[1]:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+
+class DjangoResultCache:
+    """
+    Keeps query results in one of Django's caches, so they are shared between
+    processes.
+
+    Invalidations are numbered by a shared counter, and the version of a tag is
+    the number of its last invalidation. Entries store the versions of their tags,
+    so entries depending on a tag invalidated since no longer match and are
+    ignored. A result is only stored if none of its tags was invalidated since
+    the `checkpoint` taken before it was computed.
+    """
+
+    def __init__(self, alias="default", timeout=30, key_prefix="graphql-result:"):
+        self.cache = caches[alias]
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+
+    def get(self, key):
+        entry = self.cache.get(self.key_prefix + key)
+        if entry is None:
+            return None
+        data, versions = entry
+        if self.get_versions(versions) != versions:
+            return None
+        return data
+
+    def checkpoint(self):
+        """Returns the mark to pass to `set` for a result computed from now on."""
+        return self.cache.get(self.get_counter_key(), 0)
+
+    def set(self, key, data, tags, since=None):
+        versions = self.get_versions(tags)
+        if since is not None and any(version > since for version in versions.values()):
+            return
+        self.cache.set(self.key_prefix + key, (data, versions), self.timeout)
+
+    def invalidate(self, tags):
+        counter_key = self.get_counter_key()
+        # Seeded from the clock so that numbers keep growing if the counter is
+        # evicted, and a version never goes back to one entries were stored with
+        number = time_ns() // 1000
+        if not self.cache.add(counter_key, number, None):
+            try:
+                number = self.cache.incr(counter_key)
+            except ValueError:
+                self.cache.set(counter_key, number, None)
+        self.cache.set_many({self.get_version_key(tag): number for tag in tags}, None)
+
+    def clear(self):
+        self.cache.clear()
+
+    def get_versions(self, tags):
+        version_keys = {self.get_version_key(tag): tag for tag in tags}
+        versions = self.cache.get_many(version_keys)
+        return {tag: versions.get(key, 0) for key, tag in version_keys.items()}
+
+    def get_version_key(self, tag):
+        return f"{self.key_prefix}tag:{tag}"
+
+    def get_counter_key(self):
+        return f"{self.key_prefix}invalidations"
+
+
+@lru_cache(maxsize=None)
+def get_result_cache():
+    """
+    Returns the backend configured by the `GRAPHQL_RESULT_CACHE` setting, or None
+    if result caching is disabled.
+    """
+    config = getattr(settings, "GRAPHQL_RESULT_CACHE", None)
+    if not config:
+        return None
+    return import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+
+
+def result_tag(model, pk=None):
+    """
+    Returns the tag for one instance of `model`, or for the lists of `model` if
+    `pk` is omitted.
+    """
+    label = model._meta.label_lower
+    return label if pk is None else f"{label}:{pk}"
+
+
+def add_result_tags(info, *tags):
+    """Records tags the result of the current operation depends on."""
+    result_tags = getattr(info.context, TAGS_ATTRIBUTE, None)
+    if result_tags is not None:
+        result_tags.update(tags)
+
+
+def invalidate_results(*tags):
+    """Invalidates cached results depending on `tags` once the transaction commits."""
+    result_cache = get_result_cache()
+    if result_cache is not None and tags:
+        transaction.on_commit(lambda: result_cache.invalidate(set(tags)))
+
+
+class ResultCacheMiddleware:
+    """
+    Records what a query result depends on while it is resolved: a tag for every
+    model instance fields are resolved on, and a tag for the model of every list
+    or connection at the root of the query.
+    """
+
+    def resolve(self, next, root, info, **args):
+        if isinstance(root, models.Model):
+            add_result_tags(info, result_tag(type(root), root.pk))
+        value = next(root, info, **args)
+        if info.path.prev is None:
+            queryset = getattr(value, "iterable", value)
+            if isinstance(queryset, QuerySet):
+                add_result_tags(info, result_tag(queryset.model))
+        return value
@@ -88,6 +88,10 @@ DATABASES = {
         'PASSWORD': env('POSTGRES_PASSWORD'),
         'HOST': env('POSTGRES_HOST'),
         'PORT': env('POSTGRES_PORT'),
+        # Persistent connections spare the async view's worker threads a new
+        # connection per root field
+        'CONN_MAX_AGE': env.int('POSTGRES_CONN_MAX_AGE', default=0),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -135,5 +139,30 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # GraphQL
 GRAPHENE = {
-    "SCHEMA": "logistics.schema.schema"
+    "SCHEMA": "logistics.schema.schema",
+    # Times resolvers for the /metrics endpoint, see logistics.metrics
+    "MIDDLEWARE": ["logistics.metrics.MetricsMiddleware"],
 }
+
+# Cache of query results, invalidated by writes. Off by default: invalidations
+# only reach the processes sharing the cache, so run it on a cache every process
+# shares (e.g. Redis), including those of management commands, with
+# {"BACKEND": "logistics.result_cache.DjangoResultCache",
+#  "OPTIONS": {"alias": "default", "timeout": 30}}
+# logistics.result_cache.LocalResultCache is only correct for a single process
+# that makes every write.
+GRAPHQL_RESULT_CACHE = None
+
+# Operations whose estimated cost or depth exceed these limits are rejected, see
+# logistics.cost.CostAnalysis. Set COST_PER_MINUTE to also limit the total cost
+# each client may request per minute.
+GRAPHQL_QUERY_COST = {
+    "MAX_COST": 25000,
+    "MAX_DEPTH": 12,
+    "COST_PER_MINUTE": None,
+}
+
+# CSV of ZIP code centroids (zip_code, latitude and longitude columns, e.g. from
+# the Census ZCTA gazetteer) the dispatch of jobs measures distances with, see
+# jobs.dispatch. Defaults to the bundled centroids of the main 3-digit prefixes.
+DISPATCH_ZIP_CENTROIDS = env('DISPATCH_ZIP_CENTROIDS', default=None)
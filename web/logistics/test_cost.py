@@ -0,0 +1,88 @@
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+from graphql import get_operation_ast, parse
+
+from logistics.cost import CostAnalysis
+from logistics.schema import schema
+
+
+def analyze(query, variables=None):
+    document = parse(query)
+    return CostAnalysis(schema.graphql_schema, document, variables).analyze(
+        get_operation_ast(document)
+    )
+
+
+@pytest.mark.parametrize(
+    "query,variables,expected",
+    [
+        # vehicles, edges and 10 nodes
+        ("{ vehicles(first: 10) { edges { node { registration } } } }", None, (12, 4)),
+        (
+            "query($n: Int) { vehicles(last: $n) { totalCount: edges { cursor } } }",
+            {"n": 5},
+            (2, 3),
+        ),
+        # Each of the 10 vehicles has a connection of 20 jobs with a destination
+        (
+            """{
+                vehicles(first: 10) { edges { node {
+                    deliveryJobs(first: 20) { edges { node { destination { city } } } }
+                } } }
+            }""",
+            None,
+            (1 + 1 + 10 + 10 + 10 + 200 + 200, 8),
+        ),
+        # Unpaginated connections are expected to return the connection limit
+        (
+            "{ deliveryJobs { edges { ...job } } } "
+            "fragment job on DeliveryJobTypeEdge { node { vehicle { registration } } }",
+            None,
+            (1 + 1 + 100 + 100, 5),
+        ),
+        ("{ __schema { types { name } } }", None, (0, 0)),
+    ],
+)
+def test_cost_analysis(query, variables, expected):
+    assert analyze(query, variables) == expected
+
+
+def test_operations_over_budget_are_rejected(client, db, settings):
+    settings.GRAPHQL_QUERY_COST = {**settings.GRAPHQL_QUERY_COST, "MAX_COST": 100}
+    query = "{ vehicles(first: %d) { edges { node { registration } } } }"
+
+    response = client.post("/graphql/", {"query": query % 10}, "application/json")
+    assert response.json()["extensions"]["cost"] == {
+        "requested": 12,
+        "maximum": 100,
+        "depth": 4,
+        "maxDepth": settings.GRAPHQL_QUERY_COST["MAX_DEPTH"],
+    }
+
+    response = client.post("/graphql/", {"query": query % 100}, "application/json")
+    assert response.status_code == 400
+    assert response.json()["errors"][0]["extensions"]["code"] == "QUERY_TOO_COMPLEX"
+    assert "data" not in response.json()
+
+
+def test_operations_are_throttled_by_cost(client, db, settings):
+    settings.GRAPHQL_QUERY_COST = {
+        **settings.GRAPHQL_QUERY_COST,
+        "COST_PER_MINUTE": 30,
+    }
+    cache.clear()
+    query = {"query": "{ vehicles(first: 10) { edges { node { registration } } } }"}
+
+    with mock.patch("logistics.views.time", return_value=125.0):
+        responses = [
+            client.post("/graphql/", query, "application/json") for _ in range(3)
+        ]
+
+    assert [
+        response.json()["extensions"]["cost"]["budgetRemaining"]
+        for response in responses[:2]
+    ] == [18, 6]
+    assert responses[2].status_code == 429
+    assert responses[2]["Retry-After"] == "55"
@@ -0,0 +1,97 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+
+from logistics.metrics import HISTOGRAMS, Histogram
+from vehicles.factories import VehicleFactory
+
+QUERY = "query Vehicles { vehicles { edges { node { registration } } } }"
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    for histogram in HISTOGRAMS:
+        histogram.clear()
+
+
+def get_metrics(client):
+    response = client.get("/metrics")
+    assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+    return response.content.decode().splitlines()
+
+
+def test_histogram_exposition():
+    histogram = Histogram("test_seconds", "A test.", "operation", (0.1, 1), 2)
+    histogram.observe("Jobs", 0.05)
+    histogram.observe("Jobs", 2)
+    histogram.observe('Say "hi"', 0.5)
+    # Past the limit of label values
+    histogram.observe("Vehicles", 0.5)
+    histogram.observe("Addresses", 0.5)
+
+    assert histogram.expose() == [
+        "# HELP test_seconds A test.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{operation="Jobs",le="0.1"} 1',
+        'test_seconds_bucket{operation="Jobs",le="1"} 1',
+        'test_seconds_bucket{operation="Jobs",le="+Inf"} 2',
+        'test_seconds_sum{operation="Jobs"} 2.05',
+        'test_seconds_count{operation="Jobs"} 2',
+        'test_seconds_bucket{operation="Say \\"hi\\"",le="0.1"} 0',
+        'test_seconds_bucket{operation="Say \\"hi\\"",le="1"} 1',
+        'test_seconds_bucket{operation="Say \\"hi\\"",le="+Inf"} 1',
+        'test_seconds_sum{operation="Say \\"hi\\""} 0.5',
+        'test_seconds_count{operation="Say \\"hi\\""} 1',
+        'test_seconds_bucket{operation="other",le="0.1"} 0',
+        'test_seconds_bucket{operation="other",le="1"} 2',
+        'test_seconds_bucket{operation="other",le="+Inf"} 2',
+        'test_seconds_sum{operation="other"} 1.0',
+        'test_seconds_count{operation="other"} 2',
+    ]
+
+
+def test_operation_metrics(client, db, django_assert_num_queries):
+    VehicleFactory.create_batch(2)
+
+    # The page and the count
+    with django_assert_num_queries(2):
+        response = client.post(
+            "/graphql/",
+            {"query": QUERY, "operationName": "Vehicles"},
+            content_type="application/json",
+        )
+    assert "errors" not in response.json()
+
+    metrics = get_metrics(client)
+    assert 'graphql_operation_duration_seconds_count{operation="Vehicles"} 1' in (
+        metrics
+    )
+    assert 'graphql_operation_sql_queries_sum{operation="Vehicles"} 2' in metrics
+    assert (
+        'graphql_operation_sql_queries_bucket{operation="Vehicles",le="1"} 0' in metrics
+    )
+    assert (
+        f'graphql_response_size_bytes_sum{{operation="Vehicles"}} '
+        f"{len(response.content)}" in metrics
+    )
+    assert 'graphql_resolver_duration_seconds_count{field="Query.vehicles"} 1' in (
+        metrics
+    )
+    # Attribute reads aren't timed
+    assert not any('field="VehicleType.registration"' in line for line in metrics)
+
+
+def test_async_operation_metrics_count_queries_of_worker_threads(
+    client, transactional_db
+):
+    VehicleFactory()
+
+    response = async_to_sync(AsyncClient().post)(
+        "/graphql/async/",
+        {"query": QUERY, "operationName": "Vehicles"},
+        content_type="application/json",
+    )
+    assert "errors" not in response.json()
+
+    metrics = get_metrics(client)
+    assert 'graphql_operation_sql_queries_sum{operation="Vehicles"} 2' in metrics
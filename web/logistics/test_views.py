@@ -0,0 +1,263 @@
+import asyncio
+from hashlib import sha256
+from threading import Barrier, get_ident
+from unittest import mock
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import AsyncClient, override_settings
+from graphql import execute, parse
+from graphql_relay import to_global_id
+
+from logistics.execution import ThreadedExecutionContext
+from logistics.result_cache import get_result_cache, result_tag
+from logistics.views import PersistedQueryView
+from jobs.factories import DeliveryJobFactory
+from vehicles.factories import VehicleFactory
+from vehicles.models import Vehicle
+
+QUERY = "{ vehicles { edges { node { registration } } } }"
+QUERY_HASH = sha256(QUERY.encode()).hexdigest()
+
+
+@pytest.fixture(autouse=True)
+def clear_caches(settings):
+    # Result caching is off by default
+    settings.GRAPHQL_RESULT_CACHE = {
+        "BACKEND": "logistics.result_cache.LocalResultCache"
+    }
+    get_result_cache.cache_clear()
+    cache.clear()
+    PersistedQueryView.documents.clear()
+    yield
+    get_result_cache.cache_clear()
+
+
+def post(client, **data):
+    return client.post("/graphql/", data, content_type="application/json")
+
+
+def persisted_query(query_hash=QUERY_HASH):
+    return {"persistedQuery": {"version": 1, "sha256Hash": query_hash}}
+
+
+def test_persisted_query_registration(client, db):
+    vehicle = VehicleFactory()
+
+    response = post(client, extensions=persisted_query())
+    assert response.json()["errors"][0]["message"] == "PersistedQueryNotFound"
+
+    response = post(client, query=QUERY, extensions=persisted_query())
+    assert response.status_code == 200
+    assert "errors" not in response.json()
+
+    response = client.get(
+        "/graphql/",
+        {
+            "extensions": '{"persistedQuery": {"version": 1, "sha256Hash": "%s"}}'
+            % QUERY_HASH
+        },
+        HTTP_ACCEPT="application/json",
+    )
+    assert response.json()["data"]["vehicles"]["edges"] == [
+        {"node": {"registration": vehicle.registration}}
+    ]
+
+
+def test_persisted_query_hash_mismatch(client, db):
+    response = post(client, query=QUERY, extensions=persisted_query("0" * 64))
+
+    assert response.status_code == 400
+    assert "does not match" in response.json()["errors"][0]["message"]
+
+
+def test_documents_are_parsed_and_validated_once(client, db):
+    with mock.patch("logistics.views.parse", wraps=parse) as mock_parse:
+        for _ in range(3):
+            response = post(client, query=QUERY)
+            assert "errors" not in response.json()
+
+    assert mock_parse.call_count == 1
+
+
+def test_query_results_are_cached_until_invalidated(
+    client, db, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    vehicle = VehicleFactory()
+    response = post(client, query=QUERY)
+    assert len(response.json()["data"]["vehicles"]["edges"]) == 1
+
+    with django_assert_num_queries(0):
+        assert post(client, query=QUERY).json() == response.json()
+
+    mutation = """
+        mutation CreateVehicle($registration: String!) {
+            createVehicle(input: {registration: $registration}) { success }
+        }
+    """
+    with django_capture_on_commit_callbacks(execute=True):
+        post(client, query=mutation, variables={"registration": "ZZ99ZZZ"})
+
+    edges = post(client, query=QUERY).json()["data"]["vehicles"]["edges"]
+    assert [edge["node"]["registration"] for edge in edges] == [
+        vehicle.registration,
+        "ZZ99ZZZ",
+    ]
+
+
+@pytest.mark.parametrize("backend", ["LocalResultCache", "DjangoResultCache"])
+def test_results_invalidated_while_executing_are_not_cached(
+    client, db, django_assert_num_queries, backend
+):
+    VehicleFactory()
+
+    def execute_then_invalidate(*args, **kwargs):
+        # As a mutation committing after the query read its data
+        result = execute(*args, **kwargs)
+        get_result_cache().invalidate({result_tag(Vehicle)})
+        return result
+
+    get_result_cache.cache_clear()
+    with override_settings(
+        GRAPHQL_RESULT_CACHE={"BACKEND": f"logistics.result_cache.{backend}"}
+    ):
+        try:
+            with mock.patch(
+                "logistics.views.execute", side_effect=execute_then_invalidate
+            ):
+                post(client, query=QUERY)
+
+            # Executed again, then cached
+            with django_assert_num_queries(2):
+                post(client, query=QUERY)
+            with django_assert_num_queries(0):
+                post(client, query=QUERY)
+        finally:
+            get_result_cache.cache_clear()
+
+
+def test_job_mutations_only_invalidate_affected_vehicles(
+    client, db, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    vehicle, other_vehicle = VehicleFactory.create_batch(2)
+    job = DeliveryJobFactory(vehicle=vehicle)
+    query = """
+        query Vehicle($registration: String!) {
+            vehicleByRegistration(registration: $registration) {
+                deliveryJobs { edges { node { completedAt } } }
+            }
+        }
+    """
+    for registration in (vehicle.registration, other_vehicle.registration):
+        post(client, query=query, variables={"registration": registration})
+
+    mutation = """
+        mutation MarkJobCompleted($id: ID!) {
+            markJobCompleted(input: {id: $id, completedAt: "2024-12-25T10:00:00Z"}) {
+                job { id }
+            }
+        }
+    """
+    with django_capture_on_commit_callbacks(execute=True):
+        post(
+            client,
+            query=mutation,
+            variables={"id": to_global_id("DeliveryJobType", job.id)},
+        )
+
+    with django_assert_num_queries(0):
+        post(
+            client, query=query, variables={"registration": other_vehicle.registration}
+        )
+    response = post(
+        client, query=query, variables={"registration": vehicle.registration}
+    )
+    edges = response.json()["data"]["vehicleByRegistration"]["deliveryJobs"]["edges"]
+    assert edges == [{"node": {"completedAt": "2024-12-25T10:00:00+00:00"}}]
+
+
+def test_async_view_resolves_root_fields_in_parallel(transactional_db):
+    vehicle = VehicleFactory()
+    job = DeliveryJobFactory(vehicle=vehicle)
+    query = """
+        {
+            vehicles { edges { node { registration } } }
+            deliveryJobs { edges { node { vehicle { registration } } } }
+        }
+    """
+    threads = set()
+    execute_field_in_thread = ThreadedExecutionContext.execute_field_in_thread
+
+    def record_thread(self, *args):
+        threads.add(get_ident())
+        # Blocks until both root fields are being resolved
+        barrier.wait(timeout=5)
+        return execute_field_in_thread(self, *args)
+
+    barrier = Barrier(2)
+    with mock.patch.object(
+        ThreadedExecutionContext, "execute_field_in_thread", record_thread
+    ):
+        response = async_to_sync(AsyncClient().post)(
+            "/graphql/async/", {"query": query}, content_type="application/json"
+        )
+
+    assert response.json()["data"] == {
+        "vehicles": {"edges": [{"node": {"registration": vehicle.registration}}]},
+        "deliveryJobs": {
+            "edges": [{"node": {"vehicle": {"registration": job.vehicle_id}}}]
+        },
+    }
+    assert len(threads) == 2
+
+
+def test_async_view_does_not_block_the_event_loop_on_caches(transactional_db, settings):
+    VehicleFactory()
+    settings.GRAPHQL_QUERY_COST = {
+        **settings.GRAPHQL_QUERY_COST,
+        "COST_PER_MINUTE": 1000,
+    }
+    result_cache = get_result_cache()
+    calls = []
+
+    def record_calls(target, name):
+        method = getattr(target, name)
+
+        def record(*args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                calls.append((name, "event loop"))
+            except RuntimeError:
+                calls.append((name, "thread"))
+            return method(*args, **kwargs)
+
+        return mock.patch.object(target, name, record)
+
+    with (
+        record_calls(cache, "get"),
+        record_calls(cache, "set"),
+        record_calls(cache, "add"),
+        record_calls(cache, "incr"),
+        record_calls(result_cache, "get"),
+        record_calls(result_cache, "checkpoint"),
+        record_calls(result_cache, "set"),
+    ):
+        for data in (
+            {"extensions": persisted_query()},
+            {"query": QUERY, "extensions": persisted_query()},
+            {"extensions": persisted_query()},
+        ):
+            response = async_to_sync(AsyncClient().post)(
+                "/graphql/async/", data, content_type="application/json"
+            )
+
+    assert "errors" not in response.json()
+    assert {name for name, _ in calls} == {
+        "get",
+        "set",
+        "add",
+        "incr",
+        "checkpoint",
+    }
+    assert {where for _, where in calls} == {"thread"}
@@ -17,11 +17,17 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 from django.views.decorators.csrf import csrf_exempt
-from graphene_django.views import GraphQLView
 
+from jobs.views import DeliveryJobExportView
+from logistics.metrics import metrics_view
 from logistics.schema import schema
+from logistics.views import AsyncPersistedQueryView, PersistedQueryView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path("graphql/", csrf_exempt(GraphQLView.as_view(graphiql=True, schema=schema))),
+    path("graphql/", csrf_exempt(PersistedQueryView.as_view(graphiql=True, schema=schema))),
+    # For ASGI servers, see logistics.asgi
+    path("graphql/async/", csrf_exempt(AsyncPersistedQueryView.as_view(graphiql=True, schema=schema))),
+    path("export/delivery-jobs/", DeliveryJobExportView.as_view()),
+    path("metrics", metrics_view),
 ]
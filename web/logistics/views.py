@@ -0,0 +1,526 @@
+import asyncio
+import json
+from collections import OrderedDict
+from hashlib import sha256
+from inspect import isawaitable
+from threading import Lock
+from time import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.http import HttpResponse, HttpResponseNotAllowed
+from django.http.response import HttpResponseBadRequest
+from django.utils.decorators import classonlymethod
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.utils.utils import set_rollback
+from graphene_django.views import GraphQLView, HttpError
+from graphql import (
+    ExecutionResult,
+    GraphQLError,
+    OperationType,
+    execute,
+    get_operation_ast,
+    parse,
+    validate,
+    validate_schema,
+)
+from graphql.execution.middleware import MiddlewareManager
+
+from logistics.cost import CostAnalysis
+from logistics.execution import ThreadedExecutionContext
+from logistics.metrics import record_operation
+from logistics.result_cache import (
+    TAGS_ATTRIBUTE,
+    ResultCacheMiddleware,
+    get_result_cache,
+)
+
+PERSISTED_QUERY_CACHE_PREFIX = "persisted-query:"
+COST_BUDGET_CACHE_PREFIX = "graphql-cost:"
+
+
+class DocumentCache:
+    """A thread-safe LRU cache of parsed and validated documents."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._documents = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            document = self._documents.get(key)
+            if document is not None:
+                self._documents.move_to_end(key)
+            return document
+
+    def set(self, key, document):
+        with self._lock:
+            self._documents[key] = document
+            self._documents.move_to_end(key)
+            while len(self._documents) > self.maxsize:
+                self._documents.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+
+
+def then(result, callback, blocking=False):
+    """
+    Applies `callback` to a result, once it's available if it's awaitable, in a
+    thread if the callback is `blocking`.
+    """
+    if not isawaitable(result):
+        return callback(result)
+
+    async def await_result():
+        if blocking:
+            return await sync_to_async(callback)(await result)
+        return callback(await result)
+
+    return await_result()
+
+
+class PersistedQueryView(GraphQLView):
+    """
+    A GraphQL view supporting automatic persisted queries, which also caches
+    parsed and validated documents and, if `GRAPHQL_RESULT_CACHE` is configured,
+    the results of query operations.
+
+    Clients may send `extensions.persistedQuery.sha256Hash` instead of the query
+    text. An unknown hash gets a `PersistedQueryNotFound` error, and the client
+    retries with both the hash and the query, which is then stored in the Django
+    cache for everyone else. Either way, documents are cached in-process by hash,
+    so repeated operations skip parsing and validation.
+
+    Query results are cached by operation and variables, together with the tags of
+    the models they were built from, which mutations invalidate.
+    """
+
+    # Shared by every request of the process (a view instance only serves one)
+    documents = DocumentCache(maxsize=512)
+    # Seconds a persisted query is kept in the Django cache, None never expires
+    persisted_query_timeout = None
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        query_hash = self.get_persisted_query_hash(request, data)
+        if query_hash is not None and query:
+            if sha256(query.encode()).hexdigest() != query_hash:
+                raise HttpError(
+                    HttpResponseBadRequest("Provided sha256Hash does not match query.")
+                )
+            cache.set(
+                PERSISTED_QUERY_CACHE_PREFIX + query_hash,
+                query,
+                self.persisted_query_timeout,
+            )
+        elif query_hash is None:
+            if not query:
+                if show_graphiql:
+                    return None
+                raise HttpError(HttpResponseBadRequest("Must provide query string."))
+            query_hash = sha256(query.encode()).hexdigest()
+
+        schema = self.schema.graphql_schema
+
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        # Documents are only valid for the schema and rules they were checked against
+        document_key = (schema, tuple(self.validation_rules or ()), query_hash)
+        document = self.documents.get(document_key)
+        if document is None:
+            if not query:
+                query = cache.get(PERSISTED_QUERY_CACHE_PREFIX + query_hash)
+                if query is None:
+                    return ExecutionResult(
+                        errors=[
+                            GraphQLError(
+                                "PersistedQueryNotFound",
+                                extensions={"code": "PERSISTED_QUERY_NOT_FOUND"},
+                            )
+                        ]
+                    )
+
+            try:
+                document = parse(query)
+            except Exception as e:
+                return ExecutionResult(errors=[e])
+
+            validation_errors = validate(
+                schema,
+                document,
+                self.validation_rules,
+                graphene_settings.MAX_VALIDATION_ERRORS,
+            )
+            if validation_errors:
+                return ExecutionResult(data=None, errors=validation_errors)
+            self.documents.set(document_key, document)
+
+        operation_ast = get_operation_ast(document, operation_name)
+
+        if (
+            request.method.lower() == "get"
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ["POST"],
+                    "Can only perform a {} operation from a POST request.".format(
+                        operation_ast.operation.value
+                    ),
+                )
+            )
+
+        if operation_ast is None:
+            # Execution reports the missing or ambiguous operation
+            return self.execute_operation(
+                request, schema, document, None, query_hash, variables, operation_name
+            )
+
+        cost = self.analyze_cost(request, schema, document, operation_ast, variables)
+        if cost["requested"] > cost["maximum"] or cost["depth"] > cost["maxDepth"]:
+            return ExecutionResult(
+                errors=[
+                    GraphQLError(
+                        f"Query cost {cost['requested']} (depth {cost['depth']}) "
+                        f"exceeds the maximum of {cost['maximum']} "
+                        f"(depth {cost['maxDepth']}).",
+                        extensions={"code": "QUERY_TOO_COMPLEX"},
+                    )
+                ],
+                extensions={"cost": cost},
+            )
+        self.throttle(request, cost)
+
+        def add_cost(result):
+            result.extensions = {**(result.extensions or {}), "cost": cost}
+            return result
+
+        return then(
+            self.execute_operation(
+                request,
+                schema,
+                document,
+                operation_ast,
+                query_hash,
+                variables,
+                operation_name,
+            ),
+            add_cost,
+        )
+
+    def execute_operation(
+        self,
+        request,
+        schema,
+        document,
+        operation_ast,
+        query_hash,
+        variables,
+        operation_name,
+    ):
+        """Executes a validated document, going through the result cache for queries."""
+        result_cache = get_result_cache()
+        if (
+            result_cache is None
+            or operation_ast is None
+            or operation_ast.operation != OperationType.QUERY
+        ):
+            result_cache = None
+        else:
+            result_key = self.get_result_key(query_hash, operation_name, variables)
+            data = result_cache.get(result_key)
+            if data is not None:
+                return ExecutionResult(data=data)
+
+        try:
+            execute_options = {
+                "root_value": self.get_root_value(request),
+                "context_value": self.get_context(request),
+                "variable_values": variables,
+                "operation_name": operation_name,
+                "middleware": self.get_middleware(request),
+            }
+            if self.execution_context_class:
+                execute_options["execution_context_class"] = (
+                    self.execution_context_class
+                )
+
+            if result_cache is not None:
+                # Taken before the data is read, so that the result isn't stored if
+                # one of its tags is invalidated meanwhile
+                checkpoint = result_cache.checkpoint()
+                # The middleware records the tags the result depends on
+                setattr(request, TAGS_ATTRIBUTE, set())
+                middleware = execute_options["middleware"] or []
+                if isinstance(middleware, MiddlewareManager):
+                    middleware = middleware.middlewares
+                execute_options["middleware"] = [
+                    *middleware,
+                    ResultCacheMiddleware(),
+                ]
+
+                def store(result):
+                    if not result.errors:
+                        result_cache.set(
+                            result_key,
+                            result.data,
+                            getattr(request, TAGS_ATTRIBUTE),
+                            since=checkpoint,
+                        )
+                    return result
+
+                return then(
+                    execute(schema, document, **execute_options), store, blocking=True
+                )
+
+            if (
+                operation_ast is not None
+                and operation_ast.operation == OperationType.MUTATION
+                and (
+                    graphene_settings.ATOMIC_MUTATIONS is True
+                    or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+                )
+            ):
+                with transaction.atomic():
+                    result = execute(schema, document, **execute_options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+                return result
+
+            return execute(schema, document, **execute_options)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+    def get_response(self, request, data, show_graphiql=False):
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        with record_operation(operation_name) as recorder:
+            execution_result = self.execute_graphql_request(
+                request, data, query, variables, operation_name, show_graphiql
+            )
+            result, status_code = self.format_response(
+                request, execution_result, id, show_graphiql
+            )
+            if result is not None:
+                # Responses are ASCII JSON
+                recorder.response_size = len(result)
+        return result, status_code
+
+    def format_response(self, request, execution_result, id, show_graphiql=False):
+        """
+        Serializes an execution result as the parent's `get_response` does, also
+        reporting the result's extensions.
+        """
+        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+            set_rollback()
+
+        status_code = 200
+        if execution_result:
+            response = {}
+
+            if execution_result.errors:
+                set_rollback()
+                response["errors"] = [
+                    self.format_error(e) for e in execution_result.errors
+                ]
+
+            if execution_result.errors and any(
+                not getattr(e, "path", None) for e in execution_result.errors
+            ):
+                status_code = 400
+            else:
+                response["data"] = execution_result.data
+
+            if execution_result.extensions:
+                response["extensions"] = execution_result.extensions
+
+            if self.batch:
+                response["id"] = id
+                response["status"] = status_code
+
+            result = self.json_encode(request, response, pretty=show_graphiql)
+        else:
+            result = None
+
+        return result, status_code
+
+    def analyze_cost(self, request, schema, document, operation_ast, variables):
+        """Estimates the cost of an operation, see `CostAnalysis`."""
+        limits = settings.GRAPHQL_QUERY_COST
+        requested, depth = CostAnalysis(
+            schema, document, variables, limits.get("LIST_SIZE")
+        ).analyze(operation_ast)
+        return {
+            "requested": requested,
+            "maximum": limits["MAX_COST"],
+            "depth": depth,
+            "maxDepth": limits["MAX_DEPTH"],
+        }
+
+    def throttle(self, request, cost):
+        """
+        Charges the cost of an operation to the client's budget for the current
+        minute, rejecting the request if the budget is spent.
+        """
+        budget = settings.GRAPHQL_QUERY_COST.get("COST_PER_MINUTE")
+        if not budget:
+            return
+        now = time()
+        client = request.META.get("REMOTE_ADDR")
+        key = f"{COST_BUDGET_CACHE_PREFIX}{client}:{int(now // 60)}"
+        cache.add(key, 0, 60)
+        try:
+            spent = cache.incr(key, cost["requested"])
+        except ValueError:
+            # Expired between add and incr
+            spent = cost["requested"]
+            cache.set(key, spent, 60)
+        cost["budgetRemaining"] = max(budget - spent, 0)
+        if spent > budget:
+            response = HttpResponse(status=429)
+            response["Retry-After"] = str(60 - int(now % 60))
+            raise HttpError(
+                response,
+                f"Query cost budget of {budget} per minute exhausted.",
+            )
+
+    @staticmethod
+    def get_result_key(query_hash, operation_name, variables):
+        """Identifies the result of an operation, which also depends on its variables."""
+        return sha256(
+            json.dumps(
+                [query_hash, operation_name, variables], sort_keys=True, default=str
+            ).encode()
+        ).hexdigest()
+
+    @staticmethod
+    def get_persisted_query_hash(request, data):
+        """Returns the persisted query hash sent with the request, if any."""
+        extensions = request.GET.get("extensions") or data.get("extensions")
+        if not extensions:
+            return None
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+        if not isinstance(extensions, dict):
+            raise HttpError(HttpResponseBadRequest("Extensions must be an object."))
+        persisted_query = extensions.get("persistedQuery")
+        if not persisted_query:
+            return None
+        if (
+            not isinstance(persisted_query, dict)
+            or persisted_query.get("version") != 1
+            or not isinstance(persisted_query.get("sha256Hash"), str)
+        ):
+            raise HttpError(
+                HttpResponseBadRequest("Unsupported persisted query version.")
+            )
+        return persisted_query["sha256Hash"]
+
+
+class AsyncPersistedQueryView(PersistedQueryView):
+    """
+    The persisted query view for ASGI, executing operations from the event loop.
+
+    Each root field is resolved in a worker thread with its own database
+    connection (see `ThreadedExecutionContext`), so the root fields of a query hit
+    the database in parallel. The work before execution, and the storing of its
+    result, go through the caches, so they run in a thread too, as Django's async
+    cache methods do.
+    """
+
+    # Django decides from the HTTP method handlers, which GraphQLView doesn't use
+    view_is_async = True
+    execution_context_class = ThreadedExecutionContext
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        if (
+            graphene_settings.ATOMIC_MUTATIONS is True
+            or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+        ):
+            raise ImproperlyConfigured(
+                "ATOMIC_MUTATIONS isn't supported by the async GraphQL view, whose "
+                "mutation fields run in different threads."
+            )
+        return super().as_view(**initkwargs)
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if request.method.lower() not in ("get", "post"):
+                raise HttpError(
+                    HttpResponseNotAllowed(
+                        ["GET", "POST"], "GraphQL only supports GET and POST requests."
+                    )
+                )
+
+            data = self.parse_body(request)
+            if self.graphiql and self.can_display_graphiql(request, data):
+                return await sync_to_async(super().dispatch)(request, *args, **kwargs)
+
+            if self.batch:
+                responses = await asyncio.gather(
+                    *(self.aget_response(request, entry) for entry in data)
+                )
+                result = "[{}]".format(
+                    ",".join([response[0] for response in responses])
+                )
+                status_code = (
+                    responses
+                    and max(responses, key=lambda response: response[1])[1]
+                    or 200
+                )
+            else:
+                result, status_code = await self.aget_response(request, data)
+
+            return HttpResponse(
+                status=status_code, content=result, content_type="application/json"
+            )
+
+        except HttpError as e:
+            response = e.response
+            response["Content-Type"] = "application/json"
+            response.content = self.json_encode(
+                request, {"errors": [self.format_error(e)]}
+            )
+            return response
+
+    async def aget_response(self, request, data):
+        """As `get_response`, awaiting the execution."""
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        # SQL queries run in the worker threads of the root fields, see
+        # ThreadedExecutionContext
+        with record_operation(operation_name) as recorder:
+            try:
+                # Returns once execution starts, with an awaitable result unless
+                # the operation failed before or was served from the result cache
+                execution_result = await sync_to_async(self.execute_graphql_request)(
+                    request, data, query, variables, operation_name
+                )
+                if isawaitable(execution_result):
+                    execution_result = await execution_result
+            except HttpError:
+                raise
+            except Exception as e:
+                execution_result = ExecutionResult(errors=[e])
+            result, status_code = self.format_response(request, execution_result, id)
+            if result is not None:
+                recorder.response_size = len(result)
+        return result, status_code
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from vehicles.models import VehicleRollup
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the rollups of every vehicle from its delivery jobs, repairing "
+        "drift from writes that bypassed them"
+    )
+
+    def handle(self, *args, **options):
+        repaired = VehicleRollup.objects.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt vehicle rollups: repaired {repaired}.")
+        )
@@ -0,0 +1,64 @@
+# Generated by Django 5.0.14 on 2026-10-17 04:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("vehicles", "0001_initial"),
+        ("jobs", "0003_address_content_hash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VehicleRollup",
+            fields=[
+                (
+                    "vehicle",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="rollup",
+                        serialize=False,
+                        to="vehicles.vehicle",
+                    ),
+                ),
+                ("job_count", models.IntegerField(default=0)),
+                ("completed_count", models.IntegerField(default=0)),
+                (
+                    "total_income",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "total_cost",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["total_income"], name="rollup_total_income_idx"
+                    ),
+                    models.Index(fields=["total_cost"], name="rollup_total_cost_idx"),
+                ],
+            },
+        ),
+        migrations.RunSQL(
+            """
+            INSERT INTO vehicles_vehiclerollup
+                (vehicle_id, job_count, completed_count, total_income, total_cost)
+            SELECT
+                vehicle_id,
+                count(*),
+                count(completed_at),
+                coalesce(sum(income), 0),
+                coalesce(sum(cost), 0)
+            FROM jobs_deliveryjob
+            WHERE vehicle_id IS NOT NULL
+            GROUP BY vehicle_id
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.apps import apps
+from django.db import connection, models, transaction
 
 
 class Vehicle(models.Model):
@@ -10,3 +11,125 @@ class Vehicle(models.Model):
     """
 
     registration = models.CharField(max_length=10, primary_key=True)
+
+
+class VehicleRollupManager(models.Manager):
+    def apply(self, deltas):
+        """
+        Adds `deltas`, a mapping of registrations to `(job_count, completed_count,
+        total_income, total_cost)` changes, to the rollups in a single upsert.
+        """
+        deltas = {
+            registration: delta
+            for registration, delta in deltas.items()
+            if registration is not None and any(delta)
+        }
+        if not deltas:
+            return
+        # A consistent order keeps concurrent writers from deadlocking
+        registrations = sorted(deltas)
+        columns = map(
+            list, zip(*(deltas[registration] for registration in registrations))
+        )
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table}
+                    (vehicle_id, job_count, completed_count, total_income, total_cost)
+                SELECT * FROM unnest(
+                    %s::varchar[], %s::integer[], %s::integer[], %s::numeric[],
+                    %s::numeric[]
+                )
+                ON CONFLICT (vehicle_id) DO UPDATE SET
+                    job_count = {table}.job_count + EXCLUDED.job_count,
+                    completed_count = {table}.completed_count + EXCLUDED.completed_count,
+                    total_income = {table}.total_income + EXCLUDED.total_income,
+                    total_cost = {table}.total_cost + EXCLUDED.total_cost
+                """,
+                [registrations, *columns],
+            )
+
+    def rebuild(self):
+        """
+        Recomputes every rollup from the delivery jobs, archived ones included,
+        returning the number of rollups that had drifted.
+        """
+        table = self.model._meta.db_table
+        vehicle_table = Vehicle._meta.db_table
+        # Archived jobs still count
+        job_table = apps.get_model("jobs", "DeliveryJobWithArchive")._meta.db_table
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Blocks writers, whose increments would be lost, but not readers
+            cursor.execute(f"LOCK TABLE {table} IN EXCLUSIVE MODE")
+            cursor.execute(
+                f"""
+                WITH actual AS (
+                    SELECT
+                        vehicle.registration AS vehicle_id,
+                        count(job.id) AS job_count,
+                        count(job.completed_at) AS completed_count,
+                        coalesce(sum(job.income), 0) AS total_income,
+                        coalesce(sum(job.cost), 0) AS total_cost
+                    FROM {vehicle_table} vehicle
+                    LEFT JOIN {job_table} job
+                        ON job.vehicle_id = vehicle.registration
+                    GROUP BY vehicle.registration
+                )
+                INSERT INTO {table} AS rollup
+                    (vehicle_id, job_count, completed_count, total_income, total_cost)
+                SELECT * FROM actual
+                -- Vehicles without jobs or a rollup haven't drifted
+                WHERE job_count > 0 OR vehicle_id IN (SELECT vehicle_id FROM {table})
+                ON CONFLICT (vehicle_id) DO UPDATE SET
+                    job_count = EXCLUDED.job_count,
+                    completed_count = EXCLUDED.completed_count,
+                    total_income = EXCLUDED.total_income,
+                    total_cost = EXCLUDED.total_cost
+                WHERE (
+                    rollup.job_count, rollup.completed_count, rollup.total_income,
+                    rollup.total_cost
+                ) IS DISTINCT FROM (
+                    EXCLUDED.job_count, EXCLUDED.completed_count,
+                    EXCLUDED.total_income, EXCLUDED.total_cost
+                )
+                """
+            )
+            return cursor.rowcount
+
+
+class VehicleRollup(models.Model):
+    """
+    Running totals of the delivery jobs assigned to a vehicle, so they don't have
+    to be aggregated over the jobs table when vehicles are listed or ordered.
+
+    Kept up to date by `DeliveryJob.save` and `delete`, and by bulk writes through
+    `VehicleRollup.objects.apply`. The `rebuild_vehicle_rollups` command repairs
+    any drift, e.g. after jobs were changed with raw SQL.
+
+    Attributes:
+        vehicle (OneToOneField): The vehicle, also the primary key.
+        job_count (IntegerField): The number of jobs assigned to the vehicle.
+        completed_count (IntegerField): How many of those are completed.
+        total_income (DecimalField): The sum of the income of the jobs.
+        total_cost (DecimalField): The sum of the cost of the jobs.
+    """
+
+    vehicle = models.OneToOneField(
+        Vehicle, on_delete=models.CASCADE, primary_key=True, related_name="rollup"
+    )
+    # Signed, as Postgres checks the inserted row of an upsert even when it
+    # conflicts, and a decrement is inserted as a negative row
+    job_count = models.IntegerField(default=0)
+    completed_count = models.IntegerField(default=0)
+    total_income = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    objects = VehicleRollupManager()
+
+    class Meta:
+        # Back ordering vehicles by their totals
+        indexes = [
+            models.Index(fields=["total_income"], name="rollup_total_income_idx"),
+            models.Index(fields=["total_cost"], name="rollup_total_cost_idx"),
+        ]
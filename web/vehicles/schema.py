@@ -1,12 +1,29 @@
+from decimal import Decimal
+
 import graphene
-from django.db import IntegrityError
-from django.db.models import Sum
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django_filters import FilterSet, OrderingFilter
+from graphene.utils.str_converters import to_camel_case, to_snake_case
 from graphene_django import DjangoObjectType
-from graphene_django.filter import DjangoFilterConnectionField
 
-from jobs.models import DeliveryJob
-from vehicles.models import Vehicle
+from jobs.models import DeliveryJob, overlapping_slots, rollup_deltas
+from jobs.cache import invalidate_job_results
+from logistics.loaders import get_loader
+from logistics.optimizer import (
+    PrefetchedConnectionField,
+    get_connection_selection,
+    optimize_queryset,
+)
+from logistics.pagination import KeysetConnectionField
+from logistics.relay import decode_global_ids
+from logistics.result_cache import add_result_tags, invalidate_results, result_tag
+from vehicles.models import Vehicle, VehicleRollup
+
+
+ZERO = Value(Decimal("0.00"))
 
 
 class VehicleFilter(FilterSet):
@@ -44,6 +61,10 @@ class VehicleFilter(FilterSet):
 
 class VehicleType(DjangoObjectType):
     """Represents a Vehicle with its fields and relationships."""
+
+    delivery_jobs = PrefetchedConnectionField(
+        "jobs.schema.DeliveryJobType", required=True
+    )
     total_income = graphene.Decimal()
     total_cost = graphene.Decimal()
 
@@ -53,6 +74,31 @@ class VehicleType(DjangoObjectType):
         fields = "__all__"
         filterset_class = VehicleFilter
 
+    @classmethod
+    def get_queryset(cls, queryset, info):
+        return optimize_queryset(queryset, info)
+
+    @classmethod
+    def get_node(cls, info, id):
+        return get_loader(info, Vehicle).load(id)
+
+    def resolve_total_income(self, info):
+        return resolve_rollup_total(self, info, "total_income")
+
+    def resolve_total_cost(self, info):
+        return resolve_rollup_total(self, info, "total_cost")
+
+
+def resolve_rollup_total(vehicle, info, field):
+    """
+    Returns a total of the vehicle's jobs, annotated by the vehicles query or
+    loaded from its rollup.
+    """
+    if hasattr(vehicle, field):
+        return getattr(vehicle, field)
+    rollup = get_loader(info, VehicleRollup).load(vehicle.pk)
+    return ZERO.value if rollup is None else getattr(rollup, field)
+
 
 class Query(graphene.ObjectType):
     """Root-level query fields for retrieving Vehicle data."""
@@ -62,17 +108,30 @@ class Query(graphene.ObjectType):
         registration=graphene.String(required=True),
         description="Fetches a Vehicle object based on its registration number.",
     )
-    vehicles = DjangoFilterConnectionField(VehicleType, filterset_class=VehicleFilter)
+    vehicles = KeysetConnectionField(
+        VehicleType, filterset_class=VehicleFilter, keyset_ordering=("registration",)
+    )
 
     def resolve_vehicle_by_registration(self, info, registration):
         """Resolver for the 'vehicle_by_registration' query field. Retrieves a single Vehicle."""
+        # Also tagged when not found, so creating the vehicle invalidates the result
+        add_result_tags(info, result_tag(Vehicle, registration))
         return Vehicle.objects.filter(registration=registration).first()
 
     def resolve_vehicles(self, info, **kwargs):
-        queryset = VehicleFilter(kwargs).qs.annotate(
-            total_income=Sum("delivery_jobs__income"),
-            total_cost=Sum("delivery_jobs__cost"),
+        # Only join the rollups of the totals that are selected or ordered by
+        _, _, selection = get_connection_selection(
+            info, info.field_nodes, info.return_type
         )
+        ordering = to_snake_case(kwargs.get("order_by") or "")
+        annotations = {}
+        for field in ("total_income", "total_cost"):
+            if to_camel_case(field) in selection or field in ordering:
+                annotations[field] = Coalesce(F(f"rollup__{field}"), ZERO)
+        # Annotated before filtering, which orders by the annotations
+        queryset = VehicleFilter(
+            kwargs, queryset=Vehicle.objects.annotate(**annotations)
+        ).qs
 
         return queryset.distinct()
 
@@ -106,6 +165,9 @@ class CreateVehicle(graphene.Mutation):
         """
         try:
             vehicle = Vehicle.objects.create(registration=input.registration)
+            invalidate_results(
+                result_tag(Vehicle), result_tag(Vehicle, vehicle.registration)
+            )
             return CreateVehicle(success=True, vehicle=vehicle)
         except IntegrityError:
             return CreateVehicle(success=False, vehicle=None)
@@ -125,7 +187,16 @@ class AssignVehicleToJobsInput(graphene.InputObjectType):
 
 
 class AssignVehicleToJobs(graphene.Mutation):
-    """Mutation for assigning a vehicle to a set of DeliveryJob instances."""
+    """
+    Mutation for assigning a vehicle to a set of DeliveryJob instances.
+
+    Nothing is assigned if the slot of a job overlaps one of another job of the
+    vehicle, or of another job of the set. The jobs are locked and updated in
+    chunks within one transaction, so large sets are assigned all at once or not
+    at all.
+    """
+
+    CHUNK_SIZE = 5000
 
     class Arguments:
         input = AssignVehicleToJobsInput(required=True)
@@ -136,6 +207,15 @@ class AssignVehicleToJobs(graphene.Mutation):
     jobs = graphene.List(
         "jobs.schema.DeliveryJobType", description="The updated DeliveryJob instances."
     )
+    conflicting_jobs = graphene.List(
+        graphene.NonNull("jobs.schema.DeliveryJobType"),
+        description="The jobs whose delivery slots overlap, if any, preventing "
+        "the assignment.",
+    )
+    matched_count = graphene.Int(description="The number of jobs the IDs matched.")
+    missing_count = graphene.Int(
+        description="The number of distinct IDs that are invalid or match no job."
+    )
 
     @staticmethod
     def mutate(root, info, input):
@@ -143,16 +223,107 @@ class AssignVehicleToJobs(graphene.Mutation):
         Performs the vehicle assignment logic, handles potential errors,
         and returns the result.
         """
+        job_ids = sorted(
+            {
+                job_id
+                for job_id in decode_global_ids(input.job_ids, "DeliveryJobType")
+                if job_id is not None
+            }
+        )
+        requested = len(set(input.job_ids))
         try:
-            vehicle = Vehicle.objects.get(registration=input.vehicle_registration)
-            jobs = DeliveryJob.objects.filter(id__in=input.job_ids)
-
-            jobs.update(vehicle=vehicle)
-            return AssignVehicleToJobs(success=True, jobs=jobs)
+            with transaction.atomic():
+                # Locked so that concurrent assignments to the vehicle are checked
+                # for conflicts in turn
+                vehicle = Vehicle.objects.select_for_update().get(
+                    registration=input.vehicle_registration
+                )
+                # The jobs move from their previous vehicles' rollups to this one's
+                previous, slots = {}, []
+                for chunk in chunked(job_ids, AssignVehicleToJobs.CHUNK_SIZE):
+                    # In order of id, so that concurrent assignments lock jobs in
+                    # the same order
+                    rows = (
+                        DeliveryJob.objects.filter(id__in=chunk)
+                        .order_by("id")
+                        .select_for_update()
+                        .values_list(
+                            "id",
+                            *DeliveryJob.ROLLUP_FIELDS,
+                            "delivery_slot_starts_at",
+                            "delivery_slot_ends_at",
+                        )
+                    )
+                    for job_id, vehicle_id, completed_at, income, cost, *slot in rows:
+                        previous[job_id] = (
+                            vehicle_id,
+                            completed_at is not None,
+                            income,
+                            cost,
+                        )
+                        slots.append((vehicle.registration, *slot))
+
+                job_ids = list(previous)
+                counts = {
+                    "matched_count": len(job_ids),
+                    "missing_count": requested - len(job_ids),
+                }
+                conflicting_ids = set()
+                for position, other_ids in DeliveryJob.objects.find_slot_conflicts(
+                    slots, exclude_ids=job_ids
+                ).items():
+                    conflicting_ids.update((job_ids[position], *other_ids))
+                for position, other in overlapping_slots(slots).items():
+                    conflicting_ids.update((job_ids[position], job_ids[other]))
+                if conflicting_ids:
+                    return AssignVehicleToJobs(
+                        success=False,
+                        jobs=[],
+                        conflicting_jobs=DeliveryJob.objects.filter(
+                            id__in=conflicting_ids
+                        ).order_by("delivery_slot_starts_at", "id"),
+                        **counts,
+                    )
+
+                # update() skips auto_now, which the job rollups' refresh relies on
+                updated_at = timezone.now()
+                for chunk in chunked(job_ids, AssignVehicleToJobs.CHUNK_SIZE):
+                    DeliveryJob.objects.filter(id__in=chunk).update(
+                        vehicle=vehicle, updated_at=updated_at
+                    )
+                VehicleRollup.objects.apply(
+                    rollup_deltas(
+                        added=[
+                            (vehicle.registration, *values[1:])
+                            for values in previous.values()
+                        ],
+                        removed=previous.values(),
+                    )
+                )
+            invalidate_job_results(
+                job_ids=previous,
+                registrations=[
+                    vehicle.registration,
+                    *(values[0] for values in previous.values()),
+                ],
+            )
+            jobs = (
+                DeliveryJob.objects.select_related("vehicle", "destination")
+                .filter(id__in=job_ids)
+                .order_by("delivery_slot_starts_at", "id")
+            )
+            return AssignVehicleToJobs(
+                success=True, jobs=list(jobs), conflicting_jobs=[], **counts
+            )
         except (Vehicle.DoesNotExist, IntegrityError) as e:
             return AssignVehicleToJobs(success=False, jobs=[])
 
 
+def chunked(items, size):
+    """Splits a list into lists of at most `size` items."""
+    return [items[start : start + size] for start in range(0, len(items), size)]
+
+
 class Mutation(graphene.ObjectType):
     """Root-level mutation fields for modifying Vehicle data."""
 
@@ -0,0 +1,144 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+from graphql_relay import to_global_id
+
+from jobs.factories import DeliveryJobFactory
+from jobs.models import DeliveryJob
+from vehicles.factories import VehicleFactory
+from vehicles.models import VehicleRollup
+
+
+def get_rollup(vehicle):
+    rollup = VehicleRollup.objects.get(vehicle=vehicle)
+    return (
+        rollup.job_count,
+        rollup.completed_count,
+        rollup.total_income,
+        rollup.total_cost,
+    )
+
+
+def test_rollup_follows_job_changes(db):
+    vehicle, other_vehicle = VehicleFactory.create_batch(2)
+    job = DeliveryJobFactory(vehicle=vehicle, income="10.00", cost="4.00")
+    DeliveryJobFactory(vehicle=vehicle, income="5.50", cost="1.25")
+    assert get_rollup(vehicle) == (2, 0, Decimal("15.50"), Decimal("5.25"))
+
+    job.completed_at = timezone.now()
+    job.income = Decimal("12.00")
+    job.save()
+    assert get_rollup(vehicle) == (2, 1, Decimal("17.50"), Decimal("5.25"))
+
+    # Loaded without the rollup fields, the stored values are fetched on save
+    job = DeliveryJob.objects.only("id").get(pk=job.pk)
+    job.vehicle = other_vehicle
+    job.save()
+    assert get_rollup(vehicle) == (1, 0, Decimal("5.50"), Decimal("1.25"))
+    assert get_rollup(other_vehicle) == (1, 1, Decimal("12.00"), Decimal("4.00"))
+
+    job.delete()
+    assert get_rollup(other_vehicle) == (0, 0, Decimal("0.00"), Decimal("0.00"))
+
+
+def test_rollup_counts_concurrent_saves_once(db):
+    vehicle = VehicleFactory()
+    job = DeliveryJobFactory(vehicle=vehicle, income="10.00", cost="4.00")
+    # As two requests that loaded the job before either completed it
+    loaded = [DeliveryJob.objects.get(pk=job.pk) for _ in range(2)]
+
+    for job in loaded:
+        job.completed_at = timezone.now()
+        job.save()
+
+    assert get_rollup(vehicle) == (1, 1, Decimal("10.00"), Decimal("4.00"))
+    assert VehicleRollup.objects.rebuild() == 0
+
+
+def test_assign_vehicle_to_jobs_moves_rollups(graphql_client, graphql_context, db):
+    vehicle, other_vehicle = VehicleFactory.create_batch(2)
+    jobs = [
+        DeliveryJobFactory(vehicle=vehicle, income="10.00", cost="1.00"),
+        DeliveryJobFactory(
+            vehicle=None,
+            income="20.00",
+            cost="2.00",
+            delivery_slot_starts_at=timezone.now(),
+        ),
+        # A day earlier, so the slots assigned together don't overlap
+        DeliveryJobFactory(
+            vehicle=vehicle,
+            income="30.00",
+            cost="3.00",
+            delivery_slot_starts_at=timezone.now() - timedelta(days=1),
+            completed_at=timezone.now(),
+        ),
+    ]
+
+    mutation = """
+        mutation Assign($input: AssignVehicleToJobsInput!) {
+            assignVehicleToJobs(input: $input) { success }
+        }
+    """
+    response = graphql_client.execute(
+        mutation,
+        variables={
+            "input": {
+                "vehicleRegistration": other_vehicle.registration,
+                "jobIds": [to_global_id("DeliveryJobType", job.pk) for job in jobs[1:]],
+            }
+        },
+        context_value=graphql_context,
+    )
+
+    assert response["data"]["assignVehicleToJobs"]["success"]
+    assert get_rollup(vehicle) == (1, 0, Decimal("10.00"), Decimal("1.00"))
+    assert get_rollup(other_vehicle) == (2, 1, Decimal("50.00"), Decimal("5.00"))
+
+
+def test_rebuild_repairs_drift(db):
+    vehicle, other_vehicle, idle_vehicle = VehicleFactory.create_batch(3)
+    DeliveryJobFactory(vehicle=vehicle, income="10.00", cost="1.00")
+    DeliveryJobFactory(vehicle=other_vehicle, income="20.00", cost="2.00")
+
+    # Queryset updates bypass save(), and so the rollups
+    DeliveryJob.objects.filter(vehicle=vehicle).update(income=Decimal("15.00"))
+
+    assert VehicleRollup.objects.rebuild() == 1
+    assert get_rollup(vehicle) == (1, 0, Decimal("15.00"), Decimal("1.00"))
+    assert get_rollup(other_vehicle) == (1, 0, Decimal("20.00"), Decimal("2.00"))
+    assert not VehicleRollup.objects.filter(vehicle=idle_vehicle).exists()
+    assert VehicleRollup.objects.rebuild() == 0
+
+
+def test_vehicles_ordered_by_rollup_totals(
+    graphql_client, graphql_context, db, django_assert_num_queries
+):
+    for income in ("30.00", "10.00", "20.00"):
+        DeliveryJobFactory(income=income)
+    idle_vehicle = VehicleFactory()
+
+    query = """
+        query {
+            vehicles(orderBy: "-total_income") {
+                edges { node { registration totalIncome } }
+            }
+        }
+    """
+
+    # count and page, without aggregating the jobs
+    with django_assert_num_queries(2) as captured:
+        response = graphql_client.execute(query, context_value=graphql_context)
+
+    assert "errors" not in response
+    assert all("jobs_deliveryjob" not in query["sql"] for query in captured)
+    vehicles = [edge["node"] for edge in response["data"]["vehicles"]["edges"]]
+    assert [vehicle["totalIncome"] for vehicle in vehicles] == [
+        "30.00",
+        "20.00",
+        "10.00",
+        "0.00",
+    ]
+    assert vehicles[-1]["registration"] == idle_vehicle.registration
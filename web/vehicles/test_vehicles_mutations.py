@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+
+import pytest
+from graphql_relay import to_global_id
+
+from jobs.factories import DeliveryJobFactory
+from jobs.models import DeliveryJob
+from vehicles.factories import VehicleFactory
+from vehicles.schema import AssignVehicleToJobs
+
+ASSIGN_MUTATION = """
+    mutation Assign($input: AssignVehicleToJobsInput!) {
+        assignVehicleToJobs(input: $input) {
+            success
+            matchedCount
+            missingCount
+            jobs {
+                id
+                vehicle { registration }
+                destination { city }
+            }
+        }
+    }
+"""
+
+
+def test_assign_vehicle_to_jobs_in_chunks(
+    graphql_client, graphql_context, db, django_assert_num_queries, monkeypatch
+):
+    monkeypatch.setattr(AssignVehicleToJobs, "CHUNK_SIZE", 2)
+    vehicle = VehicleFactory()
+    jobs = [
+        DeliveryJobFactory(
+            vehicle=None,
+            delivery_slot_starts_at=datetime(2024, 12, day, tzinfo=timezone.utc),
+        )
+        for day in range(1, 6)
+    ]
+    global_ids = [to_global_id("DeliveryJobType", job.pk) for job in jobs]
+
+    # savepoint, vehicle, 3 locking chunks, slot conflicts, 3 update chunks,
+    # rollups, release, then the jobs with their vehicle and destination
+    with django_assert_num_queries(12):
+        response = graphql_client.execute(
+            ASSIGN_MUTATION,
+            variables={
+                "input": {
+                    "vehicleRegistration": vehicle.registration,
+                    "jobIds": [
+                        *global_ids,
+                        global_ids[0],
+                        to_global_id("DeliveryJobType", 0),
+                        to_global_id("VehicleType", vehicle.registration),
+                        "invalid",
+                    ],
+                }
+            },
+            context_value=graphql_context,
+        )
+
+    assert "errors" not in response
+    result = response["data"]["assignVehicleToJobs"]
+    assert (result["success"], result["matchedCount"], result["missingCount"]) == (
+        True,
+        5,
+        3,
+    )
+    assert [job["id"] for job in result["jobs"]] == global_ids
+    assert all(
+        job["vehicle"]["registration"] == vehicle.registration for job in result["jobs"]
+    )
+    assert DeliveryJob.objects.filter(vehicle=vehicle).count() == 5
+
+
+def test_assign_unknown_vehicle_to_jobs(graphql_client, db):
+    job = DeliveryJobFactory(vehicle=None)
+
+    response = graphql_client.execute(
+        ASSIGN_MUTATION,
+        variables={
+            "input": {
+                "vehicleRegistration": "UNKNOWN",
+                "jobIds": [to_global_id("DeliveryJobType", job.pk)],
+            }
+        },
+    )
+
+    assert response["data"]["assignVehicleToJobs"]["success"] is False
+    assert DeliveryJob.objects.get().vehicle is None
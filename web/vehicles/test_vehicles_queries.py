@@ -0,0 +1,128 @@
+import pytest
+
+from jobs.factories import DeliveryJobFactory
+from vehicles.factories import VehicleFactory
+
+
+@pytest.mark.parametrize("num_vehicles", [1, 10])
+def test_vehicles_prefetches_delivery_jobs(
+    graphql_client, graphql_context, db, django_assert_num_queries, num_vehicles
+):
+    for vehicle in VehicleFactory.create_batch(num_vehicles):
+        DeliveryJobFactory.create_batch(3, vehicle=vehicle)
+
+    query = """
+        query {
+            vehicles {
+                edges {
+                    node {
+                        registration
+                        totalIncome
+                        deliveryJobs {
+                            totalIncome
+                            edges {
+                                node {
+                                    income
+                                    destination { city }
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    """
+
+    # count, page and one prefetch of every job on the page
+    with django_assert_num_queries(3):
+        response = graphql_client.execute(query, context_value=graphql_context)
+
+    assert "errors" not in response
+    vehicles = [edge["node"] for edge in response["data"]["vehicles"]["edges"]]
+    assert len(vehicles) == num_vehicles
+    for vehicle in vehicles:
+        assert len(vehicle["deliveryJobs"]["edges"]) == 3
+        assert vehicle["totalIncome"] == vehicle["deliveryJobs"]["totalIncome"]
+
+
+def test_vehicles_filtered_delivery_jobs(graphql_client, graphql_context, db):
+    vehicle = VehicleFactory()
+    DeliveryJobFactory(vehicle=vehicle, income="10.00")
+    DeliveryJobFactory(vehicle=vehicle, income="99.00")
+
+    query = """
+        query {
+            vehicles {
+                edges {
+                    node {
+                        deliveryJobs(income_Gt: 50) {
+                            edges {
+                                node { income }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    """
+
+    response = graphql_client.execute(query, context_value=graphql_context)
+
+    assert "errors" not in response
+    edges = response["data"]["vehicles"]["edges"][0]["node"]["deliveryJobs"]["edges"]
+    assert [edge["node"]["income"] for edge in edges] == ["99.00"]
+
+
+def test_vehicles_skips_unselected_totals(
+    graphql_client, graphql_context, db, django_assert_num_queries
+):
+    DeliveryJobFactory.create_batch(2)
+
+    query = """
+        query {
+            vehicles {
+                edges {
+                    node { registration }
+                }
+            }
+        }
+    """
+
+    with django_assert_num_queries(2) as captured:
+        response = graphql_client.execute(query, context_value=graphql_context)
+
+    assert "errors" not in response
+    assert "SUM" not in captured.captured_queries[1]["sql"]
+
+
+def test_vehicles_keyset_pagination(graphql_client, graphql_context, db):
+    registrations = ["AB12CDE", "FG34HIJ", "KL56MNO"]
+    for registration in reversed(registrations):
+        VehicleFactory(registration=registration)
+
+    query = """
+        query Vehicles($after: String) {
+            vehicles(keyset: true, first: 2, after: $after) {
+                pageInfo { hasNextPage endCursor }
+                edges {
+                    node { registration }
+                }
+            }
+        }
+    """
+
+    first_page = graphql_client.execute(query, context_value=graphql_context)["data"][
+        "vehicles"
+    ]
+    second_page = graphql_client.execute(
+        query,
+        variables={"after": first_page["pageInfo"]["endCursor"]},
+        context_value=graphql_context,
+    )["data"]["vehicles"]
+
+    assert first_page["pageInfo"]["hasNextPage"]
+    assert not second_page["pageInfo"]["hasNextPage"]
+    assert [
+        edge["node"]["registration"]
+        for edge in first_page["edges"] + second_page["edges"]
+    ] == registrations